@@ -0,0 +1,32 @@
+"""App da barbearia: um módulo por parte do sistema, cada um com o seu blueprint.
+
+create_app() monta o app Flask; `app` é a instância usada pelo gunicorn e
+pelo CLI (via app.py na raiz).
+"""
+from flask import Flask
+
+from barbearia import (
+    agenda, analytics, clientes, eventos, metricas, monitoramento, relatorios, rollup, rotas, schema, usuarios, vendas,
+)
+# Acrescentam os seus comandos ao grupo `flask vendas`
+from barbearia import importacao, particoes  # noqa: F401
+
+
+def create_app():
+    """Monta o app Flask: rotas/hooks dos blueprints e os comandos do CLI.
+
+    Não conecta no banco nem roda DDL; isso fica para a primeira requisição
+    (exigir_schema) ou para `flask banco migrar`.
+    """
+    novo = Flask(__name__)
+    novo.secret_key = "barbearia-secret"
+    # A ordem conta para os hooks: métricas medem tudo, o schema é conferido
+    # (rotas) antes de a sessão ser checada no diretório de usuários
+    for modulo in (metricas, rotas, usuarios, analytics, clientes, agenda, relatorios, eventos, monitoramento):
+        novo.register_blueprint(modulo.bp)
+    for grupo in (schema.banco_cli, usuarios.usuarios_cli, rollup.rollup_cli, vendas.vendas_cli):
+        novo.cli.add_command(grupo)
+    return novo
+
+
+app = create_app()
@@ -0,0 +1,406 @@
+"""Agendamentos por barbeiro, disponibilidade e as rotas /api/agendamentos."""
+from flask import Blueprint, jsonify, request, session
+import itertools
+import os
+from datetime import datetime, timedelta
+from operator import itemgetter
+from sqlalchemy import text
+
+from barbearia.banco import LOJA_PADRAO, TZ_BR, get_engine, marcar_escrita
+from barbearia.eventos import eventos_publicar
+from barbearia.helpers import parse_date_yyyy_mm_dd
+from barbearia.usuarios import diretorio_usuarios, loja_da_requisicao
+from barbearia.vendas import inserir_vendas, invalidar_cache_vendas, normalizar_venda
+
+bp = Blueprint("agenda", __name__)
+
+# =========================
+# AGENDAMENTOS (agenda por barbeiro e disponibilidade)
+# =========================
+# Cada agendamento é um intervalo [inicio, fim) em minutos desde 00:00 num
+# dia, de um barbeiro de uma loja. Marcar grava também os blocos de
+# AGENDA_GRADE minutos em agendamentos_horarios: a chave primária (loja,
+# barbeiro, data, horario) recusa o segundo de dois pedidos sobrepostos, no
+# Postgres e no SQLite. Cancelar libera os blocos; concluir vira venda.
+AGENDA_GRADE = 5
+# Passo dos horários oferecidos (múltiplo de AGENDA_GRADE)
+AGENDA_INTERVALO = int(os.environ.get("AGENDA_INTERVALO", "15"))
+AGENDA_ABERTURA = os.environ.get("AGENDA_ABERTURA", "09:00")
+AGENDA_FECHAMENTO = os.environ.get("AGENDA_FECHAMENTO", "20:00")
+# Dias sem expediente, como em date.weekday() (0 = segunda, 6 = domingo)
+AGENDA_DIAS_FECHADOS = {int(d) for d in os.environ.get("AGENDA_DIAS_FECHADOS", "6").split(",") if d.strip()}
+AGENDA_DURACAO_PADRAO = int(os.environ.get("AGENDA_DURACAO_PADRAO", "30"))
+AGENDA_DURACAO_MAX = 240
+AGENDA_DIAS_A_FRENTE = int(os.environ.get("AGENDA_DIAS_A_FRENTE", "60"))
+AGENDA_DISPONIBILIDADE_DIAS_MAX = 31
+
+
+class HorarioOcupado(Exception):
+    """O barbeiro já tem agendamento em parte do intervalo pedido."""
+
+
+def minutos_do_dia(hhmm):
+    """'HH:MM' -> minutos desde 00:00 (ValueError se inválido)."""
+    hora = datetime.strptime(str(hhmm or "").strip()[:5], "%H:%M")
+    return hora.hour * 60 + hora.minute
+
+
+def hhmm(minutos):
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def janelas_livres(ocupados, abertura, fechamento):
+    """Varredura dos intervalos ocupados (ordenados por início) dentro do
+    expediente: devolve os intervalos livres [(inicio, fim), ...]."""
+    livres = []
+    cursor = abertura
+    for inicio, fim in ocupados:
+        if inicio > cursor:
+            livres.append((cursor, min(inicio, fechamento)))
+        cursor = max(cursor, fim)
+        if cursor >= fechamento:
+            break
+    if cursor < fechamento:
+        livres.append((cursor, fechamento))
+    return [(ini, fim) for ini, fim in livres if ini < fim]
+
+
+def horarios_livres(livres, duracao, passo=AGENDA_INTERVALO, a_partir=0):
+    """Inícios (no passo da agenda) em que cabe um atendimento de duracao minutos."""
+    horarios = []
+    for ini, fim in livres:
+        ini = max(ini, a_partir)
+        inicio = -(-ini // passo) * passo  # primeiro múltiplo do passo >= ini
+        while inicio + duracao <= fim:
+            horarios.append(inicio)
+            inicio += passo
+    return horarios
+
+
+def disponibilidade(conn, loja, barbeiros, inicio, dias=7, duracao=AGENDA_DURACAO_PADRAO, agora=None):
+    """Horários livres de cada barbeiro em cada dia de [inicio, inicio + dias).
+
+    Uma consulta só traz os ocupados do período na ordem (barbeiro, data,
+    inicio), pelo índice ix_agendamentos_ocupados; a varredura por barbeiro
+    e dia acha as janelas livres e os inícios onde cabe a duracao.
+    """
+    agora = agora or datetime.now(TZ_BR)
+    fim = inicio + timedelta(days=dias - 1)
+    abertura, fechamento = minutos_do_dia(AGENDA_ABERTURA), minutos_do_dia(AGENDA_FECHAMENTO)
+    dias_abertos = [inicio + timedelta(days=i) for i in range(dias)
+                    if (inicio + timedelta(days=i)).weekday() not in AGENDA_DIAS_FECHADOS]
+
+    ocupados = {}
+    if barbeiros and dias_abertos:
+        params = {"loja": loja, "inicio": inicio, "fim": fim}
+        filtro_barbeiro = ""
+        if len(barbeiros) == 1:
+            filtro_barbeiro = "AND barbeiro = :barbeiro"
+            params["barbeiro"] = barbeiros[0]
+        linhas = conn.execute(text(f"""
+            SELECT barbeiro, data, inicio, fim
+            FROM agendamentos
+            WHERE loja = :loja AND data >= :inicio AND data <= :fim AND status <> 'cancelado'
+              {filtro_barbeiro}
+            ORDER BY barbeiro, data, inicio
+        """), params)
+        for (barbeiro, dia), intervalos in itertools.groupby(linhas.tuples(), key=itemgetter(0, 1)):
+            ocupados[(barbeiro, str(dia)[:10])] = [(ini, fim) for _, _, ini, fim in intervalos]
+
+    agenda = {}
+    for barbeiro in barbeiros:
+        agenda[barbeiro] = por_dia = {}
+        for dia in dias_abertos:
+            if dia < agora.date():
+                continue
+            a_partir = agora.hour * 60 + agora.minute if dia == agora.date() else 0
+            livres = janelas_livres(ocupados.get((barbeiro, dia.isoformat()), []), abertura, fechamento)
+            por_dia[dia.isoformat()] = {
+                "livres": [[hhmm(ini), hhmm(fim)] for ini, fim in livres],
+                "horarios": [hhmm(m) for m in horarios_livres(livres, duracao, a_partir=a_partir)],
+            }
+    return {
+        "loja": loja,
+        "inicio": inicio.isoformat(),
+        "fim": fim.isoformat(),
+        "duracao": duracao,
+        "intervalo": AGENDA_INTERVALO,
+        "barbeiros": agenda,
+    }
+
+
+def duracao_agendamento(valor):
+    """Duração em minutos, arredondada para cima na grade (ValueError se inválida)."""
+    try:
+        duracao = int(valor or AGENDA_DURACAO_PADRAO)
+    except (TypeError, ValueError):
+        raise ValueError("duracao inválida (minutos)")
+    if not 0 < duracao <= AGENDA_DURACAO_MAX:
+        raise ValueError(f"duracao deve ser de 1 a {AGENDA_DURACAO_MAX} minutos")
+    return -(-duracao // AGENDA_GRADE) * AGENDA_GRADE
+
+
+def normalizar_agendamento(dados, role, usuario, loja=None, agora=None):
+    """Valida um pedido de agendamento e devolve os params do INSERT.
+
+    Mesmas regras do registrar(): barbeiro só agenda para si; admin escolhe
+    o barbeiro, que precisa ser da loja dele (se tiver uma). A loja do
+    agendamento é sempre a do barbeiro. Levanta ValueError se algo vier inválido.
+    """
+    agora = agora or datetime.now(TZ_BR)
+    if role == "admin":
+        barbeiro = str(dados.get("barbeiro") or "").strip().lower()
+    else:
+        barbeiro = usuario
+    loja_barbeiro = diretorio_usuarios.loja(barbeiro)
+    if diretorio_usuarios.role(barbeiro) != "barbeiro" or (loja and loja_barbeiro != loja):
+        raise ValueError("barbeiro inválido")
+
+    cliente = str(dados.get("cliente") or "").strip()
+    if not cliente:
+        raise ValueError("cliente obrigatório")
+
+    dia = parse_date_yyyy_mm_dd(str(dados.get("data") or ""))
+    if not dia:
+        raise ValueError("data inválida (use YYYY-MM-DD)")
+    if dia < agora.date() or dia > agora.date() + timedelta(days=AGENDA_DIAS_A_FRENTE):
+        raise ValueError(f"data deve ser de hoje até {AGENDA_DIAS_A_FRENTE} dias à frente")
+    if dia.weekday() in AGENDA_DIAS_FECHADOS:
+        raise ValueError("a loja não abre nesse dia")
+
+    try:
+        inicio = minutos_do_dia(dados.get("hora"))
+    except ValueError:
+        raise ValueError("hora inválida (use HH:MM)")
+    if inicio % AGENDA_GRADE:
+        raise ValueError(f"hora deve ser múltipla de {AGENDA_GRADE} minutos")
+    fim = inicio + duracao_agendamento(dados.get("duracao"))
+    if inicio < minutos_do_dia(AGENDA_ABERTURA) or fim > minutos_do_dia(AGENDA_FECHAMENTO):
+        raise ValueError(f"fora do expediente ({AGENDA_ABERTURA} às {AGENDA_FECHAMENTO})")
+    if dia == agora.date() and inicio < agora.hour * 60 + agora.minute:
+        raise ValueError("horário já passou")
+
+    return {
+        "loja": loja_barbeiro,
+        "barbeiro": barbeiro,
+        "data": dia,
+        "inicio": inicio,
+        "fim": fim,
+        "cliente": cliente,
+        "criado_por": usuario,
+    }
+
+
+def agendamento_como_dict(r):
+    return {
+        "id": r["id"],
+        "loja": r["loja"],
+        "barbeiro": r["barbeiro"],
+        "data": str(r["data"])[:10],
+        "hora": hhmm(r["inicio"]),
+        "fim": hhmm(r["fim"]),
+        "cliente": r["cliente"],
+        "status": r["status"],
+        "venda_id": r["venda_id"],
+    }
+
+
+def agendar(conn, ag):
+    """Grava o agendamento e reserva os blocos da grade.
+
+    Dois pedidos sobrepostos disputam as mesmas chaves de
+    agendamentos_horarios: o segundo não insere todas e levanta
+    HorarioOcupado (a transação inteira deve ser desfeita).
+    """
+    ag["id"] = conn.execute(text("""
+        INSERT INTO agendamentos (loja, barbeiro, data, inicio, fim, cliente, criado_por)
+        VALUES (:loja, :barbeiro, :data, :inicio, :fim, :cliente, :criado_por)
+        RETURNING id
+    """), ag).scalar_one()
+
+    blocos = range(ag["inicio"], ag["fim"], AGENDA_GRADE)
+    valores = ", ".join(f"(:loja, :barbeiro, :data, :h{i}, :id)" for i in range(len(blocos)))
+    reservados = conn.execute(
+        text(f"""
+            INSERT INTO agendamentos_horarios (loja, barbeiro, data, horario, agendamento_id)
+            VALUES {valores}
+            ON CONFLICT (loja, barbeiro, data, horario) DO NOTHING
+            RETURNING horario
+        """),
+        dict(ag, **{f"h{i}": h for i, h in enumerate(blocos)}),
+    ).all()
+    if len(reservados) < len(blocos):
+        raise HorarioOcupado(f"{ag['barbeiro']} já tem agendamento entre "
+                             f"{hhmm(ag['inicio'])} e {hhmm(ag['fim'])}")
+    ag["status"], ag["venda_id"] = "marcado", None
+    return ag
+
+
+def _filtro_agendamento(role, usuario, loja):
+    """Escopo de quem mexe num agendamento: barbeiro só nos seus, admin de loja só na loja."""
+    filtro, params = "", {}
+    if loja:
+        filtro += " AND loja = :loja"
+        params["loja"] = loja
+    if role != "admin":
+        filtro += " AND barbeiro = :barbeiro"
+        params["barbeiro"] = usuario
+    return filtro, params
+
+
+def listar_agendamentos(conn, role, usuario, data_inicio, data_fim, loja=None):
+    filtro, params = _filtro_agendamento(role, usuario, loja)
+    rows = conn.execute(text(f"""
+        SELECT id, loja, barbeiro, data, inicio, fim, cliente, status, venda_id
+        FROM agendamentos
+        WHERE data >= :data_inicio AND data <= :data_fim {filtro}
+        ORDER BY data, inicio, barbeiro
+    """), dict(params, data_inicio=data_inicio, data_fim=data_fim)).mappings()
+    return [agendamento_como_dict(r) for r in rows]
+
+
+def cancelar_agendamento(conn, agendamento_id, role, usuario, loja=None):
+    """Cancela um agendamento marcado e libera os blocos; retorna se cancelou."""
+    filtro, params = _filtro_agendamento(role, usuario, loja)
+    cancelado = conn.execute(text(f"""
+        UPDATE agendamentos SET status = 'cancelado'
+        WHERE id = :id AND status = 'marcado' {filtro}
+        RETURNING id
+    """), dict(params, id=agendamento_id)).first()
+    if cancelado:
+        conn.execute(text("DELETE FROM agendamentos_horarios WHERE agendamento_id = :id"),
+                     {"id": agendamento_id})
+    return cancelado is not None
+
+
+def concluir_agendamento(conn, agendamento_id, dados, role, usuario, loja=None):
+    """Marca o agendamento como concluído e registra a venda dele.
+
+    A venda passa pelas regras do registrar() (normalizar_venda/inserir_vendas)
+    com cliente, barbeiro e loja do agendamento e os serviços/pagamento de
+    dados. O UPDATE ... WHERE status = 'marcado' trava a linha: um segundo
+    pedido simultâneo (ou o reenvio do mesmo) não acha mais o agendamento
+    marcado e não gera outra venda. Retorna a venda gravada ou None se não
+    havia agendamento marcado.
+    """
+    filtro, params = _filtro_agendamento(role, usuario, loja)
+    ag = conn.execute(text(f"""
+        UPDATE agendamentos SET status = 'concluido'
+        WHERE id = :id AND status = 'marcado' {filtro}
+        RETURNING id, loja, barbeiro, cliente
+    """), dict(params, id=agendamento_id)).mappings().first()
+    if ag is None:
+        return None
+
+    venda = normalizar_venda(
+        dict(dados, cliente=ag["cliente"], barbeiro=ag["barbeiro"], idempotency_key=None),
+        role, usuario, loja=ag["loja"],
+    )
+    inserir_vendas(conn, [venda])
+    conn.execute(text("UPDATE agendamentos SET venda_id = :venda_id WHERE id = :id"),
+                 {"venda_id": venda["id"], "id": ag["id"]})
+    return venda
+
+
+@bp.route("/api/agendamentos/disponibilidade")
+def api_agendamentos_disponibilidade():
+    """Horários livres por barbeiro: ?inicio=YYYY-MM-DD (padrão: hoje), ?dias=
+    (padrão 7), ?duracao= em minutos e ?barbeiro= (admin; padrão: todos da loja)."""
+    if "usuario" not in session:
+        return jsonify({"erro": "não autenticado"}), 401
+
+    role = session.get("role")
+    loja = loja_da_requisicao() or LOJA_PADRAO
+    hoje = datetime.now(TZ_BR).date()
+    inicio = parse_date_yyyy_mm_dd(request.args.get("inicio")) or hoje
+    try:
+        dias = min(max(int(request.args.get("dias") or 7), 1), AGENDA_DISPONIBILIDADE_DIAS_MAX)
+    except ValueError:
+        return jsonify({"erro": "dias inválido"}), 400
+    try:
+        duracao = duracao_agendamento(request.args.get("duracao"))
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    if role == "admin":
+        escolhido = (request.args.get("barbeiro") or "").strip().lower()
+        barbeiros = [b for b in diretorio_usuarios.barbeiros(loja) if not escolhido or b == escolhido]
+    else:
+        barbeiros = [session["usuario"]]
+
+    with get_engine().connect() as conn:
+        agenda = disponibilidade(conn, loja, barbeiros, inicio, dias, duracao)
+    return jsonify(agenda)
+
+
+@bp.route("/api/agendamentos", methods=["GET", "POST"])
+def api_agendamentos():
+    """GET: agendamentos de ?data_inicio= a ?data_fim= (padrão: hoje e os 7 dias seguintes).
+
+    POST {barbeiro, cliente, data, hora, duracao}: marca um horário. Responde
+    409 se o barbeiro já tiver agendamento nesse intervalo.
+    """
+    if "usuario" not in session:
+        return jsonify({"erro": "não autenticado"}), 401
+
+    role = session.get("role")
+    usuario = session.get("usuario")
+    loja = loja_da_requisicao()
+
+    if request.method == "GET":
+        hoje = datetime.now(TZ_BR).date()
+        data_inicio = parse_date_yyyy_mm_dd(request.args.get("data_inicio")) or hoje
+        data_fim = parse_date_yyyy_mm_dd(request.args.get("data_fim")) or data_inicio + timedelta(days=7)
+        with get_engine().connect() as conn:
+            agendamentos = listar_agendamentos(conn, role, usuario, data_inicio, data_fim, loja=loja)
+        return jsonify({"agendamentos": agendamentos})
+
+    dados = request.get_json(silent=True) or request.form.to_dict()
+    try:
+        ag = normalizar_agendamento(dados, role, usuario, loja=session.get("loja"))
+        with get_engine().begin() as conn:
+            agendar(conn, ag)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    except HorarioOcupado as e:
+        return jsonify({"erro": str(e)}), 409
+
+    print(">>> AGENDADO:", ag["loja"], ag["barbeiro"], ag["data"], hhmm(ag["inicio"]), ag["cliente"])
+    return jsonify(agendamento_como_dict(ag)), 201
+
+
+@bp.route("/api/agendamentos/<int:agendamento_id>/cancelar", methods=["POST"])
+def api_agendamento_cancelar(agendamento_id: int):
+    if "usuario" not in session:
+        return jsonify({"erro": "não autenticado"}), 401
+
+    with get_engine().begin() as conn:
+        cancelado = cancelar_agendamento(
+            conn, agendamento_id, session.get("role"), session.get("usuario"), loja=session.get("loja")
+        )
+    if not cancelado:
+        return jsonify({"erro": "agendamento não encontrado ou já encerrado"}), 404
+    return jsonify({"id": agendamento_id, "status": "cancelado"})
+
+
+@bp.route("/api/agendamentos/<int:agendamento_id>/concluir", methods=["POST"])
+def api_agendamento_concluir(agendamento_id: int):
+    """Conclui o atendimento e registra a venda: mesmos campos do /registrar
+    (cabelo, barba, sobrancelha, produto_nome, produto_valor, desconto, pagamento)."""
+    if "usuario" not in session:
+        return jsonify({"erro": "não autenticado"}), 401
+
+    dados = request.get_json(silent=True) or request.form.to_dict()
+    with get_engine().begin() as conn:
+        venda = concluir_agendamento(
+            conn, agendamento_id, dados, session.get("role"), session.get("usuario"), loja=session.get("loja")
+        )
+    if venda is None:
+        return jsonify({"erro": "agendamento não encontrado ou já encerrado"}), 404
+
+    invalidar_cache_vendas([venda])
+    eventos_publicar("nova", [venda])
+    marcar_escrita()
+
+    print(">>> INSERT OK:", venda["loja"], venda["barbeiro"], venda["cliente"], venda["total"], venda["pagamento"])
+    return jsonify({"id": agendamento_id, "status": "concluido", "venda_id": venda["id"]})
@@ -0,0 +1,280 @@
+"""Analytics do mês a partir do rollup e a rota /api/analytics."""
+from flask import Blueprint, jsonify, request, session
+import calendar
+import itertools
+import os
+from datetime import datetime, date, timedelta
+from sqlalchemy import text
+
+from barbearia.banco import TZ_BR, conectar_leitura
+from barbearia.cache import cache_leitura, cache_resumos
+from barbearia.helpers import filtro_vendas, parse_date_yyyy_mm_dd
+from barbearia.schema import COLUNAS_ROLLUP
+from barbearia.usuarios import loja_da_requisicao
+
+bp = Blueprint("analytics", __name__)
+
+# =========================
+# ANALYTICS (comparações, médias móveis, serviços e ticket)
+# =========================
+# Tudo sai do rollup (poucas linhas por dia): somas de vendas_diarias e
+# percentis do ticket do histograma em vendas_diarias_ticket.
+ANALYTICS_DIAS_SERIE = int(os.environ.get("ANALYTICS_DIAS_SERIE", "90"))
+ANALYTICS_MESES = 12
+PERCENTIS_TICKET = (0.25, 0.5, 0.75, 0.9)
+SERVICOS_ROLLUP = [col for col in COLUNAS_ROLLUP if col != "total"]
+
+
+def mes_deslocado(d, meses):
+    """O mesmo dia `meses` meses antes/depois (limitado ao fim do mês)."""
+    ano, mes = divmod(d.year * 12 + d.month - 1 + meses, 12)
+    return date(ano, mes + 1, min(d.day, calendar.monthrange(ano, mes + 1)[1]))
+
+
+def periodos_comparados(ate):
+    """Mês até `ate` e os mesmos dias no mês anterior e no ano anterior."""
+    inicio = ate.replace(day=1)
+    return {
+        "mes_atual": (inicio, ate),
+        "mes_anterior": (mes_deslocado(inicio, -1), mes_deslocado(ate, -1)),
+        "ano_anterior": (mes_deslocado(inicio, -12), mes_deslocado(ate, -12)),
+    }
+
+
+def percentil_histograma(histograma, p):
+    """Percentil de [(valor, qtd)] em ordem de valor, com a interpolação linear
+    do percentile_cont do Postgres (como se cada valor se repetisse qtd vezes)."""
+    n = sum(qtd for _, qtd in histograma)
+    if not n:
+        return None
+    pos = (n - 1) * p
+    i = int(pos)
+    # valores nas posições i e i + 1 da lista expandida
+    baixo = alto = None
+    acumulado = 0
+    for valor, qtd in histograma:
+        acumulado += qtd
+        if baixo is None and i < acumulado:
+            baixo = valor
+        if i + 1 < acumulado:
+            alto = valor
+            break
+    if alto is None:
+        return baixo
+    return baixo + (alto - baixo) * (pos - i)
+
+
+def variacao_pct(atual, base):
+    return round((atual - base) / base * 100, 1) if base else None
+
+
+def _analytics_periodos(conn, escopo, periodos):
+    """Somas e percentis do ticket dos períodos comparados (duas consultas ao rollup)."""
+    where_sql, params = filtro_vendas(**escopo, apenas_ativas=False)
+    casos, faixas = [], []
+    for nome, (inicio, fim) in periodos.items():
+        params[f"{nome}_ini"], params[f"{nome}_fim"] = inicio, fim
+        casos.append(f"WHEN data >= :{nome}_ini AND data <= :{nome}_fim THEN '{nome}'")
+        faixas.append(f"(data >= :{nome}_ini AND data <= :{nome}_fim)")
+    periodo_sql = f"CASE {' '.join(casos)} END"
+    faixas_sql = " OR ".join(faixas)
+
+    somas = ", ".join(f"COALESCE(SUM({col}), 0)" for col in COLUNAS_ROLLUP)
+    resultado = {nome: {"inicio": inicio.isoformat(), "fim": fim.isoformat(), "total": 0.0, "qtd": 0,
+                        "servicos": {col: 0.0 for col in SERVICOS_ROLLUP}}
+                 for nome, (inicio, fim) in periodos.items()}
+    for r in conn.execute(text(f"""
+        SELECT {periodo_sql} AS periodo, {somas}, COALESCE(SUM(qtd), 0)
+        FROM vendas_diarias
+        {where_sql}
+          AND ({faixas_sql})
+        GROUP BY 1
+    """), params):
+        valores = dict(zip(COLUNAS_ROLLUP, (round(float(v), 2) for v in r[1:-1])))
+        p = resultado[r[0]]
+        p["total"] = valores.pop("total")
+        p["qtd"] = int(r[-1])
+        p["servicos"] = valores
+
+    # Percentis do ticket a partir do histograma (total, qtd) de cada período
+    linhas = conn.execute(text(f"""
+        SELECT {periodo_sql} AS periodo, total, SUM(qtd)
+        FROM vendas_diarias_ticket
+        {where_sql}
+          AND ({faixas_sql})
+        GROUP BY 1, total
+        HAVING SUM(qtd) > 0
+        ORDER BY 1, total
+    """), params).all()
+    por_periodo = {}
+    for nome, grupo in itertools.groupby(linhas, key=lambda r: r[0]):
+        histograma = [(float(total), int(qtd)) for _, total, qtd in grupo]
+        por_periodo[nome] = [percentil_histograma(histograma, f) for f in PERCENTIS_TICKET]
+
+    for nome, p in resultado.items():
+        valores = por_periodo.get(nome) or [None] * len(PERCENTIS_TICKET)
+        p["ticket_medio"] = round(p["total"] / p["qtd"], 2) if p["qtd"] else None
+        p["ticket_percentis"] = {
+            f"p{int(f * 100)}": None if v is None else round(float(v), 2)
+            for f, v in zip(PERCENTIS_TICKET, valores)
+        }
+    return resultado
+
+
+def _analytics_serie_diaria(conn, escopo, inicio, fim):
+    """Total por dia com médias móveis de 7 e 30 dias (dias sem venda contam zero)."""
+    where_sql, params = filtro_vendas(**escopo, apenas_ativas=False)
+    params = dict(params, serie_ini=inicio - timedelta(days=29), serie_mostrar=inicio, serie_fim=fim)
+    # Calendário denso para as janelas contarem dias, não linhas com venda
+    if conn.dialect.name == "postgresql":
+        calendario = """
+            dias AS (
+                SELECT CAST(d AS DATE) AS data
+                FROM generate_series(CAST(:serie_ini AS DATE), CAST(:serie_fim AS DATE), INTERVAL '1 day') AS d
+            )
+        """
+    else:
+        calendario = """
+            dias(data) AS (
+                SELECT :serie_ini
+                UNION ALL
+                SELECT date(data, '+1 day') FROM dias WHERE data < :serie_fim
+            )
+        """
+    linhas = conn.execute(text(f"""
+        WITH RECURSIVE {calendario},
+        somas AS (
+            SELECT data, SUM(total) AS total, SUM(qtd) AS qtd
+            FROM vendas_diarias
+            {where_sql}
+              AND data >= :serie_ini AND data <= :serie_fim
+            GROUP BY data
+        ),
+        serie AS (
+            SELECT dias.data,
+                   COALESCE(somas.total, 0) AS total,
+                   COALESCE(somas.qtd, 0) AS qtd,
+                   AVG(COALESCE(somas.total, 0)) OVER (
+                       ORDER BY dias.data ROWS BETWEEN 6 PRECEDING AND CURRENT ROW) AS media_7d,
+                   AVG(COALESCE(somas.total, 0)) OVER (
+                       ORDER BY dias.data ROWS BETWEEN 29 PRECEDING AND CURRENT ROW) AS media_30d
+            FROM dias
+            LEFT JOIN somas ON somas.data = dias.data
+        )
+        SELECT data, total, qtd, media_7d, media_30d
+        FROM serie
+        WHERE data >= :serie_mostrar
+        ORDER BY data
+    """), params).all()
+    return [{
+        "data": str(r.data)[:10],
+        "total": round(float(r.total), 2),
+        "qtd": int(r.qtd),
+        "media_7d": round(float(r.media_7d), 2),
+        "media_30d": round(float(r.media_30d), 2),
+    } for r in linhas]
+
+
+def _analytics_meses(conn, escopo, ate, meses):
+    """Totais por mês dos últimos `meses` meses, com a variação sobre o mês
+    anterior e sobre o mesmo mês do ano anterior (o mês de `ate` é parcial)."""
+    where_sql, params = filtro_vendas(**escopo, apenas_ativas=False)
+    inicio = mes_deslocado(ate.replace(day=1), -(meses - 1) - 12)
+    params = dict(params, meses_ini=inicio, meses_fim=ate)
+    mes_sql = "to_char(data, 'YYYY-MM')" if conn.dialect.name == "postgresql" else "substr(data, 1, 7)"
+    somas = ", ".join(f"COALESCE(SUM({col}), 0)" for col in COLUNAS_ROLLUP)
+    por_mes = {
+        r[0]: dict(zip(COLUNAS_ROLLUP + ["qtd"], [round(float(v), 2) for v in r[1:-1]] + [int(r[-1])]))
+        for r in conn.execute(text(f"""
+            SELECT {mes_sql} AS mes, {somas}, COALESCE(SUM(qtd), 0)
+            FROM vendas_diarias
+            {where_sql}
+              AND data >= :meses_ini AND data <= :meses_fim
+            GROUP BY 1
+        """), params)
+    }
+
+    vazio = dict.fromkeys(COLUNAS_ROLLUP, 0.0) | {"qtd": 0}
+    resultado = []
+    for i in range(meses - 1, -1, -1):
+        d = mes_deslocado(ate.replace(day=1), -i)
+        atual = por_mes.get(d.strftime("%Y-%m"), vazio)
+        anterior = por_mes.get(mes_deslocado(d, -1).strftime("%Y-%m"), vazio)
+        ano_antes = por_mes.get(mes_deslocado(d, -12).strftime("%Y-%m"), vazio)
+        resultado.append({
+            "mes": d.strftime("%Y-%m"),
+            "total": atual["total"],
+            "qtd": atual["qtd"],
+            "servicos": {col: atual[col] for col in SERVICOS_ROLLUP},
+            "variacao_mes_pct": variacao_pct(atual["total"], anterior["total"]),
+            "variacao_ano_pct": variacao_pct(atual["total"], ano_antes["total"]),
+        })
+    return resultado
+
+
+def analytics_resumo(conn, role, usuario, ate, dias=ANALYTICS_DIAS_SERIE, loja=None):
+    """Payload do /api/analytics: comparações, série diária, meses, serviços e ticket."""
+    escopo = {"role": role, "usuario": usuario, "loja": loja}
+    resumo_periodos = _analytics_periodos(conn, escopo, periodos_comparados(ate))
+    atual = resumo_periodos["mes_atual"]
+
+    comparacoes = {}
+    for base in ("mes_anterior", "ano_anterior"):
+        anterior = resumo_periodos[base]
+        comparacoes[base] = {
+            "total_pct": variacao_pct(atual["total"], anterior["total"]),
+            "qtd_pct": variacao_pct(atual["qtd"], anterior["qtd"]),
+            "ticket_medio_pct": variacao_pct(atual["ticket_medio"] or 0, anterior["ticket_medio"] or 0),
+            "servicos_pct": {
+                col: variacao_pct(atual["servicos"][col], anterior["servicos"][col]) for col in SERVICOS_ROLLUP
+            },
+        }
+
+    return {
+        "ate": ate.isoformat(),
+        "loja": loja,
+        "escopo": None if role == "admin" else usuario,
+        "periodos": resumo_periodos,
+        "comparacoes": comparacoes,
+        "dias": _analytics_serie_diaria(conn, escopo, ate - timedelta(days=dias - 1), ate),
+        "meses": _analytics_meses(conn, escopo, ate, ANALYTICS_MESES),
+    }
+
+
+def analytics_inicio(ate, dias=ANALYTICS_DIAS_SERIE):
+    """Data mais antiga que analytics_resumo() lê (para a chave do cache)."""
+    return min(
+        ate - timedelta(days=dias - 1 + 29),
+        mes_deslocado(ate.replace(day=1), -(ANALYTICS_MESES - 1) - 12),
+    )
+
+
+@bp.route("/api/analytics")
+def api_analytics():
+    """Comparações do mês (MoM/YoY), médias móveis, serviços e ticket em JSON.
+
+    ?ate=YYYY-MM-DD fecha os períodos (padrão: hoje) e ?dias= é o tamanho da
+    série diária (1 a 366). Mesmo escopo do resumo_mes: barbeiro só vê o seu,
+    admin de loja só a loja dele.
+    """
+    if "usuario" not in session:
+        return jsonify({"erro": "não autenticado"}), 401
+
+    role = session.get("role")
+    usuario = session.get("usuario")
+    loja = loja_da_requisicao()
+
+    ate = parse_date_yyyy_mm_dd(request.args.get("ate")) or datetime.now(TZ_BR).date()
+    try:
+        dias = min(max(int(request.args.get("dias") or ANALYTICS_DIAS_SERIE), 1), 366)
+    except ValueError:
+        return jsonify({"erro": "dias inválido"}), 400
+
+    chave = (f"analytics:{dias}", loja, None if role == "admin" else usuario,
+             analytics_inicio(ate, dias).isoformat(), ate.isoformat())
+    resumo = cache_leitura(chave)
+    if resumo is None:
+        with conectar_leitura() as conn:
+            resumo = analytics_resumo(conn, role, usuario, ate, dias, loja=loja)
+        cache_resumos.set(chave, resumo)
+    return jsonify(resumo)
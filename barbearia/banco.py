@@ -0,0 +1,236 @@
+"""Engines do banco (principal, réplica e pools por loja) e configuração de conexão."""
+from flask import g, has_request_context, session
+import os
+import threading
+import time
+from zoneinfo import ZoneInfo
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import NullPool
+
+from barbearia.helpers import normalizar_cliente
+
+# Timezone correto do Brasil (Render geralmente roda em UTC)
+TZ_BR = ZoneInfo("America/Sao_Paulo")
+
+
+# =========================
+# BANCO (Neon no Render / SQLite local)
+# =========================
+DATABASE_URL = os.environ.get("DATABASE_URL")
+
+# Render/Neon normalmente fornece "postgresql://..."
+# Para usar psycopg v3 no SQLAlchemy: "postgresql+psycopg://..."
+if DATABASE_URL and DATABASE_URL.startswith("postgresql://"):
+    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg://", 1)
+
+if not DATABASE_URL:
+    # Local (desenvolvimento)
+    DATABASE_URL = "sqlite:///barbearia.db"
+
+# Pool de conexões (só vale para Postgres; o SQLite local usa o padrão)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "5"))
+# Neon derruba conexões ociosas; recicla antes disso
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "240"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+# pre-ping custa um SELECT 1 a cada checkout; pode ser desligado com DB_PRE_PING=0
+DB_PRE_PING = os.environ.get("DB_PRE_PING", "1") != "0"
+# Modo PgBouncer (endpoint "-pooler" do Neon): sem prepared statements no
+# servidor e, com DB_POOLER=null, sem pool no app (o PgBouncer já faz isso).
+DB_POOLER = os.environ.get("DB_POOLER") or ("pgbouncer" if "-pooler." in DATABASE_URL else "")
+
+
+# Lojas (filiais): toda venda pertence a uma loja. As vendas de antes das
+# filiais (e os usuários sem loja informada) ficam na LOJA_PADRAO.
+LOJA_PADRAO = "matriz"
+
+# Pool por loja (opcional, só Postgres): com LOJAS_POOL_ISOLADO=1 as
+# requisições de cada loja usam um pool próprio e pequeno, então relatórios
+# pesados de uma filial esgotam só as conexões dela, não o caixa das outras.
+# Conexões por worker: DB_POOL_SIZE + DB_MAX_OVERFLOW (admin de todas as
+# lojas, CLI) + lojas ativas x (LOJA_POOL_SIZE + LOJA_MAX_OVERFLOW); conferir
+# com o limite de conexões do Neon (ou usar o endpoint -pooler).
+LOJAS_POOL_ISOLADO = os.environ.get("LOJAS_POOL_ISOLADO", "0") == "1"
+LOJA_POOL_SIZE = int(os.environ.get("LOJA_POOL_SIZE", "2"))
+LOJA_MAX_OVERFLOW = int(os.environ.get("LOJA_MAX_OVERFLOW", "2"))
+
+
+def criar_engine(url, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW):
+    """Cria o engine com as configurações de pool do ambiente."""
+    opcoes = {"pool_pre_ping": DB_PRE_PING}
+
+    if url.startswith("postgresql"):
+        if DB_POOLER == "null":
+            opcoes["poolclass"] = NullPool
+        else:
+            opcoes.update(
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_recycle=DB_POOL_RECYCLE,
+                pool_timeout=DB_POOL_TIMEOUT,
+            )
+        if DB_POOLER:
+            # PgBouncer em modo transaction não suporta prepared statements
+            opcoes["connect_args"] = {"prepare_threshold": None}
+
+    engine = create_engine(url, **opcoes)
+    if url.startswith("sqlite"):
+        # usada pela migração que preenche vendas.cliente_norm
+        event.listen(engine, "connect", lambda dbapi_conn, _: dbapi_conn.create_function(
+            "normalizar_cliente", 1, normalizar_cliente, deterministic=True))
+    return engine
+
+
+# Dialeto lido da URL (sem conectar): "postgresql" ou "sqlite"
+DIALETO = make_url(DATABASE_URL).get_backend_name()
+
+# Réplica de leitura (opcional, ex.: read replica do Neon): relatórios
+# (download, resumo_mes, historico, analytics) leem dela e o caixa fica com
+# o banco principal. Tem que ser o mesmo dialeto do DATABASE_URL. Para testar
+# local serve uma cópia do SQLite ou um segundo Postgres.
+DATABASE_READ_URL = os.environ.get("DATABASE_READ_URL", "")
+if DATABASE_READ_URL.startswith("postgresql://"):
+    DATABASE_READ_URL = DATABASE_READ_URL.replace("postgresql://", "postgresql+psycopg://", 1)
+if DATABASE_READ_URL.startswith("sqlite") and "mode=ro" not in DATABASE_READ_URL:
+    # Só leitura: arquivo que não existe dá erro (e cai no principal) em vez de virar um banco vazio
+    DATABASE_READ_URL = f"sqlite:///file:{make_url(DATABASE_READ_URL).database}?mode=ro&uri=true"
+# Depois de gravar, a sessão lê do principal por esse tempo (atraso da réplica)
+DB_READ_LAG_MAX = float(os.environ.get("DB_READ_LAG_MAX", "10"))
+# Réplica fora do ar: tenta de novo depois desse tempo (até lá, usa o principal)
+DB_READ_RETRY = float(os.environ.get("DB_READ_RETRY", "30"))
+
+_engine = None
+_engines_loja = {}
+_engines_leitura = {}
+_engine_lock = threading.Lock()
+# time.monotonic() até quando a réplica é considerada fora do ar
+_replica_fora_ate = 0.0
+
+
+def get_engine(loja=None):
+    """Engine do app, criado no primeiro uso (o import não toca no banco).
+
+    Com LOJAS_POOL_ISOLADO, a loja (a informada ou a da requisição, g.loja)
+    tem um engine/pool só dela; sem loja usa o engine principal.
+    """
+    global _engine
+    if loja is None and has_request_context():
+        loja = g.get("loja")
+    if loja is not None and LOJAS_POOL_ISOLADO and DIALETO == "postgresql":
+        engine = _engines_loja.get(loja)
+        if engine is None:
+            with _engine_lock:
+                engine = _engines_loja.get(loja)
+                if engine is None:
+                    engine = _engines_loja[loja] = criar_engine(
+                        DATABASE_URL, pool_size=LOJA_POOL_SIZE, max_overflow=LOJA_MAX_OVERFLOW
+                    )
+        return engine
+
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = criar_engine(DATABASE_URL)
+    return _engine
+
+
+def get_engine_leitura(loja=None):
+    """Engine da réplica de leitura, com o mesmo pool por loja do get_engine.
+
+    Sem DATABASE_READ_URL é o próprio get_engine.
+    """
+    if not DATABASE_READ_URL:
+        return get_engine(loja)
+    if loja is None and has_request_context():
+        loja = g.get("loja")
+    if not (LOJAS_POOL_ISOLADO and DIALETO == "postgresql"):
+        loja = None
+    engine = _engines_leitura.get(loja)
+    if engine is None:
+        with _engine_lock:
+            engine = _engines_leitura.get(loja)
+            if engine is None:
+                tamanho = (DB_POOL_SIZE, DB_MAX_OVERFLOW) if loja is None else (LOJA_POOL_SIZE, LOJA_MAX_OVERFLOW)
+                engine = _engines_leitura[loja] = criar_engine(DATABASE_READ_URL, *tamanho)
+    return engine
+
+
+def marcar_escrita():
+    """Registra na sessão que o usuário acabou de gravar: lê do principal por
+    DB_READ_LAG_MAX e, com o cache em memória, não usa o cache por CACHE_TTL
+    (ver cache.cache_leitura)."""
+    if has_request_context():
+        session["gravou_em"] = time.time()
+
+
+def sessao_gravou_ha(segundos):
+    """A sessão gravou há menos de `segundos`?"""
+    if not has_request_context():
+        return False
+    return time.time() - session.get("gravou_em", 0) < segundos
+
+
+def sessao_gravou_agora():
+    """A sessão gravou há menos de DB_READ_LAG_MAX? (a réplica pode ainda não ter a venda)"""
+    return bool(DATABASE_READ_URL) and sessao_gravou_ha(DB_READ_LAG_MAX)
+
+
+def conectar_leitura(loja=None, gravou_agora=None):
+    """Conexão para relatórios: a réplica, ou o principal quando não há réplica,
+    quando ela está fora do ar ou quando a sessão acabou de gravar (ler o que
+    gravou). Usar como `with conectar_leitura() as conn:`.
+
+    gravou_agora: fora da requisição (threads de relatório), o que
+    sessao_gravou_agora() disse quando o trabalho foi pedido.
+    """
+    global _replica_fora_ate
+    if gravou_agora is None:
+        gravou_agora = sessao_gravou_agora()
+    if not DATABASE_READ_URL or gravou_agora or time.monotonic() < _replica_fora_ate:
+        return get_engine(loja).connect()
+    try:
+        return get_engine_leitura(loja).connect()
+    except OperationalError as e:
+        # Só réplica fora do ar cai no principal; pool da réplica esgotado
+        # (TimeoutError) propaga, para relatório pesado não tomar o pool do caixa
+        _replica_fora_ate = time.monotonic() + DB_READ_RETRY
+        print(f">>> ERRO conectando na réplica (usando o principal por {DB_READ_RETRY:.0f} s):", repr(e))
+        return get_engine(loja).connect()
+
+
+def descartar_engine_herdado():
+    """Depois de um fork (gunicorn --preload), o processo filho não pode
+    reusar as conexões do pai: descarta o pool sem fechá-las no servidor."""
+    for engine in [_engine, *_engines_loja.values(), *_engines_leitura.values()]:
+        if engine is not None:
+            engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=descartar_engine_herdado)
+
+
+def gevent_ativo():
+    """True no worker gevent: o monkey patch trocou as threads por greenlets."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("threading")
+
+
+def executar_nativo(fn, *args):
+    """fn(*args) numa thread de verdade quando o worker é gevent.
+
+    Para o que bloqueia sem ceder a vez (SQLite local, fsync): num greenlet
+    isso pararia todas as requisições do worker enquanto roda.
+    """
+    if gevent_ativo():
+        import gevent
+        return gevent.get_hub().threadpool.apply(fn, args)
+    return fn(*args)
+
+# Logs úteis (aparecem no Render logs). A conexão em si só é testada em /healthz.
+print(">>> DATABASE_URL existe?", bool(os.environ.get("DATABASE_URL")))
+print(">>> DATABASE_URL inicio:", (os.environ.get("DATABASE_URL") or "")[:60])
+print(">>> DATABASE_READ_URL existe?", bool(DATABASE_READ_URL))
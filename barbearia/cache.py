@@ -0,0 +1,169 @@
+"""Cache dos resumos (memória do worker ou Redis) e invalidação por venda."""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+from barbearia.banco import sessao_gravou_agora, sessao_gravou_ha
+
+# =========================
+# CACHE DE RESUMOS (totais do dia/mês, contagens e quebras por período)
+# =========================
+# Chaves são tuplas (tipo, loja ou None p/ todas, barbeiro ou None p/ admin,
+# inicio ISO ou None, fim ISO ou None). Gravações invalidam só as chaves cujo
+# período contém a data da venda, cuja loja é "todas" ou a da venda e cujo
+# escopo é "todos" ou o próprio barbeiro.
+# Sem CACHE_URL cada worker do gunicorn tem o seu cache e a invalidação só
+# alcança o worker que gravou; os outros se corrigem pelo CACHE_TTL (quem
+# gravou não lê o cache nesse intervalo: ver cache_leitura).
+CACHE_TTL = float(os.environ.get("CACHE_TTL", "30"))
+CACHE_MAX = int(os.environ.get("CACHE_MAX", "512"))
+CACHE_URL = os.environ.get("CACHE_URL")
+
+
+def chave_afetada(chave, data_iso, barbeiro, loja):
+    """A venda (data_iso, barbeiro, loja) muda o valor guardado nesta chave?"""
+    _, loja_chave, escopo, inicio, fim = chave
+    if loja_chave is not None and loja_chave != loja:
+        return False
+    if escopo is not None and escopo != barbeiro:
+        return False
+    return (inicio is None or inicio <= data_iso) and (fim is None or data_iso <= fim)
+
+
+class CacheMemoria:
+    """LRU com TTL na memória do processo (padrão)."""
+
+    def __init__(self, maximo=CACHE_MAX, ttl=CACHE_TTL):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+
+    def set(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.maximo:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, predicado):
+        with self._lock:
+            for chave in [k for k in self._itens if predicado(k)]:
+                del self._itens[chave]
+
+
+class CacheRedis:
+    """Backend compartilhado entre workers do gunicorn (CACHE_URL=redis://...).
+
+    A evicção LRU fica por conta do Redis (maxmemory-policy allkeys-lru).
+    """
+
+    # v2: chaves com a loja (as antigas, sem loja, só expiram pelo TTL)
+    prefixo = "barbearia:resumo:v2:"
+
+    def __init__(self, url, ttl=CACHE_TTL):
+        import redis  # dependência opcional, só exigida com CACHE_URL
+
+        self.ttl = ttl
+        self._redis = redis.Redis.from_url(url)
+
+    def _nome(self, chave):
+        return self.prefixo + json.dumps(chave)
+
+    def get(self, chave):
+        bruto = self._redis.get(self._nome(chave))
+        return None if bruto is None else json.loads(bruto)
+
+    def set(self, chave, valor):
+        self._redis.setex(self._nome(chave), max(int(self.ttl), 1), json.dumps(valor))
+
+    def invalidar(self, predicado):
+        for nome in self._redis.scan_iter(match=self.prefixo + "*", count=500):
+            if predicado(tuple(json.loads(nome[len(self.prefixo):]))):
+                self._redis.delete(nome)
+
+
+class CacheResumos:
+    """Fachada do cache com contadores de acerto/erro para monitoramento."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.acertos = 0
+        self.erros = 0
+        self.invalidacoes = 0
+        # += não é atômico entre threads (gthread): os contadores têm lock
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        try:
+            valor = self.backend.get(chave)
+        except Exception as e:
+            print(">>> ERRO no cache:", repr(e))
+            valor = None
+        with self._lock:
+            if valor is None:
+                self.erros += 1
+            else:
+                self.acertos += 1
+        return valor
+
+    def set(self, chave, valor):
+        try:
+            self.backend.set(chave, valor)
+        except Exception as e:
+            print(">>> ERRO no cache:", repr(e))
+
+    def invalidar_venda(self, data, barbeiro, loja):
+        """Derruba só os resumos que incluem a data, o barbeiro e a loja da venda."""
+        data_iso = data.isoformat() if isinstance(data, date) else str(data)
+        try:
+            self.backend.invalidar(lambda chave: chave_afetada(chave, data_iso, barbeiro, loja))
+            with self._lock:
+                self.invalidacoes += 1
+        except Exception as e:
+            print(">>> ERRO no cache:", repr(e))
+
+    def stats(self):
+        with self._lock:
+            acertos, erros, invalidacoes = self.acertos, self.erros, self.invalidacoes
+        consultas = acertos + erros
+        return {
+            "backend": type(self.backend).__name__,
+            "acertos": acertos,
+            "erros": erros,
+            "invalidacoes": invalidacoes,
+            "taxa_acerto": round(acertos / consultas, 4) if consultas else None,
+        }
+
+
+cache_resumos = CacheResumos(CacheRedis(CACHE_URL) if CACHE_URL else CacheMemoria())
+
+
+def cache_leitura(chave):
+    """cache_resumos.get das rotas de relatório. A sessão que acabou de gravar
+    ignora o cache: outro usuário pode tê-lo preenchido pela réplica antes de
+    a venda chegar lá (o valor novo, lido do principal, é gravado por cima).
+
+    Sem CACHE_URL o cache é de cada worker e a gravação só limpou o do
+    worker que a atendeu: até o CACHE_TTL vencer, quem gravou também não
+    usa o cache, para não ver o total antigo de outro worker. Os outros
+    usuários podem ver o valor antigo por até CACHE_TTL.
+    """
+    if sessao_gravou_agora() or (not CACHE_URL and sessao_gravou_ha(CACHE_TTL)):
+        return None
+    return cache_resumos.get(chave)
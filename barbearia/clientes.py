@@ -0,0 +1,226 @@
+"""Diretório de clientes, busca por prefixo e histórico por cliente."""
+from flask import Blueprint, jsonify, request, session
+import re
+from sqlalchemy import text
+
+from barbearia.banco import get_engine
+from barbearia.helpers import VendaLinha, filtro_vendas, normalizar_cliente
+from barbearia.usuarios import loja_da_requisicao
+
+bp = Blueprint("clientes", __name__)
+
+# =========================
+# CLIENTES (diretório, busca e histórico por cliente)
+# =========================
+# vendas.cliente continua texto livre; cliente_norm é o nome normalizado
+# (normalizar_cliente) e clientes guarda um registro por (loja, cliente_norm)
+# com o nome e a data da venda mais recente. A busca é por prefixo de
+# palavra ("jo si" acha "João da Silva"); o histórico lê vendas pelo índice
+# ix_vendas_ativas_cliente. Exclusões não tiram o cliente do diretório.
+CLIENTES_BUSCA_MAX = 20
+# Prefixo curto ("jo") casa com dezenas de milhares de clientes: a ordem por
+# última visita vale entre os N primeiros candidatos de cada índice, o que
+# mantém a busca em poucos ms com qualquer tamanho de diretório
+CLIENTES_BUSCA_CANDIDATOS = 300
+# Menos letras que isso acham clientes demais para uma sugestão útil
+CLIENTES_BUSCA_MIN_LETRAS = 2
+CLIENTES_HISTORICO_ULTIMAS = 10
+
+SQL_CLIENTES_REGISTRAR = text("""
+    INSERT INTO clientes (loja, cliente_norm, nome, ultima_visita)
+    VALUES (:loja, :cliente_norm, :nome, :ultima_visita)
+    ON CONFLICT (loja, cliente_norm) DO UPDATE
+    SET nome = CASE WHEN excluded.ultima_visita >= clientes.ultima_visita
+                    THEN excluded.nome ELSE clientes.nome END,
+        ultima_visita = CASE WHEN excluded.ultima_visita > clientes.ultima_visita
+                             THEN excluded.ultima_visita ELSE clientes.ultima_visita END
+""")
+
+
+def clientes_registrar(conn, vendas):
+    """Acrescenta/atualiza no diretório os clientes das vendas (um UPSERT por cliente)."""
+    recentes = {}
+    for v in vendas:
+        if not v["cliente_norm"]:
+            continue
+        chave = (v["loja"], v["cliente_norm"])
+        atual = recentes.get(chave)
+        if atual is None or v["data"] >= atual["ultima_visita"]:
+            recentes[chave] = {"loja": v["loja"], "cliente_norm": v["cliente_norm"],
+                               "nome": v["cliente"], "ultima_visita": v["data"]}
+    if recentes:
+        conn.execute(SQL_CLIENTES_REGISTRAR, list(recentes.values()))
+
+
+def clientes_reconstruir(conn):
+    """Refaz o diretório de clientes a partir das vendas ativas."""
+    conn.execute(text("DELETE FROM clientes"))
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("""
+            INSERT INTO clientes (loja, cliente_norm, nome, ultima_visita)
+            SELECT DISTINCT ON (loja, cliente_norm) loja, cliente_norm, cliente, data
+            FROM vendas
+            WHERE deleted_at IS NULL AND cliente_norm <> ''
+            ORDER BY loja, cliente_norm, data DESC, hora DESC
+        """))
+    else:
+        conn.execute(text("""
+            INSERT INTO clientes (loja, cliente_norm, nome, ultima_visita)
+            SELECT loja, cliente_norm, cliente, MAX(data)
+            FROM vendas
+            WHERE deleted_at IS NULL AND cliente_norm <> ''
+            GROUP BY loja, cliente_norm
+        """))
+
+
+def termos_busca_cliente(q):
+    """Palavras da busca, normalizadas e só com letras/dígitos (seguras no FTS)."""
+    termos = [t for t in re.sub(r"[\W_]+", " ", normalizar_cliente(q)).split() if t]
+    return termos[:5]
+
+
+def _clientes_candidatos(conn, candidatos, params):
+    return [
+        {"nome": r.nome, "loja": r.loja, "ultima_visita": str(r.ultima_visita)[:10]}
+        for r in conn.execute(text(f"""
+            SELECT nome, loja, ultima_visita
+            FROM clientes
+            WHERE id IN ({candidatos})
+            ORDER BY ultima_visita DESC, nome
+            LIMIT :limite
+        """), params)
+    ]
+
+
+def buscar_clientes(conn, q, loja=None, limite=10):
+    """Clientes cujo nome tem palavras começando com cada termo de q, os
+    mais recentes primeiro. Sem loja (admin de todas as lojas) busca em todas.
+
+    Primeiro tenta o nome que começa com o texto digitado (ix_clientes_prefixo,
+    a varredura para nos primeiros candidatos); só quando isso não enche a
+    lista procura os termos em qualquer palavra do nome (GIN/FTS5), que para
+    prefixos comuns precisa ler todas as ocorrências do índice."""
+    termos = termos_busca_cliente(q)
+    if sum(len(t) for t in termos) < CLIENTES_BUSCA_MIN_LETRAS:
+        return []
+
+    params = {"limite": limite, "candidatos": CLIENTES_BUSCA_CANDIDATOS}
+    filtro_loja = ""
+    if loja:
+        filtro_loja = "AND c.loja = :loja"
+        params["loja"] = loja
+
+    # Nomes que começam com o texto: o intervalo [prefixo, prefixo com a
+    # última letra seguinte), na ordem por código de ix_clientes_prefixo
+    inicio = " ".join(termos)
+    params["prefixo_ini"] = inicio
+    params["prefixo_fim"] = inicio[:-1] + chr(ord(inicio[-1]) + 1)
+    coluna = 'c.cliente_norm COLLATE "C"' if conn.dialect.name == "postgresql" else "c.cliente_norm"
+    prefixo = f"""
+        SELECT c.id FROM clientes AS c
+        WHERE {coluna} >= :prefixo_ini AND {coluna} < :prefixo_fim
+          {filtro_loja}
+        LIMIT :candidatos
+    """
+    encontrados = _clientes_candidatos(conn, prefixo, params)
+    if len(encontrados) >= limite:
+        return encontrados
+
+    if conn.dialect.name == "postgresql":
+        params["consulta"] = " & ".join(f"{t}:*" for t in termos)
+        # OFFSET 0 isola a busca no GIN: com a loja dentro, o LIMIT leva o
+        # planejador a varrer a loja inteira pelo índice (loja, cliente_norm)
+        palavras = f"""
+            SELECT c.id
+            FROM (
+                SELECT id, loja FROM clientes
+                WHERE to_tsvector('simple', cliente_norm) @@ to_tsquery('simple', :consulta)
+                OFFSET 0
+            ) AS c
+            WHERE TRUE {filtro_loja}
+            LIMIT :candidatos
+        """
+    else:
+        params["consulta"] = " ".join(f'"{t}"*' for t in termos)
+        palavras = f"""
+            SELECT c.id
+            FROM clientes_busca
+            JOIN clientes AS c ON c.id = clientes_busca.rowid
+            WHERE clientes_busca MATCH :consulta
+              {filtro_loja}
+            ORDER BY clientes_busca.rowid DESC
+            LIMIT :candidatos
+        """
+    return _clientes_candidatos(
+        conn, f"SELECT id FROM ({prefixo}) AS p UNION SELECT id FROM ({palavras}) AS w", params
+    )
+
+
+def historico_cliente(conn, role, usuario, cliente, loja=None):
+    """Visitas, primeira/última visita, gasto total e as últimas vendas de um
+    cliente, no escopo do usuário (barbeiro só vê as vendas dele)."""
+    where_sql, params = filtro_vendas(role, usuario, loja=loja)
+    params["cliente_norm"] = normalizar_cliente(cliente)
+    where_sql += " AND cliente_norm = :cliente_norm"
+
+    resumo = conn.execute(text(f"""
+        SELECT COUNT(*) AS visitas, MIN(data) AS primeira, MAX(data) AS ultima,
+               COALESCE(SUM(total), 0) AS gasto
+        FROM vendas
+        {where_sql}
+    """), params).one()
+    ultimas = conn.execute(text(f"""
+        SELECT id, data, hora, cliente, barbeiro,
+               cabelo, barba, sobrancelha, produto_nome, produto_valor, desconto, total,
+               pagamento, loja
+        FROM vendas
+        {where_sql}
+        ORDER BY data DESC, hora DESC, id DESC
+        LIMIT :ultimas
+    """), dict(params, ultimas=CLIENTES_HISTORICO_ULTIMAS)).mappings().all()
+
+    gasto = round(float(resumo.gasto), 2)
+    return {
+        "cliente": ultimas[0]["cliente"] if ultimas else cliente,
+        "cliente_norm": params["cliente_norm"],
+        "loja": loja,
+        "visitas": resumo.visitas,
+        "primeira_visita": str(resumo.primeira)[:10] if resumo.primeira else None,
+        "ultima_visita": str(resumo.ultima)[:10] if resumo.ultima else None,
+        "gasto_total": gasto,
+        "ticket_medio": round(gasto / resumo.visitas, 2) if resumo.visitas else None,
+        "ultimas": [VendaLinha(r).como_dict() for r in ultimas],
+    }
+
+
+@bp.route("/api/clientes")
+def api_clientes():
+    """Busca de clientes para o autocompletar: ?q= (prefixos, sem acento) e ?limite=."""
+    if "usuario" not in session:
+        return jsonify({"erro": "não autenticado"}), 401
+
+    try:
+        limite = min(max(int(request.args.get("limite") or 10), 1), CLIENTES_BUSCA_MAX)
+    except ValueError:
+        return jsonify({"erro": "limite inválido"}), 400
+
+    with get_engine().connect() as conn:
+        clientes = buscar_clientes(conn, request.args.get("q", ""), loja=loja_da_requisicao(), limite=limite)
+    return jsonify({"clientes": clientes})
+
+
+@bp.route("/api/clientes/historico")
+def api_cliente_historico():
+    """Histórico de um cliente (?cliente=nome): visitas, última visita, gasto total e últimas vendas."""
+    if "usuario" not in session:
+        return jsonify({"erro": "não autenticado"}), 401
+
+    cliente = request.args.get("cliente", "")
+    if not normalizar_cliente(cliente):
+        return jsonify({"erro": "informe ?cliente="}), 400
+
+    with get_engine().connect() as conn:
+        historico_cli = historico_cliente(
+            conn, session.get("role"), session.get("usuario"), cliente, loja=loja_da_requisicao()
+        )
+    return jsonify(historico_cli)
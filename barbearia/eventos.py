@@ -0,0 +1,238 @@
+"""Eventos ao vivo (SSE) das vendas: canal em memória e LISTEN/NOTIFY no Postgres."""
+from flask import Blueprint, Response, jsonify, session
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import text
+
+from barbearia.banco import DIALETO, TZ_BR, get_engine
+from barbearia.metricas import metricas
+from barbearia.usuarios import loja_da_requisicao
+
+bp = Blueprint("eventos", __name__)
+
+# =========================
+# EVENTOS AO VIVO (SSE)
+# =========================
+# registrar/lote/excluir publicam num canal em memória; cada conexão de
+# /eventos tem sua fila. Com EVENTOS_PG=1 (Postgres) a publicação vai por
+# NOTIFY e uma thread por worker faz LISTEN e repassa para as filas locais,
+# assim todos os workers/instâncias recebem tudo.
+#
+# O gunicorn roda com workers gevent (ver gunicorn.conf.py): cada conexão
+# aberta é um greenlet. Com GUNICORN_WORKER_CLASS=gthread cada uma ocupa uma
+# thread e EVENTOS_MAX_CONEXOES cai para metade das threads.
+EVENTOS_HEARTBEAT = float(os.environ.get("EVENTOS_HEARTBEAT", "15"))
+EVENTOS_MAX_CONEXOES = int(os.environ.get("EVENTOS_MAX_CONEXOES", "50"))
+EVENTOS_FILA = int(os.environ.get("EVENTOS_FILA", "100"))
+EVENTOS_PG = os.environ.get("EVENTOS_PG", "0") == "1" and DIALETO == "postgresql"
+# LISTEN precisa de conexão direta (não funciona via PgBouncer em modo transação)
+EVENTOS_PG_URL = os.environ.get("EVENTOS_PG_URL", "")
+EVENTOS_PG_CANAL = "barbearia_vendas"
+# NOTIFY aceita até 8000 bytes: lotes grandes vão em vários avisos
+EVENTOS_VENDAS_POR_AVISO = 20
+
+
+class CanalEventos:
+    """Pub/sub em memória: uma fila por conexão SSE deste processo."""
+
+    def __init__(self, tamanho_fila=EVENTOS_FILA):
+        self.tamanho_fila = tamanho_fila
+        self._filas = set()
+        self._lock = threading.Lock()
+
+    def assinar(self):
+        fila = queue.Queue(maxsize=self.tamanho_fila)
+        with self._lock:
+            self._filas.add(fila)
+        return fila
+
+    def cancelar(self, fila):
+        with self._lock:
+            self._filas.discard(fila)
+
+    def conexoes(self):
+        with self._lock:
+            return len(self._filas)
+
+    def distribuir(self, evento):
+        with self._lock:
+            filas = list(self._filas)
+        for fila in filas:
+            try:
+                fila.put_nowait(evento)
+            except queue.Full:
+                # Cliente parado: perde o evento; ao reconectar usa /api/vendas/sync
+                metricas.somar("barbearia_eventos_descartados_total", {})
+
+
+canal_eventos = CanalEventos()
+_eventos_ouvinte = None
+_eventos_ouvinte_lock = threading.Lock()
+
+
+def _eventos_totais(conn, lojas):
+    """Totais do dia e do mês, lidos do rollup: o geral (todas as lojas) e,
+    só das lojas informadas, o da loja e o de cada barbeiro."""
+    hoje = datetime.now(TZ_BR).date()
+    rows = conn.execute(
+        text("""
+            SELECT loja, barbeiro,
+                   COALESCE(SUM(CASE WHEN data = :hoje THEN total ELSE 0 END), 0) AS dia,
+                   COALESCE(SUM(total), 0) AS mes
+            FROM vendas_diarias
+            WHERE data >= :mes_inicio AND data <= :hoje
+            GROUP BY loja, barbeiro
+        """),
+        {"hoje": hoje, "mes_inicio": hoje.replace(day=1)},
+    ).all()
+
+    geral = {"dia": 0.0, "mes": 0.0}
+    por_loja = {}
+    for r in rows:
+        dia, mes = float(r.dia), float(r.mes)
+        geral["dia"] += dia
+        geral["mes"] += mes
+        if r.loja in lojas:
+            da_loja = por_loja.setdefault(r.loja, {"dia": 0.0, "mes": 0.0, "por_barbeiro": {}})
+            da_loja["dia"] = round(da_loja["dia"] + dia, 2)
+            da_loja["mes"] = round(da_loja["mes"] + mes, 2)
+            da_loja["por_barbeiro"][r.barbeiro] = {"dia": round(dia, 2), "mes": round(mes, 2)}
+    return {
+        "data": hoje.isoformat(),
+        "geral": {"dia": round(geral["dia"], 2), "mes": round(geral["mes"], 2)},
+        "por_loja": por_loja,
+    }
+
+
+def _evento_venda(v):
+    return {
+        "id": v["id"],
+        "data": str(v["data"])[:10],
+        "hora": v["hora"],
+        "cliente": v["cliente"],
+        "barbeiro": v["barbeiro"],
+        "pagamento": v["pagamento"],
+        "total": round(float(v["total"] or 0), 2),
+        "loja": v["loja"],
+    }
+
+
+def eventos_publicar(tipo, vendas):
+    """Avisa as telas abertas de vendas novas ("nova") ou excluídas ("excluida").
+
+    Chamado depois do commit. Sem ninguém ouvindo (e sem a ponte Postgres)
+    não faz nada, nem a consulta dos totais.
+    """
+    if not vendas or (not EVENTOS_PG and canal_eventos.conexoes() == 0):
+        return
+
+    try:
+        with get_engine().begin() as conn:
+            totais = _eventos_totais(conn, {v["loja"] for v in vendas})
+            for i in range(0, len(vendas), EVENTOS_VENDAS_POR_AVISO):
+                parte = [_evento_venda(v) for v in vendas[i:i + EVENTOS_VENDAS_POR_AVISO]]
+                # cada aviso leva só os totais das lojas dele (limite do NOTIFY)
+                lojas = {v["loja"] for v in parte}
+                evento = {
+                    "tipo": tipo,
+                    "vendas": parte,
+                    "totais": {**totais, "por_loja": {nome: totais["por_loja"][nome] for nome in lojas}},
+                }
+                if EVENTOS_PG:
+                    conn.execute(text("SELECT pg_notify(:canal, :payload)"),
+                                 {"canal": EVENTOS_PG_CANAL, "payload": json.dumps(evento)})
+                else:
+                    canal_eventos.distribuir(evento)
+    except Exception as e:
+        # A venda já foi gravada: falha no aviso não pode virar erro 500
+        print(">>> ERRO publicando evento:", repr(e))
+
+
+def _eventos_escutar_postgres():
+    """Thread do worker: LISTEN no Postgres e repasse para o canal local."""
+    import psycopg  # já é dependência do app (driver do Postgres)
+
+    url = EVENTOS_PG_URL or get_engine().url.set(drivername="postgresql").render_as_string(hide_password=False)
+    while True:
+        try:
+            with psycopg.connect(url, autocommit=True) as pg:
+                pg.execute(f"LISTEN {EVENTOS_PG_CANAL}")
+                print(">>> EVENTOS: escutando", EVENTOS_PG_CANAL)
+                for aviso in pg.notifies():
+                    canal_eventos.distribuir(json.loads(aviso.payload))
+        except Exception as e:
+            print(">>> ERRO no LISTEN de eventos (tentando de novo em 5 s):", repr(e))
+            time.sleep(5)
+
+
+def eventos_iniciar_ouvinte():
+    """Sobe a thread do LISTEN na primeira conexão SSE (já dentro do worker)."""
+    global _eventos_ouvinte
+    if not EVENTOS_PG:
+        return
+    with _eventos_ouvinte_lock:
+        if _eventos_ouvinte is None or not _eventos_ouvinte.is_alive():
+            _eventos_ouvinte = threading.Thread(target=_eventos_escutar_postgres, name="eventos-listen", daemon=True)
+            _eventos_ouvinte.start()
+
+
+def evento_para_usuario(evento, role, usuario, loja):
+    """Recorta o evento para quem está vendo: só a loja dele (loja=None:
+    admin de todas) e, para barbeiro, só o que é dele."""
+    if loja is None:
+        if role != "admin":
+            return None
+        vendas = evento["vendas"]
+        totais = dict(evento["totais"]["geral"])
+    else:
+        vendas = [v for v in evento["vendas"]
+                  if v["loja"] == loja and (role == "admin" or v["barbeiro"] == usuario)]
+        if not vendas:
+            return None
+        da_loja = evento["totais"]["por_loja"][loja]
+        if role == "admin":
+            totais = da_loja
+        else:
+            totais = da_loja["por_barbeiro"].get(usuario, {"dia": 0.0, "mes": 0.0})
+    return {"vendas": vendas, "totais": {"data": evento["totais"]["data"], **totais}}
+
+
+@bp.route("/eventos")
+def eventos():
+    """Server-Sent Events: vendas novas/excluídas e totais do dia/mês."""
+    if "usuario" not in session:
+        return jsonify({"erro": "não autenticado"}), 401
+
+    if canal_eventos.conexoes() >= EVENTOS_MAX_CONEXOES:
+        return Response("muitas conexões de eventos neste worker", status=503, headers={"Retry-After": "10"})
+
+    role = session.get("role")
+    usuario = session.get("usuario")
+    loja = loja_da_requisicao()
+    eventos_iniciar_ouvinte()
+    fila = canal_eventos.assinar()
+
+    def gerar():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    evento = fila.get(timeout=EVENTOS_HEARTBEAT)
+                except queue.Empty:
+                    # comentário SSE: mantém a conexão viva em proxies
+                    yield ": ping\n\n"
+                    continue
+                dados = evento_para_usuario(evento, role, usuario, loja)
+                if dados is not None:
+                    yield f"event: {evento['tipo']}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+        finally:
+            canal_eventos.cancelar(fila)
+
+    return Response(gerar(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
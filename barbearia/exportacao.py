@@ -0,0 +1,301 @@
+"""Formatos de exportação das vendas (CSV, CSV.gz, Parquet e Arrow) em partes."""
+import csv
+import io
+import os
+import zlib
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+
+from barbearia.helpers import formatar_data, formatar_valor
+
+# Quantas linhas o cursor do servidor traz por vez e quantas linhas de CSV
+# acumular antes de mandar um pedaço para o cliente
+DOWNLOAD_LOTE = int(os.environ.get("DOWNLOAD_LOTE", "1000"))
+
+# Linhas detalhadas do CSV (download e relatórios em segundo plano)
+SQL_VENDAS_DETALHADAS = """
+    SELECT id, data, hora, cliente, barbeiro,
+           cabelo, barba, sobrancelha, produto_nome, produto_valor, desconto, total,
+           pagamento, loja
+    FROM vendas
+    {where_sql}
+    ORDER BY data DESC, hora DESC
+"""
+
+
+def csv_vendas_em_partes(rows, data_inicio_str="", data_fim_str=""):
+    """Gera o CSV do download em pedaços (str) a partir de um iterável de linhas.
+
+    Os resumos do fim do arquivo são acumulados enquanto as linhas passam,
+    então a memória fica constante qualquer que seja o tamanho do período.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def despejar():
+        parte = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return parte
+
+    total_periodo = 0.0
+    por_barbeiro, por_dia, por_pagamento = {}, {}, {}
+
+    # ======================
+    # DETALHADO (linhas)
+    # ======================
+    writer.writerow([
+        "Data", "Hora", "Cliente", "Barbeiro",
+        "Cabelo", "Barba", "Sobrancelha",
+        "Produto", "Valor Produto",
+        "Pagamento",
+        "Desconto", "Total"
+    ])
+
+    for i, r in enumerate(rows, 1):
+        d = r["data"]
+        data_str = formatar_data(d)
+        total = r["total"]
+        barbeiro = r["barbeiro"] or ""
+        pagamento = r["pagamento"] or "nao_informado"
+
+        writer.writerow([
+            data_str,
+            r["hora"] or "",
+            r["cliente"] or "",
+            barbeiro,
+            formatar_valor(r["cabelo"]),
+            formatar_valor(r["barba"]),
+            formatar_valor(r["sobrancelha"]),
+            r["produto_nome"] or "",
+            formatar_valor(r["produto_valor"]),
+            pagamento,
+            formatar_valor(r["desconto"]),
+            formatar_valor(total),
+        ])
+
+        total = float(total or 0)
+        total_periodo += total
+        por_barbeiro[barbeiro] = por_barbeiro.get(barbeiro, 0.0) + total
+        por_pagamento[pagamento] = por_pagamento.get(pagamento, 0.0) + total
+        # chave (data ISO, texto formatado): ordena certo em Postgres e SQLite
+        chave_dia = (str(d), data_str)
+        por_dia[chave_dia] = por_dia.get(chave_dia, 0.0) + total
+
+        if i % DOWNLOAD_LOTE == 0:
+            yield despejar()
+
+    # ======================
+    # RESUMO
+    # ======================
+    writer.writerow([])
+    writer.writerow(["RESUMO DO PERÍODO (conforme filtros aplicados)"])
+    writer.writerow(["Data inicial", data_inicio_str or "(sem)"])
+    writer.writerow(["Data final", data_fim_str or "(sem)"])
+    writer.writerow(["Total do período", f"{total_periodo:.2f}"])
+
+    # ======================
+    # TOTAL POR BARBEIRO
+    # ======================
+    writer.writerow([])
+    writer.writerow(["TOTAL POR BARBEIRO NO PERÍODO"])
+    writer.writerow(["Barbeiro", "Total"])
+
+    for barbeiro, total in sorted(por_barbeiro.items()):
+        writer.writerow([barbeiro, f"{total:.2f}"])
+
+    # ======================
+    # TOTAL POR DIA
+    # ======================
+    writer.writerow([])
+    writer.writerow(["TOTAL POR DIA NO PERÍODO"])
+    writer.writerow(["Data", "Total"])
+
+    for (_, data_str), total in sorted(por_dia.items()):
+        writer.writerow([data_str, f"{total:.2f}"])
+
+    # ======================
+    # TOTAL POR PAGAMENTO
+    # ======================
+    writer.writerow([])
+    writer.writerow(["TOTAL POR FORMA DE PAGAMENTO NO PERÍODO"])
+    writer.writerow(["Pagamento", "Total"])
+
+    for pagamento, total in sorted(por_pagamento.items()):
+        writer.writerow([pagamento, f"{total:.2f}"])
+
+    yield despejar()
+
+
+# =========================
+# FORMATOS DE EXPORTAÇÃO
+# =========================
+# /download?formato=... (padrão csv). Todos saem em pedaços da mesma
+# consulta filtrada; parquet/arrow precisam do pyarrow instalado.
+COLUNAS_EXPORTACAO = [
+    "id", "data", "hora", "cliente", "barbeiro", "cabelo", "barba", "sobrancelha",
+    "produto_nome", "produto_valor", "desconto", "total", "pagamento", "loja",
+]
+COLUNAS_VALOR = ("cabelo", "barba", "sobrancelha", "produto_valor", "desconto", "total")
+
+# Linhas por record batch / row group do Parquet (grupos maiores comprimem
+# melhor; a memória do download fica limitada a um grupo)
+EXPORTACAO_LINHAS_POR_GRUPO = int(os.environ.get("EXPORTACAO_LINHAS_POR_GRUPO", "20000"))
+
+
+def data_iso(d):
+    """date (Postgres) ou texto 'YYYY-MM-DD...' (SQLite) -> date."""
+    return d if isinstance(d, date) else date.fromisoformat(str(d)[:10])
+
+
+def csv_dados_em_partes(rows):
+    """CSV só com as linhas: datas ISO, valores com ponto, sem blocos de resumo."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUNAS_EXPORTACAO)
+
+    for i, r in enumerate(rows, 1):
+        writer.writerow([
+            r["id"],
+            str(r["data"])[:10],
+            r["hora"] or "",
+            r["cliente"] or "",
+            r["barbeiro"] or "",
+            formatar_valor(r["cabelo"]),
+            formatar_valor(r["barba"]),
+            formatar_valor(r["sobrancelha"]),
+            r["produto_nome"] or "",
+            formatar_valor(r["produto_valor"]),
+            formatar_valor(r["desconto"]),
+            formatar_valor(r["total"]),
+            r["pagamento"] or "nao_informado",
+            r["loja"],
+        ])
+        if i % DOWNLOAD_LOTE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def gzip_em_partes(partes):
+    """Comprime (gzip) um gerador de pedaços str sem juntar o arquivo inteiro."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = cabeçalho gzip
+    for parte in partes:
+        comprimido = compressor.compress(parte.encode("utf-8"))
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
+
+
+class _SaidaEmPartes(io.RawIOBase):
+    """Arquivo só de escrita que guarda os bytes até alguém recolher.
+
+    O pyarrow grava os offsets do Parquet a partir de tell(), então a posição
+    é contada aqui e não volta a zero quando os pedaços são entregues.
+    """
+
+    def __init__(self):
+        self._partes = []
+        self._posicao = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._partes.append(bytes(b))
+        self._posicao += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._posicao
+
+    def recolher(self):
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def arrow_em_partes(rows, formato):
+    """Parquet ou Arrow IPC (stream) com tipos de verdade: DATE e NUMERIC(10,2).
+
+    Cada EXPORTACAO_LINHAS_POR_GRUPO linhas viram um record batch (um row
+    group no Parquet), enviado assim que fica pronto.
+    """
+    import pyarrow as pa  # dependência opcional, só exigida por estes formatos
+    import pyarrow.parquet as pq
+
+    valor = pa.decimal128(10, 2)
+    esquema = pa.schema([
+        ("id", pa.int64()),
+        ("data", pa.date32()),
+        ("hora", pa.string()),
+        ("cliente", pa.string()),
+        ("barbeiro", pa.string()),
+        ("cabelo", valor),
+        ("barba", valor),
+        ("sobrancelha", valor),
+        ("produto_nome", pa.string()),
+        ("produto_valor", valor),
+        ("desconto", valor),
+        ("total", valor),
+        ("pagamento", pa.string()),
+        ("loja", pa.string()),
+    ])
+
+    saida = _SaidaEmPartes()
+    if formato == "parquet":
+        escritor = pq.ParquetWriter(saida, esquema, compression="zstd")
+        gravar = escritor.write_table
+    else:
+        escritor = pa.ipc.new_stream(saida, esquema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+        gravar = escritor.write_batch
+
+    def lote_para_arrow(lote):
+        colunas = {c: [r[c] for r in lote] for c in COLUNAS_EXPORTACAO}
+        colunas["data"] = [data_iso(d) for d in colunas["data"]]
+        for c in COLUNAS_VALOR:
+            colunas[c] = [Decimal(formatar_valor(v)) for v in colunas[c]]
+        colunas["pagamento"] = [p or "nao_informado" for p in colunas["pagamento"]]
+        batch = pa.record_batch([colunas[c] for c in COLUNAS_EXPORTACAO], schema=esquema)
+        return pa.Table.from_batches([batch]) if formato == "parquet" else batch
+
+    lote = []
+    for r in rows:
+        lote.append(r)
+        if len(lote) >= EXPORTACAO_LINHAS_POR_GRUPO:
+            gravar(lote_para_arrow(lote))
+            lote = []
+            yield saida.recolher()
+    if lote:
+        gravar(lote_para_arrow(lote))
+    escritor.close()
+    yield saida.recolher()
+
+
+@lru_cache(maxsize=None)
+def pyarrow_disponivel():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# formato -> (gerador(rows, data_inicio_str, data_fim_str), mimetype, extensão)
+FORMATOS_DOWNLOAD = {
+    "csv": (csv_vendas_em_partes, "text/csv", "csv"),
+    "csv.gz": (lambda rows, ini, fim: gzip_em_partes(csv_vendas_em_partes(rows, ini, fim)),
+               "application/gzip", "csv.gz"),
+    "dados": (lambda rows, ini, fim: csv_dados_em_partes(rows), "text/csv", "dados.csv"),
+    "dados.gz": (lambda rows, ini, fim: gzip_em_partes(csv_dados_em_partes(rows)),
+                 "application/gzip", "dados.csv.gz"),
+    "parquet": (lambda rows, ini, fim: arrow_em_partes(rows, "parquet"),
+                "application/vnd.apache.parquet", "parquet"),
+    "arrow": (lambda rows, ini, fim: arrow_em_partes(rows, "arrow"),
+              "application/vnd.apache.arrow.stream", "arrows"),
+}
+FORMATOS_ARROW = ("parquet", "arrow")
@@ -0,0 +1,190 @@
+"""Conversões e formatação usadas em todo o app (datas, valores, cursores, filtros)."""
+import os
+from datetime import datetime, date
+from functools import lru_cache
+
+# =========================
+# HELPERS
+# =========================
+def to_float(value) -> float:
+    try:
+        return float(value or 0)
+    except Exception:
+        return 0.0
+
+
+def parse_date_yyyy_mm_dd(s: str):
+    """Recebe 'YYYY-MM-DD' (do input date) e retorna date() ou None."""
+    if not s:
+        return None
+    try:
+        return datetime.strptime(s, "%Y-%m-%d").date()
+    except Exception:
+        return None
+
+
+def normalizar_loja(s):
+    """Identificador de loja: minúsculo e sem espaços nas pontas ('' -> None)."""
+    return str(s or "").strip().lower() or None
+
+
+# Também vai para o translate() do Postgres (schema.SQL_NORMALIZAR_CLIENTE_PG)
+ACENTOS_DE = "áàâãäéèêëíìîïóòôõöúùûüçñÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑ"
+ACENTOS_PARA = "aaaaaeeeeiiiiooooouuuucn" * 2
+_TABELA_ACENTOS = str.maketrans(ACENTOS_DE, ACENTOS_PARA)
+
+
+def normalizar_cliente(s):
+    """Nome do cliente para busca: sem acentos, minúsculo e com espaços simples."""
+    return " ".join(str(s or "").translate(_TABELA_ACENTOS).lower().split())
+
+
+def filtro_vendas(role, usuario, data_inicio=None, data_fim=None, apenas_ativas=True, loja=None):
+    """Monta (where_sql, params) do filtro padrão: ativas, loja, permissão e período.
+
+    Com apenas_ativas=False serve para tabelas sem deleted_at (vendas_diarias).
+    Sem loja (admin de todas as lojas) não filtra por loja.
+    """
+    # ✅ sempre ignora deletadas
+    where = ["deleted_at IS NULL"] if apenas_ativas else ["1 = 1"]
+    params = {}
+
+    if loja:
+        where.append("loja = :loja")
+        params["loja"] = loja
+
+    if role != "admin":
+        where.append("barbeiro = :barbeiro")
+        params["barbeiro"] = usuario
+
+    if data_inicio:
+        where.append("data >= :data_inicio")
+        params["data_inicio"] = data_inicio
+
+    if data_fim:
+        where.append("data <= :data_fim")
+        params["data_fim"] = data_fim
+
+    return " WHERE " + " AND ".join(where), params
+
+
+# Janela de atraso do cursor de sync: vendas com updated_at nos últimos N
+# segundos voltam no sync seguinte, porque uma transação que começou antes
+# ainda pode estar para ser confirmada (vale se nenhuma gravação de venda
+# demora mais que isso)
+SYNC_ATRASO_S = int(os.environ.get("SYNC_ATRASO_S", "30"))
+
+
+def cursor_sync(updated_at, venda_id):
+    """Cursor do /api/vendas/sync: 'updated_at~id' da última mudança entregue."""
+    return f"{updated_at}~{venda_id}"
+
+
+def parse_cursor_sync(s: str):
+    """Recebe o cursor de cursor_sync() e retorna os params do keyset (ou None)."""
+    try:
+        updated_at, venda_id = (s or "").split("~")
+        datetime.fromisoformat(updated_at)  # só valida o formato
+        return {"c_upd": updated_at, "c_id": int(venda_id)}
+    except Exception:
+        return None
+
+
+def cursor_historico(r):
+    """Cursor de paginação 'YYYY-MM-DD_HH:MM_id' a partir de uma linha de vendas."""
+    d = r.get("data")
+    data_iso = d.isoformat() if isinstance(d, date) else str(d)
+    return f"{data_iso}_{r.get('hora')}_{r.get('id')}"
+
+
+def parse_cursor_historico(s: str):
+    """Recebe o cursor de cursor_historico() e retorna os params do keyset (ou None)."""
+    try:
+        data_iso, hora, venda_id = (s or "").split("_")
+        return {
+            "c_data": datetime.strptime(data_iso, "%Y-%m-%d").date(),
+            "c_hora": hora,
+            "c_id": int(venda_id),
+        }
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def formatar_data(d):
+    """date (Postgres) ou 'YYYY-MM-DD' (SQLite) -> 'dd/mm/YYYY'.
+
+    Memoizado: as mesmas poucas centenas de datas se repetem em toda linha.
+    """
+    if isinstance(d, date):
+        return d.strftime("%d/%m/%Y")
+    try:
+        return datetime.strptime(str(d), "%Y-%m-%d").strftime("%d/%m/%Y")
+    except Exception:
+        return str(d or "")
+
+
+@lru_cache(maxsize=4096)
+def formatar_valor(v):
+    """Decimal/float/None -> '0.00' (memoizado: os preços se repetem muito)."""
+    return f"{float(v or 0):.2f}"
+
+
+class VendaLinha:
+    """Venda pronta pro template: guarda os valores crus e formata sob demanda.
+
+    Substitui o dict de 14 chaves montado por linha; as datas e valores
+    formatados vêm dos caches de formatar_data/formatar_valor.
+    """
+
+    __slots__ = (
+        "id", "hora", "cliente", "barbeiro", "produto_nome", "pagamento", "loja", "pendente",
+        "_data", "_cabelo", "_barba", "_sobrancelha", "_produto_valor", "_desconto", "_total",
+    )
+
+    def __init__(self, r):
+        self.id = r["id"]
+        # ainda no outbox local (sem id no banco)
+        self.pendente = bool(r.get("pendente"))
+        self.hora = r["hora"] or ""
+        self.cliente = r["cliente"] or ""
+        self.barbeiro = r["barbeiro"] or ""
+        self.produto_nome = r["produto_nome"] or ""
+        self.pagamento = r["pagamento"] or "nao_informado"
+        self.loja = r["loja"]
+        self._data = r["data"]
+        self._cabelo = r["cabelo"]
+        self._barba = r["barba"]
+        self._sobrancelha = r["sobrancelha"]
+        self._produto_valor = r["produto_valor"]
+        self._desconto = r["desconto"]
+        self._total = r["total"]
+
+    data = property(lambda self: formatar_data(self._data))
+    cabelo = property(lambda self: formatar_valor(self._cabelo))
+    barba = property(lambda self: formatar_valor(self._barba))
+    sobrancelha = property(lambda self: formatar_valor(self._sobrancelha))
+    produto_valor = property(lambda self: formatar_valor(self._produto_valor))
+    # Mantém compatibilidade com o nome antigo
+    produto = produto_valor
+    desconto = property(lambda self: formatar_valor(self._desconto))
+    total = property(lambda self: formatar_valor(self._total))
+
+    def como_dict(self):
+        """Forma JSON (APIs): data ISO e valores numéricos."""
+        return {
+            "id": self.id,
+            "data": str(self._data)[:10],
+            "hora": self.hora,
+            "cliente": self.cliente,
+            "barbeiro": self.barbeiro,
+            "cabelo": float(self._cabelo or 0),
+            "barba": float(self._barba or 0),
+            "sobrancelha": float(self._sobrancelha or 0),
+            "produto_nome": self.produto_nome,
+            "produto_valor": float(self._produto_valor or 0),
+            "desconto": float(self._desconto or 0),
+            "total": float(self._total or 0),
+            "pagamento": self.pagamento,
+            "loja": self.loja,
+        }
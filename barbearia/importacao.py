@@ -0,0 +1,267 @@
+"""Importação do histórico legado (historico.csv) e `flask vendas importar`."""
+import click
+import csv
+import hashlib
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+from sqlalchemy import text
+
+from barbearia.banco import LOJA_PADRAO, get_engine
+from barbearia.clientes import clientes_registrar
+from barbearia.helpers import normalizar_cliente, normalizar_loja
+from barbearia.particoes import garantir_particoes_dos_meses
+from barbearia.rollup import rollup_somar_vendas
+from barbearia.vendas import vendas_cli
+
+# =========================
+# IMPORTAÇÃO DO HISTÓRICO LEGADO (historico.csv)
+# =========================
+# Formato antigo: Data,Hora,Cliente,Barbeiro,Cabelo,Barba,Sobrancelha,Desconto,Valor Final
+# com datas dd/mm/YYYY e hora com segundos.
+COLUNAS_HISTORICO_LEGADO = [
+    "Data", "Hora", "Cliente", "Barbeiro", "Cabelo", "Barba", "Sobrancelha", "Desconto", "Valor Final",
+]
+COLUNAS_IMPORTACAO = [
+    "data", "hora", "cliente", "barbeiro", "cabelo", "barba", "sobrancelha",
+    "produto_valor", "desconto", "total", "pagamento", "loja", "cliente_norm",
+]
+
+
+def linha_nao_utf8(caminho):
+    """Número da primeira linha do arquivo que não é UTF-8 válido (ou None)."""
+    with open(caminho, "rb") as f:
+        for numero, bruta in enumerate(f, 1):
+            try:
+                bruta.decode("utf-8")
+            except UnicodeDecodeError:
+                return numero
+    return None
+
+
+def hash_arquivo(caminho):
+    """sha256 do conteúdo: identifica o arquivo para retomar a importação."""
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=8192)
+def data_legado(data_str):
+    """'dd/mm/YYYY' -> date (memoizado: poucas datas distintas se repetem muito)."""
+    try:
+        return datetime.strptime(data_str, "%d/%m/%Y").date()
+    except ValueError:
+        raise ValueError(f"data inválida: {data_str!r}")
+
+
+def hora_legado(hora_str):
+    """'HH:MM:SS' ou 'HH:MM' -> 'HH:MM' (sem strptime, que é lento por linha)."""
+    partes = hora_str.split(":")
+    try:
+        h, m = int(partes[0]), int(partes[1])
+        ok = len(partes) in (2, 3) and 0 <= h < 24 and 0 <= m < 60
+    except (ValueError, IndexError):
+        ok = False
+    if not ok:
+        raise ValueError(f"hora inválida: {hora_str!r}")
+    return f"{h:02d}:{m:02d}"
+
+
+def linha_legado_para_venda(campos, mapa_barbeiro, loja=LOJA_PADRAO):
+    """Converte uma linha do historico.csv em tupla na ordem de COLUNAS_IMPORTACAO."""
+    if len(campos) != len(COLUNAS_HISTORICO_LEGADO):
+        raise ValueError(f"esperava {len(COLUNAS_HISTORICO_LEGADO)} colunas, veio {len(campos)}")
+
+    data_str, hora_str, cliente, barbeiro, cabelo, barba, sobrancelha, desconto, total = (
+        c.strip() for c in campos
+    )
+    data_venda = data_legado(data_str)
+    hora = hora_legado(hora_str)
+    try:
+        valores = [round(float(v or 0), 2) for v in (cabelo, barba, sobrancelha, desconto, total)]
+    except ValueError:
+        raise ValueError("valor numérico inválido")
+
+    barbeiro = barbeiro.lower()
+    barbeiro = mapa_barbeiro.get(barbeiro, barbeiro)
+    cabelo, barba, sobrancelha, desconto, total = valores
+    return (
+        data_venda, hora, cliente, barbeiro, cabelo, barba, sobrancelha,
+        0.0, desconto, max(total, 0.0), "nao_informado", loja, normalizar_cliente(cliente),
+    )
+
+
+def carregar_vendas_importadas(conn, linhas):
+    """Grava as tuplas: COPY no Postgres, executemany no SQLite.
+
+    updated_at é a própria data da venda: o histórico importado fica antes de
+    qualquer cursor do /api/vendas/sync e não é reenviado aos tablets.
+    """
+    colunas = ", ".join(COLUNAS_IMPORTACAO) + ", updated_at"
+    if conn.dialect.name == "postgresql":
+        cursor = conn.connection.driver_connection.cursor()
+        with cursor.copy(f"COPY vendas ({colunas}) FROM STDIN") as copy:
+            for linha in linhas:
+                copy.write_row(linha + (linha[0],))
+    else:
+        # executemany direto no sqlite3 com tuplas: evita o processamento de
+        # parâmetros por linha do SQLAlchemy (que domina o tempo em 1M linhas)
+        marcadores = ", ".join("?" for _ in COLUNAS_IMPORTACAO) + ", ?"
+        # cache de páginas maior: a manutenção dos índices em datas aleatórias
+        # deixa de ir ao disco a cada linha
+        conn.exec_driver_sql("PRAGMA cache_size = -262144")
+        conn.connection.driver_connection.executemany(
+            f"INSERT INTO vendas ({colunas}) VALUES ({marcadores})",
+            ((linha[0].isoformat(),) + linha[1:] + (f"{linha[0].isoformat()} 00:00:00",) for linha in linhas)
+        )
+
+    # rollup e clientes do lote, agregados antes de ir pro banco
+    vendas = [dict(zip(COLUNAS_IMPORTACAO, linha)) for linha in linhas]
+    rollup_somar_vendas(conn, vendas)
+    clientes_registrar(conn, vendas)
+
+
+def importar_historico_csv(caminho, lote=50000, mapa_barbeiro=None, reportar_erro=print, loja=LOJA_PADRAO):
+    """Importa um historico.csv legado em lotes, retomando de onde parou.
+
+    Cada lote é gravado numa transação junto com o progresso em importacoes,
+    então uma interrupção nunca duplica nem perde linhas. Retorna
+    (linhas_lidas, inseridas, erros) acumulados. Arquivo ilegível (CSV
+    quebrado, encoding errado) ou lote recusado pelo banco viram
+    ClickException com o arquivo e a linha; o lote em andamento é
+    descartado e os anteriores continuam gravados.
+    """
+    mapa_barbeiro = mapa_barbeiro or {}
+    arquivo_hash = hash_arquivo(caminho)
+
+    with get_engine().begin() as conn:
+        progresso = conn.execute(
+            text("SELECT linhas_lidas, inseridas, erros, concluida FROM importacoes WHERE arquivo_hash = :h"),
+            {"h": arquivo_hash}
+        ).first()
+        if progresso is None:
+            conn.execute(
+                text("INSERT INTO importacoes (arquivo_hash, arquivo) VALUES (:h, :a)"),
+                {"h": arquivo_hash, "a": os.path.basename(caminho)}
+            )
+            progresso = (0, 0, 0, 0)
+
+    linhas_lidas, inseridas, erros, concluida = progresso
+    if concluida:
+        return linhas_lidas, inseridas, erros
+
+    # Linhas de dados já gravadas (o que importacoes diz) para as mensagens de erro
+    gravadas_ate = linhas_lidas
+
+    def falha(onde, motivo):
+        if not gravadas_ate:
+            return click.ClickException(f"{caminho}, {onde}: {motivo}. Nenhuma linha foi gravada")
+        # O progresso é pelo hash do conteúdo: o arquivo corrigido é outra importação
+        return click.ClickException(
+            f"{caminho}, {onde}: {motivo}. O lote em andamento não foi gravado, mas as linhas 2 a "
+            f"{gravadas_ate + 1} já estão no banco: no arquivo corrigido deixe só o cabeçalho e "
+            f"as linhas a partir da {gravadas_ate + 2}"
+        )
+
+    def gravar(buffer, lidas, com_erro, fim=False):
+        nonlocal gravadas_ate
+        # Meses antigos do arquivo ganham partição antes da transação do lote
+        garantir_particoes_dos_meses(linha[0] for linha in buffer)
+        try:
+            with get_engine().begin() as conn:
+                if buffer:
+                    carregar_vendas_importadas(conn, buffer)
+                conn.execute(
+                    text("""
+                        UPDATE importacoes
+                        SET linhas_lidas = :lidas, inseridas = inseridas + :novas,
+                            erros = erros + :erros, concluida = :fim,
+                            atualizado_em = CURRENT_TIMESTAMP
+                        WHERE arquivo_hash = :h
+                    """),
+                    {"lidas": lidas, "novas": len(buffer), "erros": com_erro,
+                     "fim": 1 if fim else 0, "h": arquivo_hash}
+                )
+        except Exception as e:
+            raise falha(f"linhas {gravadas_ate + 2} a {lidas + 1}", f"o banco recusou o lote ({e})")
+        gravadas_ate = lidas
+
+    buffer, erros_lote = [], 0
+    with open(caminho, newline="", encoding="utf-8-sig") as f:
+        leitor = csv.reader(f)
+        try:
+            cabecalho = [c.strip() for c in next(leitor, [])]
+            if cabecalho != COLUNAS_HISTORICO_LEGADO:
+                raise click.ClickException(f"cabeçalho inesperado em {caminho}: {cabecalho}")
+
+            # numero = linha no arquivo (1 = cabeçalho); numero - 1 = linhas de dados lidas
+            retomar_apos = linhas_lidas
+            for numero, campos in enumerate(leitor, 2):
+                if numero - 1 <= retomar_apos:
+                    continue
+                linhas_lidas = numero - 1
+                if not campos:
+                    continue
+                try:
+                    buffer.append(linha_legado_para_venda(campos, mapa_barbeiro, loja))
+                except ValueError as e:
+                    erros_lote += 1
+                    reportar_erro(numero, str(e), campos)
+
+                if len(buffer) + erros_lote >= lote:
+                    gravar(buffer, linhas_lidas, erros_lote)
+                    inseridas += len(buffer)
+                    erros += erros_lote
+                    buffer, erros_lote = [], 0
+                    click.echo(f">>> {os.path.basename(caminho)}: {linhas_lidas} linhas ({inseridas} inseridas)")
+        except csv.Error as e:
+            raise falha(f"linha {leitor.line_num}", f"CSV inválido ({e})")
+        except UnicodeDecodeError as e:
+            # O arquivo é decodificado em blocos: o leitor não sabe a linha
+            raise falha(f"linha {linha_nao_utf8(caminho)}", f"não está em UTF-8 ({e.reason})")
+
+    gravar(buffer, linhas_lidas, erros_lote, fim=True)
+    return linhas_lidas, inseridas + len(buffer), erros + erros_lote
+
+
+@vendas_cli.command("importar")
+@click.argument("arquivos", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--lote", default=50000, show_default=True, help="Linhas por transação")
+@click.option("--barbeiro", "mapa", multiple=True, metavar="ANTIGO=NOVO",
+              help="Renomeia barbeiros do arquivo (ex.: --barbeiro gordinho=vini)")
+@click.option("--erros", "arquivo_erros", type=click.Path(dir_okay=False),
+              help="Grava as linhas rejeitadas neste CSV (padrão: stderr)")
+@click.option("--loja", default=LOJA_PADRAO, show_default=True, help="Loja das vendas importadas")
+def vendas_importar_cmd(arquivos, lote, mapa, arquivo_erros, loja):
+    """Importa arquivos historico.csv do formato antigo para vendas."""
+    mapa_barbeiro = {}
+    for item in mapa:
+        antigo, _, novo = item.partition("=")
+        mapa_barbeiro[antigo.strip().lower()] = novo.strip().lower()
+
+    saida_erros = open(arquivo_erros, "a", newline="", encoding="utf-8") if arquivo_erros else None
+    escritor_erros = csv.writer(saida_erros) if saida_erros else None
+
+    try:
+        for caminho in arquivos:
+            def reportar_erro(numero, motivo, campos, caminho=caminho):
+                if escritor_erros:
+                    escritor_erros.writerow([caminho, numero, motivo] + list(campos))
+                else:
+                    click.echo(f"ERRO {caminho}:{numero}: {motivo}", err=True)
+
+            t0 = time.perf_counter()
+            lidas, inseridas, erros = importar_historico_csv(
+                caminho, lote, mapa_barbeiro, reportar_erro, normalizar_loja(loja) or LOJA_PADRAO
+            )
+            click.echo(
+                f">>> {caminho}: {lidas} linhas, {inseridas} inseridas, {erros} com erro "
+                f"({time.perf_counter() - t0:.1f} s)"
+            )
+    finally:
+        if saida_erros:
+            saida_erros.close()
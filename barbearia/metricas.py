@@ -0,0 +1,170 @@
+"""Métricas em memória por worker: latência por rota e consultas SQL por requisição."""
+from flask import Blueprint, g, has_request_context, request, session
+import json
+import logging
+import os
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+bp = Blueprint("metricas", __name__)
+
+# =========================
+# MÉTRICAS (latência por rota, consultas SQL por requisição)
+# =========================
+# Tudo fica em memória do processo e é exposto em /metrics no formato texto
+# do Prometheus (cada worker do gunicorn tem os seus contadores).
+LOG_REQUISICOES = os.environ.get("LOG_REQUISICOES", "1") != "0"
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 10, 25, 50)
+
+log_requisicoes = logging.getLogger("barbearia.requisicoes")
+if not log_requisicoes.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    log_requisicoes.addHandler(_handler)
+    log_requisicoes.setLevel(logging.INFO)
+    log_requisicoes.propagate = False
+
+
+class Histograma:
+    """Histograma cumulativo no estilo Prometheus (buckets fixos)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.contagens = [0] * len(buckets)
+        self.soma = 0.0
+        self.qtd = 0
+
+    def observar(self, valor):
+        self.soma += valor
+        self.qtd += 1
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.contagens[i] += 1
+
+
+class Metricas:
+    """Registro simples de contadores e histogramas por rótulos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.contadores = {}
+        self.histogramas = {}
+
+    def somar(self, nome, rotulos, valor=1):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._lock:
+            self.contadores[chave] = self.contadores.get(chave, 0) + valor
+
+    def observar(self, nome, rotulos, valor, buckets=BUCKETS_SEGUNDOS):
+        chave = (nome, tuple(sorted(rotulos.items())))
+        with self._lock:
+            histograma = self.histogramas.get(chave)
+            if histograma is None:
+                histograma = self.histogramas[chave] = Histograma(buckets)
+            histograma.observar(valor)
+
+    def texto_prometheus(self, extras=()):
+        """Renderiza no formato de exposição texto (0.0.4) do Prometheus."""
+        def rotulos_txt(rotulos):
+            if not rotulos:
+                return ""
+            partes = []
+            for k, v in rotulos:
+                v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+                partes.append(f'{k}="{v}"')
+            return "{" + ",".join(partes) + "}"
+
+        linhas, tipos = [], set()
+        with self._lock:
+            for (nome, rotulos), valor in sorted(self.contadores.items()):
+                if nome not in tipos:
+                    tipos.add(nome)
+                    linhas.append(f"# TYPE {nome} counter")
+                linhas.append(f"{nome}{rotulos_txt(rotulos)} {valor}")
+
+            for (nome, rotulos), h in sorted(self.histogramas.items()):
+                if nome not in tipos:
+                    tipos.add(nome)
+                    linhas.append(f"# TYPE {nome} histogram")
+                for limite, qtd in zip(h.buckets, h.contagens):
+                    linhas.append(f"{nome}_bucket{rotulos_txt(rotulos + (('le', limite),))} {qtd}")
+                linhas.append(f"{nome}_bucket{rotulos_txt(rotulos + (('le', '+Inf'),))} {h.qtd}")
+                linhas.append(f"{nome}_sum{rotulos_txt(rotulos)} {h.soma}")
+                linhas.append(f"{nome}_count{rotulos_txt(rotulos)} {h.qtd}")
+
+        for nome, tipo, valor in extras:
+            linhas.append(f"# TYPE {nome} {tipo}")
+            linhas.append(f"{nome} {valor}")
+
+        return "\n".join(linhas) + "\n"
+
+
+metricas = Metricas()
+
+
+# O início fica no contexto do próprio statement: um statement que falha
+# não deixa sobra para o próximo medido na mesma conexão
+@event.listens_for(Engine, "before_cursor_execute")
+def _sql_inicio(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._inicio_sql = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _sql_fim(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, "_inicio_sql", None)
+    if inicio is None:
+        return
+    duracao = time.perf_counter() - inicio
+    if has_request_context():
+        atual = g.get("metricas")
+        if atual is not None:
+            atual["sql_qtd"] += 1
+            atual["sql_s"] += duracao
+
+
+@bp.before_app_request
+def _metricas_inicio():
+    g.metricas = {"inicio": time.perf_counter(), "sql_qtd": 0, "sql_s": 0.0}
+
+
+@bp.after_app_request
+def _metricas_fim(response):
+    atual = g.get("metricas")
+    if atual is None:
+        return response
+
+    # Só a regra da rota (ex.: /venda/<int:venda_id>/excluir) vira rótulo
+    rota = request.url_rule.rule if request.url_rule else "(sem rota)"
+    metodo = request.method
+    usuario = session.get("usuario")
+
+    def registrar_fim():
+        # Roda quando a resposta termina de ser enviada: inclui o tempo e as
+        # consultas de respostas em streaming (ex.: /download)
+        duracao = time.perf_counter() - atual["inicio"]
+        rotulos = {"rota": rota, "metodo": metodo}
+        metricas.somar("barbearia_http_requests_total", {**rotulos, "status": response.status_code})
+        metricas.observar("barbearia_http_request_duration_seconds", rotulos, duracao)
+        metricas.observar("barbearia_sql_queries_per_request", rotulos, atual["sql_qtd"], BUCKETS_CONSULTAS)
+        metricas.somar("barbearia_sql_queries_total", rotulos, atual["sql_qtd"])
+        metricas.somar("barbearia_sql_duration_seconds_total", rotulos, atual["sql_s"])
+
+        if LOG_REQUISICOES:
+            log_requisicoes.info(json.dumps({
+                "evento": "requisicao",
+                "rota": rota,
+                "metodo": metodo,
+                "status": response.status_code,
+                "ms": round(duracao * 1000, 2),
+                "sql_qtd": atual["sql_qtd"],
+                "sql_ms": round(atual["sql_s"] * 1000, 2),
+                "usuario": usuario,
+            }, ensure_ascii=False))
+
+    response.call_on_close(registrar_fim)
+    return response
@@ -0,0 +1,95 @@
+"""Rotas de monitoramento: /healthz, /metrics e /cache/stats."""
+from flask import Blueprint, Response, abort, jsonify, redirect, request, session
+import hmac
+import os
+import time
+from sqlalchemy import text
+
+from barbearia import banco, outbox, schema
+from barbearia.banco import DB_POOLER, DB_PRE_PING, get_engine
+from barbearia.cache import cache_resumos
+from barbearia.metricas import metricas
+
+bp = Blueprint("monitoramento", __name__)
+
+# =========================
+# MONITORAMENTO
+# =========================
+# Sem METRICS_TOKEN, /metrics só responde para a própria máquina (scrape
+# local); chamadas vindas de proxy (com X-Forwarded-For) são recusadas
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+
+@bp.route("/cache/stats")
+def cache_stats():
+    """Contadores do cache de resumos (deste worker)."""
+    if "usuario" not in session:
+        return redirect("/login")
+
+    if session.get("role") != "admin":
+        abort(403)
+
+    return jsonify(cache_resumos.stats())
+
+
+def metrics_autorizado():
+    if METRICS_TOKEN:
+        return hmac.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"
+        )
+    return (
+        request.remote_addr in ("127.0.0.1", "::1")
+        and "X-Forwarded-For" not in request.headers
+    )
+
+
+@bp.route("/metrics")
+def metrics():
+    """Métricas deste worker no formato texto do Prometheus."""
+    if not metrics_autorizado():
+        abort(403)
+
+    cache = cache_resumos.stats()
+    pool = get_engine().pool
+    extras = [
+        ("barbearia_cache_hits_total", "counter", cache["acertos"]),
+        ("barbearia_cache_misses_total", "counter", cache["erros"]),
+        ("barbearia_cache_invalidations_total", "counter", cache["invalidacoes"]),
+    ]
+    if hasattr(pool, "checkedout"):
+        extras.append(("barbearia_db_pool_checked_out", "gauge", pool.checkedout()))
+
+    return Response(metricas.texto_prometheus(extras), mimetype="text/plain; version=0.0.4")
+
+
+@bp.route("/healthz")
+def healthz():
+    """Checagem de saúde: testa o banco sob demanda (nada é testado no import)."""
+    inicio = time.perf_counter()
+    try:
+        with get_engine().connect() as conn:
+            if get_engine().dialect.name == "postgresql":
+                nome_banco = conn.execute(text("select current_database()")).scalar()
+            else:
+                nome_banco = conn.execute(text("select 1")).scalar() and "sqlite"
+    except Exception as e:
+        print(">>> ERRO conectando no banco:", repr(e))
+        return jsonify({"ok": False, "erro": type(e).__name__}), 503
+
+    return jsonify({
+        "ok": True,
+        "schema_em_dia": schema._schema_ok or None,
+        "banco": nome_banco,
+        "dialeto": get_engine().dialect.name,
+        "latencia_ms": round((time.perf_counter() - inicio) * 1000, 2),
+        "pool": get_engine().pool.status(),
+        "pools_lojas": {loja: e.pool.status() for loja, e in sorted(banco._engines_loja.items())} or None,
+        "replica": {
+            "fora_do_ar": time.monotonic() < banco._replica_fora_ate,
+            "pools": {str(loja or "principal"): e.pool.status() for loja, e in banco._engines_leitura.items()},
+        } if banco.DATABASE_READ_URL else None,
+        "pre_ping": DB_PRE_PING,
+        "pooler": DB_POOLER or None,
+        "outbox_pendentes": outbox.local.quantidade() if outbox.local is not None else None,
+        "outbox_falhas": outbox.local.quantidade_falhas() if outbox.local is not None else None,
+    })
@@ -0,0 +1,273 @@
+"""Outbox local em SQLite: registrar sem esperar o banco principal."""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from barbearia import schema
+from barbearia.banco import executar_nativo, get_engine
+from barbearia.eventos import eventos_publicar
+from barbearia.schema import exigir_schema
+from barbearia.vendas import LOTE_LINHAS_POR_INSERT, inserir_vendas, invalidar_cache_vendas
+
+# =========================
+# OUTBOX LOCAL (registrar sem esperar o Neon)
+# =========================
+# Com OUTBOX_PATH, o /registrar só grava a venda num SQLite local (WAL) e
+# responde; uma thread por worker manda as pendentes em lotes para vendas,
+# com novas tentativas e espera crescente enquanto o banco não responde. A
+# idempotency_key de cada venda (gerada no formulário) garante que ela
+# entra uma vez só, mesmo se o lote for reenviado depois de uma queda entre
+# o COMMIT e a limpeza do outbox, ou se dois workers enviarem o mesmo lote.
+# No Render o disco é apagado a cada deploy: use um disco persistente.
+OUTBOX_PATH = os.environ.get("OUTBOX_PATH", "")
+OUTBOX_LOTE = int(os.environ.get("OUTBOX_LOTE", "500"))
+OUTBOX_INTERVALO = float(os.environ.get("OUTBOX_INTERVALO", "0.5"))
+OUTBOX_ESPERA_MAX = float(os.environ.get("OUTBOX_ESPERA_MAX", "60"))
+# Venda que o banco recusa (dado ruim, não banco fora) sai para outbox_falhas
+# depois de N tentativas, em vez de travar as outras para sempre
+OUTBOX_TENTATIVAS_MAX = int(os.environ.get("OUTBOX_TENTATIVAS_MAX", "5"))
+# NORMAL no WAL não faz fsync a cada venda (sobrevive a queda do processo,
+# não a queda de energia); FULL faz
+OUTBOX_SYNC = os.environ.get("OUTBOX_SYNC", "NORMAL").upper()
+
+
+class OutboxLocal:
+    """Diário local de vendas ainda não gravadas no banco (um arquivo SQLite)."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._conn = None
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._thread = None
+
+    def _db(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={'FULL' if OUTBOX_SYNC == 'FULL' else 'NORMAL'}")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chave TEXT NOT NULL UNIQUE,
+                    venda TEXT NOT NULL,
+                    criado_em REAL NOT NULL,
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    erro TEXT,
+                    loja TEXT,
+                    barbeiro TEXT,
+                    data TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_outbox_loja_data ON outbox (loja, data)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox_falhas (
+                    seq INTEGER PRIMARY KEY,
+                    chave TEXT NOT NULL,
+                    venda TEXT NOT NULL,
+                    criado_em REAL NOT NULL,
+                    tentativas INTEGER NOT NULL,
+                    erro TEXT,
+                    falhou_em REAL NOT NULL
+                )
+            """)
+            self._conn = conn
+        return self._conn
+
+    def _sqlite(self, operacao):
+        """operacao(db) com o lock do outbox. No worker gevent roda no
+        threadpool nativo: o fsync do SQLite não cede a vez aos greenlets."""
+        with self._lock:
+            return executar_nativo(lambda: operacao(self._db()))
+
+    def acrescentar(self, venda):
+        """Grava a venda (com idempotency_key) no diário; False se a chave já estava lá."""
+        dados = json.dumps({**venda, "data": venda["data"].isoformat()})
+        gravou = self._sqlite(lambda db: db.execute(
+            "INSERT OR IGNORE INTO outbox (chave, venda, criado_em, loja, barbeiro, data) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (venda["idempotency_key"], dados, time.time(),
+             venda["loja"], venda["barbeiro"], venda["data"].isoformat()),
+        ).rowcount)
+        self.iniciar()
+        self._acordar.set()
+        return bool(gravou)
+
+    def pendentes(self, limite=None, loja=None, barbeiro=None, desde=None):
+        """Vendas ainda não enviadas, na ordem de registro (cada uma com "seq").
+
+        loja/barbeiro/desde filtram no SQL: só as vendas pedidas são decodificadas.
+        """
+        where, params = [], []
+        if loja:
+            where.append("loja = ?")
+            params.append(loja)
+        if barbeiro:
+            where.append("barbeiro = ?")
+            params.append(barbeiro)
+        if desde:
+            where.append("data >= ?")
+            params.append(desde.isoformat())
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        rows = self._sqlite(lambda db: db.execute(
+            f"SELECT seq, venda FROM outbox {where_sql} ORDER BY seq LIMIT ?", (*params, limite or -1)
+        ).fetchall())
+        vendas = []
+        for seq, dados in rows:
+            venda = json.loads(dados)
+            venda["data"] = date.fromisoformat(venda["data"])
+            venda["seq"] = seq
+            vendas.append(venda)
+        return vendas
+
+    def quantidade(self):
+        return self._sqlite(lambda db: db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0])
+
+    def _remover(self, seqs):
+        self._sqlite(lambda db: db.executemany("DELETE FROM outbox WHERE seq = ?", [(s,) for s in seqs]))
+
+    def quantidade_falhas(self):
+        return self._sqlite(lambda db: db.execute("SELECT COUNT(*) FROM outbox_falhas").fetchone()[0])
+
+    def _falhou(self, seqs, erro, contar=True):
+        """Anota o erro; com contar, soma a tentativa e tira as que chegaram a
+        OUTBOX_TENTATIVAS_MAX para outbox_falhas. Retorna quantas saíram."""
+        def anotar(db):
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany(
+                f"UPDATE outbox SET tentativas = tentativas + {1 if contar else 0}, erro = ? WHERE seq = ?",
+                [(erro, s) for s in seqs],
+            )
+            movidas = db.execute(
+                """
+                INSERT INTO outbox_falhas (seq, chave, venda, criado_em, tentativas, erro, falhou_em)
+                SELECT seq, chave, venda, criado_em, tentativas, erro, ? FROM outbox WHERE tentativas >= ?
+                """,
+                (time.time(), OUTBOX_TENTATIVAS_MAX),
+            ).rowcount
+            db.execute("DELETE FROM outbox WHERE tentativas >= ?", (OUTBOX_TENTATIVAS_MAX,))
+            db.execute("COMMIT")
+            return movidas
+
+        movidas = self._sqlite(anotar)
+        if movidas:
+            print(f">>> OUTBOX: {movidas} venda(s) recusada(s) {OUTBOX_TENTATIVAS_MAX} vezes "
+                  f"movida(s) para outbox_falhas:", erro)
+        return movidas
+
+    def enviar_lote(self):
+        """Manda um lote para vendas numa transação; retorna quantas saíram do outbox.
+
+        Chave já gravada (reenvio) é ignorada por inserir_vendas e sai do
+        outbox do mesmo jeito. Banco fora (ou schema atrasado) propaga; o
+        lote fica para a próxima tentativa. Outro erro é de alguma venda do
+        lote: aí elas vão uma a uma (_enviar_uma_a_uma) e a ruim não segura
+        as outras.
+        """
+        lote = self.pendentes(OUTBOX_LOTE)
+        if not lote:
+            return 0
+        seqs = [v.pop("seq") for v in lote]
+        try:
+            exigir_schema()
+            with get_engine().begin() as conn:
+                inseridas = inserir_vendas(conn, lote)
+        except Exception as e:
+            if not schema._schema_ok or isinstance(e, (OperationalError, InterfaceError)):
+                self._falhou(seqs, repr(e)[:500], contar=False)
+                raise
+            print(">>> OUTBOX lote recusado, enviando uma a uma:", repr(e))
+            return self._enviar_uma_a_uma(seqs, lote)
+        self._remover(seqs)
+        if inseridas:
+            invalidar_cache_vendas(inseridas)
+            eventos_publicar("nova", inseridas)
+        print(">>> OUTBOX enviado:", len(inseridas), "de", len(lote))
+        return len(lote)
+
+    def _enviar_uma_a_uma(self, seqs, lote):
+        """Cada venda na sua transação; retorna quantas saíram do outbox
+        (gravadas ou movidas para outbox_falhas)."""
+        saiu = 0
+        for seq, venda in zip(seqs, lote):
+            try:
+                with get_engine().begin() as conn:
+                    inseridas = inserir_vendas(conn, [venda])
+            except (OperationalError, InterfaceError):
+                raise  # o banco caiu no meio: o resto fica para a próxima
+            except Exception as e:
+                saiu += self._falhou([seq], repr(e)[:500])
+                continue
+            self._remover([seq])
+            saiu += 1
+            if inseridas:
+                invalidar_cache_vendas(inseridas)
+                eventos_publicar("nova", inseridas)
+        print(">>> OUTBOX enviado uma a uma:", saiu, "de", len(lote))
+        return saiu
+
+    def _enviar_sempre(self):
+        """Thread de envio: acorda a cada venda nova (ou a cada OUTBOX_INTERVALO)."""
+        falhas = 0
+        while True:
+            self._acordar.wait(OUTBOX_INTERVALO)
+            self._acordar.clear()
+            try:
+                while self.enviar_lote() >= OUTBOX_LOTE:
+                    pass  # lote cheio: ainda tem mais
+                falhas = 0
+            except Exception as e:
+                # Banco fora: espera crescente, sem acordar a cada venda nova
+                falhas += 1
+                espera = min(OUTBOX_INTERVALO * 2 ** falhas, OUTBOX_ESPERA_MAX)
+                print(f">>> ERRO enviando outbox (tentando de novo em {espera:.1f} s):", repr(e))
+                time.sleep(espera)
+
+    def iniciar(self):
+        """Sobe a thread de envio deste worker (também envia o que sobrou de antes)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._enviar_sempre, name="outbox", daemon=True)
+                self._thread.start()
+
+    def descartar_herdado(self):
+        """Depois de um fork: conexão e thread do pai não servem no filho."""
+        self._conn = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+
+# outbox.local nas outras partes do app (None sem OUTBOX_PATH)
+local = OutboxLocal(OUTBOX_PATH) if OUTBOX_PATH else None
+if local is not None:
+    os.register_at_fork(after_in_child=local.descartar_herdado)
+
+
+def outbox_pendentes_visiveis(role, usuario, loja=None, desde=None):
+    """Vendas do outbox que o usuário enxerga (mesmas regras de filtro_vendas),
+    com data a partir de desde (None = todas)."""
+    if local is None:
+        return []
+    return local.pendentes(loja=loja, barbeiro=None if role == "admin" else usuario, desde=desde)
+
+
+def outbox_sem_gravadas(conn, pendentes):
+    """Tira as pendentes cuja chave já está no banco. Entre o COMMIT do lote e
+    a limpeza do outbox (ou depois de uma queda bem aí) elas apareceriam duas
+    vezes: uma de vendas e outra do outbox."""
+    chaves = [v["idempotency_key"] for v in pendentes]
+    gravadas = set()
+    for i in range(0, len(chaves), LOTE_LINHAS_POR_INSERT):
+        parte = chaves[i:i + LOTE_LINHAS_POR_INSERT]
+        gravadas.update(conn.execute(
+            text(f"SELECT chave FROM vendas_idempotencia WHERE chave IN ({', '.join(f':c{j}' for j in range(len(parte)))})"),
+            {f"c{j}": chave for j, chave in enumerate(parte)},
+        ).scalars())
+    return [v for v in pendentes if v["idempotency_key"] not in gravadas]
@@ -0,0 +1,143 @@
+"""Partições por mês, arquivo das vendas excluídas e comandos de manutenção de vendas."""
+import click
+import os
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from barbearia.banco import DIALETO, TZ_BR, get_engine
+from barbearia.clientes import clientes_reconstruir
+from barbearia.schema import PARTICOES_A_FRENTE, garantir_particoes, particionar_default
+from barbearia.vendas import COLUNAS_VENDA, vendas_cli
+
+# =========================
+# PARTIÇÕES E ARQUIVO
+# =========================
+# Postgres: uma partição de vendas por mês (migração 8). Consultas com
+# filtro de data (hoje, mês, período do historico) só leem as partições do
+# período. As partições são criadas antes das vendas chegarem, fora do
+# caminho de gravação (ATTACH pega lock exclusivo em vendas): o mês atual e
+# os próximos no deploy e no início de cada processo, os meses antigos de
+# uma importação antes de cada lote. Venda retroativa de um mês sem
+# partição cai em vendas_default; `flask vendas particoes` (cron diário e
+# passo de release) cria o mês e vendas_criar_particao() move as linhas.
+#
+# SQLite: sem partições. Os índices parciais (deleted_at IS NULL) já fazem
+# "hoje" e "mês" lerem só vendas ativas, e o arquivo tira as excluídas.
+
+
+# Só arquiva exclusões com mais de N dias: dá tempo do /api/vendas/sync
+# dos tablets receber a exclusão antes da linha sair de vendas
+ARQUIVO_EXCLUIDAS_HA_DIAS = int(os.environ.get("ARQUIVO_EXCLUIDAS_HA_DIAS", "30"))
+COLUNAS_ARQUIVO = ["id"] + COLUNAS_VENDA + ["deleted_at", "deleted_by", "updated_at"]
+
+
+# Meses cuja partição este processo já conferiu (a importação não vai ao banco por isso)
+_particoes_ok = set()
+
+
+def garantir_particoes_dos_meses(datas):
+    """Cria as partições dos meses das datas antes de um lote da importação (só Postgres).
+
+    Chamada antes de abrir a transação do lote, numa conexão própria: o
+    ATTACH não fica esperando atrás do lote nem o lote atrás dele. Se o lock
+    demorar, desiste e as linhas vão para vendas_default até o próximo
+    `flask vendas particoes`.
+    """
+    if DIALETO != "postgresql":
+        return
+    meses = {d.replace(day=1) for d in datas} - _particoes_ok
+    if not meses:
+        return
+    try:
+        with get_engine().begin() as conn:
+            conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+            conn.execute(
+                text("SELECT vendas_criar_particao(m) FROM unnest(CAST(:meses AS date[])) AS m"),
+                {"meses": sorted(meses)},
+            )
+    except OperationalError as e:
+        print(">>> ERRO criando partições (linhas ficam na default por enquanto):", sorted(meses), repr(e))
+        return
+    _particoes_ok.update(meses)
+
+
+def arquivar_excluidas(conn, antes_de, excluidas_ate):
+    """Move de vendas para vendas_arquivo as excluídas com data < antes_de
+    e deleted_at < excluidas_ate. Retorna quantas foram movidas.
+
+    Não mexe no rollup (excluídas já não contam nele).
+    """
+    colunas = ", ".join(COLUNAS_ARQUIVO)
+    where = "deleted_at IS NOT NULL AND data < :antes_de AND deleted_at < :excluidas_ate"
+    params = {"antes_de": antes_de, "excluidas_ate": excluidas_ate}
+
+    if DIALETO == "postgresql":
+        return conn.execute(text(f"""
+            WITH movidas AS (
+                DELETE FROM vendas WHERE {where}
+                RETURNING {colunas}
+            )
+            INSERT INTO vendas_arquivo ({colunas})
+            SELECT {colunas} FROM movidas
+        """), params).rowcount
+
+    # SQLite: deleted_at é texto 'YYYY-MM-DD HH:MM:SS'
+    params["excluidas_ate"] = excluidas_ate.strftime("%Y-%m-%d %H:%M:%S")
+    conn.execute(text(f"""
+        INSERT INTO vendas_arquivo ({colunas})
+        SELECT {colunas} FROM vendas WHERE {where}
+    """), params)
+    return conn.execute(text(f"DELETE FROM vendas WHERE {where}"), params).rowcount
+
+
+@vendas_cli.command("particoes")
+@click.option("--meses", default=PARTICOES_A_FRENTE, show_default=True, help="Meses à frente")
+def vendas_particoes_cmd(meses):
+    """Cria as partições dos próximos meses e dos meses em vendas_default (Postgres).
+
+    Feito para o cron diário e o passo de release; lista as partições no fim.
+    """
+    if DIALETO != "postgresql":
+        raise click.ClickException("partições só existem no Postgres")
+
+    with get_engine().begin() as conn:
+        # ATTACH/DETACH pedem lock exclusivo em vendas: sem limite, o cron
+        # fica na fila atrás de um relatório longo e trava as vendas atrás dele
+        conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+        garantir_particoes(conn, meses)
+        movidos = particionar_default(conn)
+        if movidos:
+            click.echo(f">>> meses tirados de vendas_default: {', '.join(movidos)}")
+        rows = conn.execute(text("""
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) AS faixa, c.reltuples::bigint AS linhas
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'vendas'::regclass
+            ORDER BY c.relname
+        """)).all()
+    for r in rows:
+        click.echo(f"{r.relname:20s} {max(r.linhas, 0):>10d}  {r.faixa}")
+
+
+@vendas_cli.command("arquivar")
+@click.option("--excluidas-ha", "dias", default=ARQUIVO_EXCLUIDAS_HA_DIAS, show_default=True,
+              help="Só vendas excluídas há mais de N dias")
+def vendas_arquivar_cmd(dias):
+    """Move as vendas excluídas dos meses fechados para vendas_arquivo."""
+    antes_de = datetime.now(TZ_BR).date().replace(day=1)
+    # deleted_at vem de CURRENT_TIMESTAMP do banco (UTC)
+    excluidas_ate = datetime.now(ZoneInfo("UTC")).replace(tzinfo=None) - timedelta(days=dias)
+    with get_engine().begin() as conn:
+        movidas = arquivar_excluidas(conn, antes_de, excluidas_ate)
+    click.echo(f">>> {movidas} venda(s) excluída(s) de antes de {antes_de} arquivada(s)")
+
+
+@vendas_cli.command("clientes")
+def vendas_clientes_cmd():
+    """Refaz o diretório de clientes (busca) a partir das vendas ativas."""
+    with get_engine().begin() as conn:
+        clientes_reconstruir(conn)
+        total = conn.execute(text("SELECT COUNT(*) FROM clientes")).scalar()
+    click.echo(f">>> {total} cliente(s) no diretório")
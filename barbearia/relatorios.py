@@ -0,0 +1,278 @@
+"""Relatórios CSV gerados em segundo plano e as rotas /relatorios."""
+from flask import Blueprint, abort, jsonify, redirect, request, send_file, session
+import hashlib
+import json
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date
+from sqlalchemy import text
+
+from barbearia.banco import TZ_BR, conectar_leitura, gevent_ativo, sessao_gravou_agora
+from barbearia.cache import chave_afetada
+from barbearia.exportacao import DOWNLOAD_LOTE, SQL_VENDAS_DETALHADAS, csv_vendas_em_partes
+from barbearia.helpers import filtro_vendas, normalizar_loja, parse_date_yyyy_mm_dd
+from barbearia.usuarios import loja_da_requisicao
+
+bp = Blueprint("relatorios", __name__)
+
+# =========================
+# RELATÓRIOS EM SEGUNDO PLANO
+# =========================
+# O CSV de um período grande é gerado numa thread, fora da requisição. O
+# estado dos jobs e os arquivos ficam em RELATORIOS_DIR (compartilhado pelos
+# workers da mesma máquina):
+#   job_<id>.json      estado/progresso do job
+#   <sha256>.csv       arquivo gerado (conteúdo igual = arquivo único)
+#   periodo_<k>.json   período fechado -> sha256, p/ servir na hora
+RELATORIOS_DIR = os.environ.get(
+    "RELATORIOS_DIR", os.path.join(tempfile.gettempdir(), "barbearia_relatorios")
+)
+RELATORIOS_TTL = int(os.environ.get("RELATORIOS_TTL", str(24 * 3600)))
+RELATORIOS_WORKERS = int(os.environ.get("RELATORIOS_WORKERS", "2"))
+
+_relatorios_pool = ThreadPoolExecutor(max_workers=RELATORIOS_WORKERS, thread_name_prefix="relatorio")
+# No worker gevent as threads do ThreadPoolExecutor são greenlets e montar o
+# CSV (CPU) travaria o worker: lá os relatórios vão para um ThreadPool nativo
+_relatorios_pool_nativo = None
+
+
+def _relatorio_enfileirar(job):
+    global _relatorios_pool_nativo
+    if not gevent_ativo():
+        _relatorios_pool.submit(_relatorio_gerar, job)
+        return
+    if _relatorios_pool_nativo is None:
+        from gevent.threadpool import ThreadPool
+        _relatorios_pool_nativo = ThreadPool(RELATORIOS_WORKERS)
+    _relatorios_pool_nativo.spawn(_relatorio_gerar, job)
+
+
+def _relatorio_caminho(nome):
+    os.makedirs(RELATORIOS_DIR, exist_ok=True)
+    return os.path.join(RELATORIOS_DIR, nome)
+
+
+def _relatorio_gravar_json(nome, dados):
+    """Grava de forma atômica (escreve num temporário e renomeia)."""
+    caminho = _relatorio_caminho(nome)
+    temporario = f"{caminho}.{uuid.uuid4().hex}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(dados, f)
+    os.replace(temporario, caminho)
+
+
+def _relatorio_ler_json(nome):
+    try:
+        with open(_relatorio_caminho(nome), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _relatorio_chave_periodo(loja, escopo, inicio, fim):
+    return hashlib.sha1(json.dumps([loja, escopo, inicio, fim]).encode()).hexdigest()
+
+
+def relatorio_job(job_id):
+    return _relatorio_ler_json(f"job_{job_id}.json")
+
+
+def relatorios_limpar():
+    """Apaga arquivos e jobs mais velhos que RELATORIOS_TTL."""
+    limite = time.time() - RELATORIOS_TTL
+    try:
+        nomes = os.listdir(RELATORIOS_DIR)
+    except FileNotFoundError:
+        return
+    for nome in nomes:
+        caminho = os.path.join(RELATORIOS_DIR, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+        except OSError:
+            pass
+
+
+def relatorios_invalidar(data, barbeiro, loja):
+    """Esquece os períodos fechados guardados que incluem a data/barbeiro/loja."""
+    data_iso = data.isoformat() if isinstance(data, date) else str(data)
+    try:
+        nomes = [n for n in os.listdir(RELATORIOS_DIR) if n.startswith("periodo_")]
+    except FileNotFoundError:
+        return
+    for nome in nomes:
+        periodo = _relatorio_ler_json(nome)
+        if periodo is None:
+            continue
+        chave = ("relatorio", periodo.get("loja"), periodo["escopo"], periodo["inicio"], periodo["fim"])
+        if chave_afetada(chave, data_iso, barbeiro, loja):
+            try:
+                os.remove(os.path.join(RELATORIOS_DIR, nome))
+            except OSError:
+                pass
+
+
+def _relatorio_gerar(job):
+    """Roda na thread: gera o CSV, deduplica pelo sha256 e marca o job pronto."""
+    job.update(status="gerando")
+    _relatorio_gravar_json(f"job_{job['id']}.json", job)
+
+    role = "barbeiro" if job["escopo"] else "admin"
+    where_sql, params = filtro_vendas(
+        role, job["escopo"], parse_date_yyyy_mm_dd(job["inicio"]), parse_date_yyyy_mm_dd(job["fim"]),
+        loja=job["loja"],
+    )
+
+    temporario = _relatorio_caminho(f"{job['id']}.csv.tmp")
+    sha = hashlib.sha256()
+    linhas = 0
+
+    def contar(rows):
+        nonlocal linhas
+        for r in rows:
+            linhas += 1
+            if linhas % (DOWNLOAD_LOTE * 20) == 0:
+                job["linhas"] = linhas
+                _relatorio_gravar_json(f"job_{job['id']}.json", job)
+            yield r
+
+    try:
+        # Réplica de leitura (se houver) e pool da loja do relatório (com
+        # LOJAS_POOL_ISOLADO), não o do caixa nem o das outras lojas
+        with conectar_leitura(job["loja"], gravou_agora=job.get("gravou_agora", False)) as conn, \
+                open(temporario, "w", newline="", encoding="utf-8") as f:
+            rows = conn.execution_options(stream_results=True, yield_per=DOWNLOAD_LOTE).execute(
+                text(SQL_VENDAS_DETALHADAS.format(where_sql=where_sql)), params
+            ).mappings()
+            for parte in csv_vendas_em_partes(contar(rows), job["inicio"] or "", job["fim"] or ""):
+                f.write(parte)
+                sha.update(parte.encode("utf-8"))
+
+        arquivo_hash = sha.hexdigest()
+        destino = _relatorio_caminho(f"{arquivo_hash}.csv")
+        if os.path.exists(destino):
+            os.remove(temporario)
+            os.utime(destino)
+        else:
+            os.replace(temporario, destino)
+
+        job.update(status="pronto", linhas=linhas, hash=arquivo_hash, concluido_em=time.time())
+        if job["fechado"]:
+            chave = _relatorio_chave_periodo(job["loja"], job["escopo"], job["inicio"], job["fim"])
+            _relatorio_gravar_json(f"periodo_{chave}.json", {
+                "loja": job["loja"], "escopo": job["escopo"], "inicio": job["inicio"], "fim": job["fim"],
+                "hash": arquivo_hash, "linhas": linhas,
+            })
+    except Exception as e:
+        print(">>> ERRO gerando relatório:", job["id"], repr(e))
+        job.update(status="erro", erro=type(e).__name__)
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+    _relatorio_gravar_json(f"job_{job['id']}.json", job)
+
+
+def relatorio_solicitar(usuario, role, data_inicio, data_fim, loja=None):
+    """Enfileira (ou reaproveita) o relatório do período (da loja, ou de todas) e devolve o job."""
+    relatorios_limpar()
+
+    escopo = None if role == "admin" else usuario
+    inicio = data_inicio.isoformat() if data_inicio else None
+    fim = data_fim.isoformat() if data_fim else None
+    # Período fechado: termina antes de hoje, então só muda por exclusão de venda
+    fechado = data_fim is not None and data_fim < datetime.now(TZ_BR).date()
+
+    job = {
+        "id": uuid.uuid4().hex,
+        "usuario": usuario,
+        "loja": loja,
+        "escopo": escopo,
+        "inicio": inicio,
+        "fim": fim,
+        "fechado": fechado,
+        # quem pediu acabou de gravar: o relatório lê do principal (a réplica pode não ter a venda)
+        "gravou_agora": sessao_gravou_agora(),
+        "status": "fila",
+        "linhas": 0,
+        "criado_em": time.time(),
+    }
+
+    if fechado:
+        periodo = _relatorio_ler_json(f"periodo_{_relatorio_chave_periodo(loja, escopo, inicio, fim)}.json")
+        if periodo and os.path.exists(_relatorio_caminho(f"{periodo['hash']}.csv")):
+            job.update(
+                status="pronto", hash=periodo["hash"], linhas=periodo["linhas"],
+                reaproveitado=True, concluido_em=time.time(),
+            )
+            _relatorio_gravar_json(f"job_{job['id']}.json", job)
+            return job
+
+    _relatorio_gravar_json(f"job_{job['id']}.json", job)
+    _relatorio_enfileirar(job)
+    return job
+
+
+def _relatorio_publico(job):
+    dados = {k: job.get(k) for k in ("id", "status", "loja", "inicio", "fim", "linhas", "erro")}
+    dados["reaproveitado"] = bool(job.get("reaproveitado"))
+    if job["status"] == "pronto":
+        dados["url_arquivo"] = f"/relatorios/{job['id']}/arquivo"
+    return dados
+
+
+def _relatorio_do_usuario(job_id):
+    job = relatorio_job(job_id)
+    if job is None:
+        abort(404)
+    if session.get("role") != "admin" and job["usuario"] != session.get("usuario"):
+        abort(404)
+    # admin de uma loja não vê relatórios de outra (nem os de todas as lojas)
+    if session.get("loja") and job.get("loja") != session["loja"]:
+        abort(404)
+    return job
+
+
+@bp.route("/relatorios", methods=["POST"])
+def relatorios_criar():
+    """Pede o CSV de um período para gerar em segundo plano."""
+    if "usuario" not in session:
+        return jsonify({"erro": "não autenticado"}), 401
+
+    dados = request.get_json(silent=True) or request.form
+    job = relatorio_solicitar(
+        session["usuario"],
+        session.get("role"),
+        parse_date_yyyy_mm_dd(dados.get("data_inicio") or ""),
+        parse_date_yyyy_mm_dd(dados.get("data_fim") or ""),
+        loja_da_requisicao() or (normalizar_loja(dados.get("loja")) if session.get("role") == "admin" else None),
+    )
+    return jsonify(_relatorio_publico(job)), 200 if job["status"] == "pronto" else 202
+
+
+@bp.route("/relatorios/<job_id>")
+def relatorios_status(job_id):
+    if "usuario" not in session:
+        return jsonify({"erro": "não autenticado"}), 401
+
+    return jsonify(_relatorio_publico(_relatorio_do_usuario(job_id)))
+
+
+@bp.route("/relatorios/<job_id>/arquivo")
+def relatorios_arquivo(job_id):
+    if "usuario" not in session:
+        return redirect("/login")
+
+    job = _relatorio_do_usuario(job_id)
+    caminho = _relatorio_caminho(f"{job.get('hash')}.csv")
+    if job["status"] != "pronto" or not os.path.exists(caminho):
+        abort(404)
+
+    periodo = "_".join(p for p in (job["inicio"], job["fim"]) if p) or "tudo"
+    dono = "_".join(p for p in (job.get("loja"), job["usuario"]) if p)
+    return send_file(
+        caminho, mimetype="text/csv", as_attachment=True,
+        download_name=f"vendas_{dono}_{periodo}.csv",
+    )
@@ -0,0 +1,214 @@
+"""Rollup diário de vendas (vendas_diarias) e o comando `flask rollup`."""
+from flask.cli import AppGroup
+import click
+from sqlalchemy import text
+
+from barbearia.banco import get_engine
+from barbearia.helpers import filtro_vendas, parse_date_yyyy_mm_dd
+from barbearia.schema import COLUNAS_ROLLUP, SQL_ROLLUP_RECALCULO, SQL_TICKET_RECALCULO, _exigir_schema_cli
+
+# =========================
+# ROLLUP DIÁRIO (vendas_diarias)
+# =========================
+SQL_ROLLUP_APLICAR = text("""
+    INSERT INTO vendas_diarias (loja, data, barbeiro, pagamento, total,
+                                cabelo, barba, sobrancelha, produto_valor, desconto, qtd)
+    VALUES (:loja, :data, :barbeiro, :pagamento, :total,
+            :cabelo, :barba, :sobrancelha, :produto_valor, :desconto, :qtd)
+    ON CONFLICT (loja, data, barbeiro, pagamento) DO UPDATE
+    SET total = vendas_diarias.total + excluded.total,
+        cabelo = vendas_diarias.cabelo + excluded.cabelo,
+        barba = vendas_diarias.barba + excluded.barba,
+        sobrancelha = vendas_diarias.sobrancelha + excluded.sobrancelha,
+        produto_valor = vendas_diarias.produto_valor + excluded.produto_valor,
+        desconto = vendas_diarias.desconto + excluded.desconto,
+        qtd = vendas_diarias.qtd + excluded.qtd
+""")
+
+SQL_TICKET_APLICAR = text("""
+    INSERT INTO vendas_diarias_ticket (loja, data, barbeiro, total, qtd)
+    VALUES (:loja, :data, :barbeiro, :total, :qtd)
+    ON CONFLICT (loja, data, barbeiro, total) DO UPDATE
+    SET qtd = vendas_diarias_ticket.qtd + excluded.qtd
+""")
+
+
+def rollup_somar_vendas(conn, vendas, sinal=1):
+    """Soma vendas (dicts com loja, data, barbeiro, pagamento e as COLUNAS_ROLLUP)
+    no rollup e no histograma do ticket; sinal=-1 desconta (exclusão).
+
+    Agrupa antes de gravar: um UPSERT por grupo, enviados num executemany.
+    """
+    grupos, tickets = {}, {}
+    for v in vendas:
+        chave = (v["loja"], v["data"], v["barbeiro"], v["pagamento"])
+        somas = grupos.get(chave)
+        if somas is None:
+            somas = grupos[chave] = dict.fromkeys(COLUNAS_ROLLUP, 0.0) | {"qtd": 0}
+        for col in COLUNAS_ROLLUP:
+            somas[col] += float(v[col] or 0)
+        somas["qtd"] += 1
+
+        chave = (v["loja"], v["data"], v["barbeiro"], round(float(v["total"] or 0), 2))
+        tickets[chave] = tickets.get(chave, 0) + 1
+
+    if grupos:
+        conn.execute(SQL_ROLLUP_APLICAR, [
+            {"loja": loja, "data": data_venda, "barbeiro": barbeiro, "pagamento": pagamento,
+             **{col: sinal * round(valor, 2) for col, valor in somas.items()}}
+            for (loja, data_venda, barbeiro, pagamento), somas in grupos.items()
+        ])
+        conn.execute(SQL_TICKET_APLICAR, [
+            {"loja": loja, "data": data_venda, "barbeiro": barbeiro, "total": total, "qtd": sinal * qtd}
+            for (loja, data_venda, barbeiro, total), qtd in tickets.items()
+        ])
+
+
+def rollup_reconstruir(conn, data_inicio=None, data_fim=None):
+    """Recalcula o rollup e o histograma do ticket (inteiros ou só do período) a partir de vendas."""
+    where_sql, params = filtro_vendas("admin", None, data_inicio, data_fim, apenas_ativas=False)
+    conn.execute(text(f"DELETE FROM vendas_diarias {where_sql}"), params)
+    conn.execute(text(f"DELETE FROM vendas_diarias_ticket {where_sql}"), params)
+
+    where_sql, params = filtro_vendas("admin", None, data_inicio, data_fim)
+    conn.execute(text(SQL_ROLLUP_RECALCULO.format(where_sql=where_sql)), params)
+    conn.execute(text(SQL_TICKET_RECALCULO.format(where_sql=where_sql)), params)
+
+
+def rollup_divergencias(conn, data_inicio=None, data_fim=None):
+    """Compara o rollup com vendas; retorna [(chave, somas rollup, somas vendas)].
+
+    No rollup a chave é (loja, data, barbeiro, pagamento) e as somas são as
+    COLUNAS_ROLLUP seguidas de qtd; no histograma do ticket a chave é
+    ("ticket", loja, data, barbeiro, total) e a soma é (qtd,).
+    """
+    somas_sql = ", ".join(f"COALESCE(SUM({col}), 0)" for col in COLUNAS_ROLLUP)
+    n = len(COLUNAS_ROLLUP)
+
+    def somas(r):
+        return tuple(round(float(v or 0), 2) for v in r[4:4 + n]) + (r[4 + n],)
+
+    def ticket(r):
+        return ("ticket", r[0], str(r[1]), r[2], round(float(r[3]), 2))
+
+    def comparar(rollup, bruto):
+        return [
+            (chave, rollup.get(chave), bruto.get(chave))
+            for chave in sorted(set(bruto) | set(rollup))
+            if rollup.get(chave) != bruto.get(chave)
+        ]
+
+    where_sql, params = filtro_vendas("admin", None, data_inicio, data_fim)
+    bruto = {
+        (r[0], str(r[1]), r[2], r[3]): somas(r)
+        for r in conn.execute(text(f"""
+            SELECT loja, data, barbeiro, pagamento, {somas_sql}, COUNT(*)
+            FROM vendas
+            {where_sql}
+            GROUP BY loja, data, barbeiro, pagamento
+        """), params)
+    }
+    bruto_ticket = {
+        ticket(r): (r[4],)
+        for r in conn.execute(text(f"""
+            SELECT loja, data, barbeiro, total, COUNT(*)
+            FROM vendas
+            {where_sql}
+            GROUP BY loja, data, barbeiro, total
+        """), params)
+    }
+
+    where_sql, params = filtro_vendas("admin", None, data_inicio, data_fim, apenas_ativas=False)
+    # linhas zeradas (todas as vendas excluídas) equivalem a ausência
+    rollup = {
+        (r[0], str(r[1]), r[2], r[3]): somas(r)
+        for r in conn.execute(text(f"""
+            SELECT loja, data, barbeiro, pagamento, {", ".join(COLUNAS_ROLLUP)}, qtd
+            FROM vendas_diarias
+            {where_sql}
+        """), params)
+        if r[4 + n]
+    }
+    rollup_ticket = {
+        ticket(r): (r[4],)
+        for r in conn.execute(text(f"""
+            SELECT loja, data, barbeiro, total, qtd
+            FROM vendas_diarias_ticket
+            {where_sql}
+        """), params)
+        if r[4]
+    }
+
+    return comparar(rollup, bruto) + comparar(rollup_ticket, bruto_ticket)
+
+
+def resumo_periodo(conn, role, usuario, data_inicio=None, data_fim=None, loja=None):
+    """Total, por loja, por barbeiro, por pagamento e por dia lidos do rollup (uma consulta)."""
+    where_sql, params = filtro_vendas(role, usuario, data_inicio, data_fim, apenas_ativas=False, loja=loja)
+    rows = conn.execute(
+        text(f"""
+            SELECT loja, data, barbeiro, pagamento, total
+            FROM vendas_diarias
+            {where_sql}
+              AND qtd > 0
+        """),
+        params
+    ).all()
+
+    total = 0.0
+    por_loja, por_barbeiro, por_pagamento, por_dia = {}, {}, {}, {}
+    for loja_venda, d, barbeiro, pagamento, valor in rows:
+        valor = float(valor or 0)
+        total += valor
+        por_loja[loja_venda] = por_loja.get(loja_venda, 0.0) + valor
+        por_barbeiro[barbeiro] = por_barbeiro.get(barbeiro, 0.0) + valor
+        por_pagamento[pagamento] = por_pagamento.get(pagamento, 0.0) + valor
+        # str(): date no Postgres, texto no SQLite (e serializável no cache)
+        por_dia[str(d)] = por_dia.get(str(d), 0.0) + valor
+
+    return {
+        "total": total,
+        "por_loja": [{"loja": k, "total": v} for k, v in sorted(por_loja.items())],
+        "por_barbeiro": [{"barbeiro": k, "total": v} for k, v in sorted(por_barbeiro.items())],
+        "por_pagamento": [{"pagamento": k, "total": v} for k, v in sorted(por_pagamento.items())],
+        "por_dia": [{"data": k, "total": v} for k, v in sorted(por_dia.items())],
+    }
+
+
+rollup_cli = AppGroup(
+    "rollup", help="Manutenção do rollup diário (vendas_diarias).", callback=_exigir_schema_cli
+)
+
+
+@rollup_cli.command("reconstruir")
+@click.option("--inicio", help="Data inicial YYYY-MM-DD (padrão: tudo)")
+@click.option("--fim", help="Data final YYYY-MM-DD (padrão: tudo)")
+def rollup_reconstruir_cmd(inicio, fim):
+    """Recalcula vendas_diarias e vendas_diarias_ticket a partir de vendas."""
+    with get_engine().begin() as conn:
+        rollup_reconstruir(conn, parse_date_yyyy_mm_dd(inicio), parse_date_yyyy_mm_dd(fim))
+    click.echo(">>> Rollup reconstruído")
+
+
+@rollup_cli.command("verificar")
+@click.option("--inicio", help="Data inicial YYYY-MM-DD (padrão: tudo)")
+@click.option("--fim", help="Data final YYYY-MM-DD (padrão: tudo)")
+@click.option("--corrigir", is_flag=True, help="Reconstrói o período se houver divergência")
+def rollup_verificar_cmd(inicio, fim, corrigir):
+    """Confere vendas_diarias e vendas_diarias_ticket contra vendas e lista as divergências."""
+    data_inicio = parse_date_yyyy_mm_dd(inicio)
+    data_fim = parse_date_yyyy_mm_dd(fim)
+
+    with get_engine().begin() as conn:
+        divergencias = rollup_divergencias(conn, data_inicio, data_fim)
+        for chave, no_rollup, nas_vendas in divergencias:
+            click.echo(f"DIVERGE {chave}: rollup={no_rollup} vendas={nas_vendas}")
+
+        if divergencias and corrigir:
+            rollup_reconstruir(conn, data_inicio, data_fim)
+            click.echo(">>> Rollup reconstruído")
+
+    if not divergencias:
+        click.echo(">>> Rollup confere com vendas")
+    elif not corrigir:
+        raise SystemExit(1)
@@ -0,0 +1,609 @@
+"""Rotas de vendas: registrar, lote, sync, histórico, download, resumo do mês e exclusão."""
+from flask import Blueprint, Response, abort, jsonify, redirect, render_template, request, session, stream_with_context
+import hashlib
+import itertools
+import os
+import uuid
+from urllib.parse import urlencode
+from datetime import datetime, date
+from sqlalchemy import text
+
+from barbearia import outbox
+from barbearia.banco import DIALETO, TZ_BR, conectar_leitura, get_engine, marcar_escrita
+from barbearia.cache import cache_leitura, cache_resumos
+from barbearia.eventos import eventos_publicar
+from barbearia.exportacao import (
+    DOWNLOAD_LOTE, FORMATOS_ARROW, FORMATOS_DOWNLOAD, SQL_VENDAS_DETALHADAS, pyarrow_disponivel,
+)
+from barbearia.helpers import (
+    SYNC_ATRASO_S, VendaLinha, cursor_historico, cursor_sync, filtro_vendas, formatar_data, parse_cursor_historico,
+    parse_cursor_sync, parse_date_yyyy_mm_dd,
+)
+from barbearia.outbox import outbox_pendentes_visiveis, outbox_sem_gravadas
+from barbearia.rollup import resumo_periodo, rollup_somar_vendas
+from barbearia.schema import exigir_schema
+from barbearia.usuarios import diretorio_usuarios, loja_da_requisicao
+from barbearia.vendas import LOTE_MAX_VENDAS, inserir_vendas, invalidar_cache_vendas, normalizar_venda
+
+bp = Blueprint("vendas", __name__)
+
+# =========================
+# ROTAS
+# =========================
+# Linhas por página no /historico (paginação por chave data/hora/id)
+HISTORICO_POR_PAGINA = int(os.environ.get("HISTORICO_POR_PAGINA", "100"))
+
+
+@bp.before_app_request
+def _schema_em_dia():
+    """Primeira requisição do processo: confere (ou, no SQLite local, aplica) o schema."""
+    if request.endpoint in ("monitoramento.healthz", "monitoramento.metrics"):
+        return None
+    if outbox.local is not None:
+        # sobe a thread de envio já na primeira requisição (vendas que ficaram de antes de um restart)
+        outbox.local.iniciar()
+    # Com outbox o POST /registrar não toca no banco (quem confere é o envio)
+    if outbox.local is not None and request.endpoint == "vendas.registrar" and request.method == "POST":
+        return None
+    try:
+        exigir_schema()
+    except RuntimeError as e:
+        print(">>> ERRO:", e)
+        return Response("Banco desatualizado: rode as migrações.", status=503, headers={"Retry-After": "30"})
+
+
+@bp.route("/registrar", methods=["GET", "POST"])
+def registrar():
+    if "usuario" not in session:
+        return redirect("/login")
+
+    if request.method == "POST":
+        venda = normalizar_venda(request.form, session.get("role"), session["usuario"], loja=session.get("loja"))
+
+        if outbox.local is not None:
+            # Formulário antigo (sem chave): a chave nasce aqui
+            venda["idempotency_key"] = venda["idempotency_key"] or uuid.uuid4().hex
+            outbox.local.acrescentar(venda)
+            marcar_escrita()
+            print(">>> OUTBOX:", venda["loja"], venda["barbeiro"], venda["cliente"], venda["total"], venda["pagamento"])
+            return redirect("/historico")
+
+        with get_engine().begin() as conn:
+            inseridas = inserir_vendas(conn, [venda])
+
+        # Reenvio do mesmo formulário (mesma chave) não grava de novo
+        if inseridas:
+            invalidar_cache_vendas(inseridas)
+            eventos_publicar("nova", inseridas)
+        # os próximos relatórios desta sessão leem do principal (já com a venda)
+        marcar_escrita()
+
+        print(">>> INSERT OK:", venda["loja"], venda["barbeiro"], venda["cliente"], venda["total"], venda["pagamento"])
+        return redirect("/historico")
+
+    pagina = render_template(
+        "registrar.html",
+        tipo=session.get("role"),
+        usuario=session.get("usuario"),
+        barbeiros=diretorio_usuarios.nomes(session.get("loja")),
+        # admin de todas as lojas escolhe a loja da venda
+        lojas=None if session.get("loja") else diretorio_usuarios.lojas(),
+        # um envio repetido do mesmo formulário grava uma venda só
+        idempotency_key=uuid.uuid4().hex,
+    )
+    # no-store: voltar para o formulário busca outro (chave nova para a próxima venda)
+    return Response(pagina, headers={"Cache-Control": "no-store"})
+
+
+@bp.route("/api/vendas/lote", methods=["POST"])
+def registrar_lote():
+    """Registra várias vendas (fila offline) numa transação só.
+
+    Corpo: {"vendas": [{cliente, barbeiro, cabelo, ..., pagamento, data, hora,
+    idempotency_key}, ...]}. Cada venda precisa de uma idempotency_key: um
+    reenvio do mesmo lote não duplica nada.
+    """
+    if "usuario" not in session:
+        return jsonify({"erro": "não autenticado"}), 401
+
+    corpo = request.get_json(silent=True) or {}
+    itens = corpo.get("vendas")
+    if not isinstance(itens, list) or not itens:
+        return jsonify({"erro": "envie {\"vendas\": [...]}"}), 400
+    if len(itens) > LOTE_MAX_VENDAS:
+        return jsonify({"erro": f"máximo de {LOTE_MAX_VENDAS} vendas por lote"}), 413
+
+    agora = datetime.now(TZ_BR)
+    vendas, erros, vistas = [], [], set()
+    for i, item in enumerate(itens):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("venda deve ser um objeto")
+            venda = normalizar_venda(item, session.get("role"), session["usuario"],
+                                     agora=agora, aceita_data_hora=True, loja=session.get("loja"))
+            if not venda["idempotency_key"]:
+                raise ValueError("idempotency_key obrigatória")
+        except ValueError as e:
+            erros.append({"indice": i, "erro": str(e)})
+            continue
+        # chave repetida dentro do próprio lote conta uma vez só
+        if venda["idempotency_key"] not in vistas:
+            vistas.add(venda["idempotency_key"])
+            vendas.append(venda)
+
+    if erros:
+        return jsonify({"erro": "lote inválido, nada foi gravado", "erros": erros}), 400
+
+    with get_engine().begin() as conn:
+        inseridas = inserir_vendas(conn, vendas)
+
+    invalidar_cache_vendas(inseridas)
+    eventos_publicar("nova", inseridas)
+    marcar_escrita()
+
+    print(">>> LOTE OK:", session["usuario"], len(inseridas), "de", len(itens))
+    return jsonify({
+        "inseridas": len(inseridas),
+        "duplicadas": len(itens) - len(inseridas),
+        "ids": {v["idempotency_key"]: v["id"] for v in inseridas},
+    })
+
+
+# Máximo de linhas por resposta do sync (o cliente repete com o cursor novo)
+SYNC_LIMITE = int(os.environ.get("SYNC_LIMITE", "500"))
+
+# Início da janela de atraso do sync, no relógio do banco (o mesmo de updated_at)
+SQL_SYNC_HORIZONTE = {
+    "postgresql": "SELECT CAST(CURRENT_TIMESTAMP AS TIMESTAMP) - make_interval(secs => :atraso)",
+    "sqlite": "SELECT datetime('now', '-' || :atraso || ' seconds')",
+}
+
+
+def chave_sync(updated_at, venda_id):
+    """(updated_at, id) comparável, venha o updated_at como datetime ou texto."""
+    if not isinstance(updated_at, datetime):
+        updated_at = datetime.fromisoformat(str(updated_at))
+    return updated_at, venda_id
+
+
+@bp.route("/api/vendas/sync")
+def vendas_sync():
+    """Vendas novas e excluídas desde um cursor, para telas que acompanham o dia.
+
+    Sem ?desde= devolve as vendas ativas de hoje e o cursor atual. Com ?desde=
+    devolve as vendas gravadas ou excluídas (updated_at, id) depois dele. O
+    cursor não passa do início da janela de SYNC_ATRASO_S: o que mudou nela
+    volta no próximo sync, e o cliente aplica novas/excluidas por id (repetir
+    é inofensivo). Assim uma venda confirmada fora da ordem dos ids não fica
+    para trás. O ETag cobre o cursor e os ids devolvidos: com If-None-Match
+    igual e nada novo a resposta é 304.
+    """
+    if "usuario" not in session:
+        return jsonify({"erro": "não autenticado"}), 401
+
+    role = session.get("role")
+    usuario = session.get("usuario")
+    loja = loja_da_requisicao()
+    desde = request.args.get("desde")
+    colunas = "id, data, hora, cliente, barbeiro, cabelo, barba, sobrancelha, " \
+              "produto_nome, produto_valor, desconto, total, pagamento, loja"
+
+    with get_engine().connect() as conn:
+        # Lido antes das linhas: o que for gravado depois vem no próximo sync
+        horizonte = chave_sync(
+            conn.execute(text(SQL_SYNC_HORIZONTE[DIALETO]), {"atraso": SYNC_ATRASO_S}).scalar(), 0,
+        )
+        if not desde:
+            hoje = datetime.now(TZ_BR).date()
+            where_sql, params = filtro_vendas(role, usuario, hoje, hoje, loja=loja)
+            novas = conn.execute(
+                text(f"SELECT {colunas} FROM vendas {where_sql} ORDER BY id"),
+                params,
+            ).mappings().all()
+            excluidas = []
+            cursor = cursor_sync(*horizonte)
+            mais = False
+        else:
+            c = parse_cursor_sync(desde)
+            if c is None:
+                return jsonify({"erro": "cursor inválido"}), 400
+
+            where_todas, params = filtro_vendas(role, usuario, apenas_ativas=False, loja=loja)
+            params.update(c, limite=SYNC_LIMITE + 1)
+            linhas = conn.execute(text(f"""
+                SELECT {colunas}, deleted_at, updated_at
+                FROM vendas
+                {where_todas}
+                  AND (updated_at > :c_upd OR (updated_at = :c_upd AND id > :c_id))
+                ORDER BY updated_at, id
+                LIMIT :limite
+            """), params).mappings().all()
+
+            mais = len(linhas) > SYNC_LIMITE
+            linhas = linhas[:SYNC_LIMITE]
+            novas = [r for r in linhas if r["deleted_at"] is None]
+            excluidas = [r for r in linhas if r["deleted_at"] is not None]
+
+            # Avança até a última mudança entregue, mas não para dentro da
+            # janela de atraso (a não ser para paginar)
+            proximo = chave_sync(c["c_upd"], c["c_id"])
+            if linhas:
+                ultima = chave_sync(linhas[-1]["updated_at"], linhas[-1]["id"])
+                proximo = max(proximo, ultima if mais else min(ultima, horizonte))
+            cursor = cursor_sync(*proximo)
+
+    # Mesmo escopo + mesmo desde + mesmo cursor + mesmas vendas = mesma resposta
+    ids = ",".join([str(r["id"]) for r in novas] + [f"-{r['id']}" for r in excluidas])
+    etag = hashlib.sha1(f"{role}:{usuario}:{loja}:{desde}:{cursor}:{ids}".encode()).hexdigest()[:20]
+    if request.if_none_match.contains(etag):
+        resposta = Response(status=304)
+    else:
+        resposta = jsonify({
+            "cursor": cursor,
+            "mais": mais,
+            "novas": [VendaLinha(r).como_dict() for r in novas],
+            "excluidas": [
+                {"id": r["id"], "data": str(r["data"])[:10], "barbeiro": r["barbeiro"], "loja": r["loja"]}
+                for r in excluidas
+            ],
+        })
+    resposta.set_etag(etag)
+    resposta.headers["Cache-Control"] = "private, no-cache"
+    return resposta
+
+
+@bp.route("/historico")
+def historico():
+    if "usuario" not in session:
+        return redirect("/login")
+
+    role = session.get("role")
+    usuario = session.get("usuario")
+    loja = loja_da_requisicao()
+
+    # filtros
+    data_inicio_str = request.args.get("data_inicio", "") or ""
+    data_fim_str = request.args.get("data_fim", "") or ""
+
+    # ✅ Admin pode ver "todo o período" (sem filtro de data)
+    todo_periodo = role == "admin" and request.args.get("periodo") == "tudo"
+    if todo_periodo:
+        data_inicio_str = data_fim_str = ""
+
+    # ✅ Se não veio filtro, usa o dia de hoje (Brasil) como padrão (para TODOS)
+    elif not data_inicio_str and not data_fim_str:
+        hoje_padrao = datetime.now(TZ_BR).date().strftime("%Y-%m-%d")
+        data_inicio_str = hoje_padrao
+        data_fim_str = hoje_padrao
+
+    data_inicio = parse_date_yyyy_mm_dd(data_inicio_str)
+    data_fim = parse_date_yyyy_mm_dd(data_fim_str)
+
+    where_sql, params = filtro_vendas(role, usuario, data_inicio, data_fim, loja=loja)
+    where_rollup_sql, _ = filtro_vendas(role, usuario, data_inicio, data_fim, apenas_ativas=False, loja=loja)
+
+    # Paginação por chave (data, hora, id): "apos" = última linha da página
+    # atual (próxima página), "antes" = primeira linha (página anterior).
+    cursor_apos = parse_cursor_historico(request.args.get("apos"))
+    cursor_antes = None if cursor_apos else parse_cursor_historico(request.args.get("antes"))
+
+    keyset_sql = ""
+    ordem = "DESC"
+    if cursor_apos:
+        keyset_sql = " AND (data, hora, id) < (:c_data, :c_hora, :c_id)"
+        params.update(cursor_apos)
+    elif cursor_antes:
+        keyset_sql = " AND (data, hora, id) > (:c_data, :c_hora, :c_id)"
+        params.update(cursor_antes)
+        ordem = "ASC"
+
+    # totais do dia e do mês (hoje) - ✅ ignorando deletadas
+    hoje = datetime.now(TZ_BR).date()
+    mes_inicio = hoje.replace(day=1)
+
+    where_mes = ["data >= :mes_inicio", "data <= :hoje"]
+    if loja:
+        where_mes.append("loja = :loja")
+    if role != "admin":
+        where_mes.append("barbeiro = :barbeiro")
+    params.update({"mes_inicio": mes_inicio, "hoje": hoje, "limite": HISTORICO_POR_PAGINA + 1})
+
+    sql_pagina = f"""
+        SELECT id, data, hora, cliente, barbeiro,
+               cabelo, barba, sobrancelha, produto_nome, produto_valor, desconto, total,
+               pagamento, loja, idempotency_key
+        FROM vendas
+        {where_sql}{keyset_sql}
+        ORDER BY data {ordem}, hora {ordem}, id {ordem}
+        LIMIT :limite
+    """
+
+    escopo = None if role == "admin" else usuario
+    chave_totais = ("totais", loja, escopo, mes_inicio.isoformat(), hoje.isoformat())
+    chave_contagem = ("contagem", loja, escopo, data_inicio_str or None, data_fim_str or None)
+    totais = cache_leitura(chave_totais)
+    qtd_filtro = cache_leitura(chave_contagem)
+
+    # Vendas ainda no outbox: entram nos totais e no topo da primeira página,
+    # marcadas como pendentes, até a thread de envio gravá-las no banco
+    pendentes = outbox_pendentes_visiveis(
+        role, usuario, loja, desde=min(mes_inicio, data_inicio) if data_inicio else None,
+    )
+
+    # Página e totais são relatório: vão para a réplica de leitura (se houver)
+    with conectar_leitura() as conn:
+        # antes da página: o que já estiver gravado aqui também está nela
+        if pendentes:
+            pendentes = outbox_sem_gravadas(conn, pendentes)
+        if totais is not None and qtd_filtro is not None:
+            rows = conn.execute(text(sql_pagina), params).mappings().all()
+        else:
+            # Uma única ida ao banco: os totais e a contagem saem do rollup diário
+            # (poucas linhas), a página sai de vendas com LIMIT, e tudo é "colado"
+            # via LEFT JOIN (sempre volta ao menos uma linha, mesmo sem vendas).
+            rows = conn.execute(
+                text(f"""
+                    WITH totais AS (
+                        SELECT COALESCE(SUM(CASE WHEN data = :hoje THEN total ELSE 0 END), 0) AS total_dia,
+                               COALESCE(SUM(total), 0) AS total_mes
+                        FROM vendas_diarias
+                        WHERE {' AND '.join(where_mes)}
+                    ),
+                    contagem AS (
+                        SELECT COALESCE(SUM(qtd), 0) AS qtd_filtro
+                        FROM vendas_diarias
+                        {where_rollup_sql}
+                    ),
+                    pagina AS ({sql_pagina})
+                    SELECT t.total_dia, t.total_mes, c.qtd_filtro, p.*
+                    FROM totais t
+                    CROSS JOIN contagem c
+                    LEFT JOIN pagina p ON 1 = 1
+                    ORDER BY p.data {ordem}, p.hora {ordem}, p.id {ordem}
+                """),
+                params
+            ).mappings().all()
+
+            totais = [float(rows[0]["total_dia"] or 0), float(rows[0]["total_mes"] or 0)]
+            qtd_filtro = int(rows[0]["qtd_filtro"] or 0)
+            cache_resumos.set(chave_totais, totais)
+            cache_resumos.set(chave_contagem, qtd_filtro)
+
+    total_dia, total_mes = totais
+
+    pagina = [r for r in rows if r["id"] is not None]
+    tem_mais = len(pagina) > HISTORICO_POR_PAGINA
+    pagina = pagina[:HISTORICO_POR_PAGINA]
+    if cursor_antes:
+        pagina.reverse()
+
+    vendas = [VendaLinha(r) for r in pagina]
+
+    # Gravada entre a consulta das chaves e a da página: fica só a do banco
+    na_pagina = {r["idempotency_key"] for r in pagina if r["idempotency_key"]}
+    pendentes = [v for v in pendentes if v["idempotency_key"] not in na_pagina]
+    if pendentes:
+        total_dia = float(total_dia) + sum(v["total"] for v in pendentes if v["data"] == hoje)
+        total_mes = float(total_mes) + sum(v["total"] for v in pendentes if mes_inicio <= v["data"] <= hoje)
+        no_filtro = [v for v in pendentes
+                     if (not data_inicio or v["data"] >= data_inicio) and (not data_fim or v["data"] <= data_fim)]
+        qtd_filtro += len(no_filtro)
+        if not cursor_apos and not cursor_antes:
+            no_filtro.sort(key=lambda v: (v["data"], v["hora"]), reverse=True)
+            vendas = [VendaLinha({**v, "id": None, "pendente": True}) for v in no_filtro] + vendas
+
+    # Links de navegação preservando os filtros
+    filtros_qs = {"data_inicio": data_inicio_str, "data_fim": data_fim_str}
+    if todo_periodo:
+        filtros_qs = {"periodo": "tudo"}
+    # Admin de todas as lojas: a loja escolhida segue nos links
+    lojas = diretorio_usuarios.lojas() if role == "admin" and not session.get("loja") else None
+    loja_qs = f"&{urlencode({'loja': loja})}" if lojas and loja else ""
+    if loja_qs:
+        filtros_qs["loja"] = loja
+
+    url_proxima = url_anterior = None
+    if pagina and (tem_mais or cursor_antes):
+        url_proxima = "/historico?" + urlencode({**filtros_qs, "apos": cursor_historico(pagina[-1])})
+    if pagina and ((cursor_antes and tem_mais) or cursor_apos):
+        url_anterior = "/historico?" + urlencode({**filtros_qs, "antes": cursor_historico(pagina[0])})
+
+    return render_template(
+        "historico.html",
+        vendas=vendas,
+        usuario=usuario,
+        tipo=role,
+        data_inicio=data_inicio_str,
+        data_fim=data_fim_str,
+        todo_periodo=todo_periodo,
+        loja=loja,
+        lojas=lojas,
+        loja_qs=loja_qs,
+        qtd_filtro=qtd_filtro,
+        url_proxima=url_proxima,
+        url_anterior=url_anterior,
+        total_dia=f"{float(total_dia):.2f}",
+        total_mes=f"{float(total_mes):.2f}",
+        parquet=pyarrow_disponivel(),
+    )
+
+
+@bp.route("/download")
+def download():
+    if "usuario" not in session:
+        return redirect("/login")
+
+    role = session.get("role")
+    usuario = session.get("usuario")
+
+    data_inicio_str = request.args.get("data_inicio", "") or ""
+    data_fim_str = request.args.get("data_fim", "") or ""
+    data_inicio = parse_date_yyyy_mm_dd(data_inicio_str)
+    data_fim = parse_date_yyyy_mm_dd(data_fim_str)
+
+    formato = request.args.get("formato", "csv") or "csv"
+    if formato not in FORMATOS_DOWNLOAD:
+        return f"Formato inválido: use {', '.join(FORMATOS_DOWNLOAD)}", 400
+    if formato in FORMATOS_ARROW and not pyarrow_disponivel():
+        return f"Formato {formato} indisponível: o servidor não tem pyarrow instalado", 501
+    gerador, mimetype, extensao = FORMATOS_DOWNLOAD[formato]
+
+    loja = loja_da_requisicao()
+    where_sql, params = filtro_vendas(role, usuario, data_inicio, data_fim, loja=loja)
+
+    # Cursor do lado do servidor: as linhas vêm do banco em lotes enquanto
+    # o arquivo é enviado, sem carregar o período inteiro na memória. Lê da
+    # réplica (se houver): exportação grande não disputa o banco com o caixa.
+    conn = conectar_leitura()
+    try:
+        rows = conn.execution_options(stream_results=True, yield_per=DOWNLOAD_LOTE).execute(
+            text(SQL_VENDAS_DETALHADAS.format(where_sql=where_sql)),
+            params
+        ).mappings()
+        primeira = rows.fetchone()
+    except Exception:
+        conn.close()
+        raise
+
+    if primeira is None:
+        conn.close()
+        return redirect("/historico")
+
+    def gerar():
+        try:
+            yield from gerador(
+                itertools.chain([primeira], rows), data_inicio_str, data_fim_str
+            )
+        finally:
+            conn.close()
+
+    filename = f"vendas_{loja}_{usuario}.{extensao}" if loja else f"vendas_{usuario}.{extensao}"
+    return Response(
+        stream_with_context(gerar()),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@bp.route("/resumo_mes")
+def resumo_mes():
+    """Resumo do mês atual (Brasil), respeitando permissões e ignorando deletadas."""
+    if "usuario" not in session:
+        return redirect("/login")
+
+    role = session.get("role")
+    usuario = session.get("usuario")
+
+    loja = loja_da_requisicao()
+    hoje = datetime.now(TZ_BR).date()
+    mes_inicio = hoje.replace(day=1)
+
+    # Lê as poucas linhas do rollup do mês em vez de reagregar vendas
+    chave = ("resumo", loja, None if role == "admin" else usuario, mes_inicio.isoformat(), hoje.isoformat())
+    resumo = cache_leitura(chave)
+    if resumo is None:
+        with conectar_leitura() as conn:
+            resumo = resumo_periodo(conn, role, usuario, mes_inicio, hoje, loja=loja)
+        cache_resumos.set(chave, resumo)
+
+    total_mes = resumo["total"]
+    por_barbeiro = resumo["por_barbeiro"]
+    por_pagamento = resumo["por_pagamento"]
+    por_dia = resumo["por_dia"]
+
+    # Formata datas do por_dia
+    por_dia_fmt = [{
+        "data": formatar_data(drow.get("data")),
+        "total": f"{float(drow.get('total') or 0):.2f}"
+    } for drow in por_dia]
+
+    por_barbeiro_fmt = [{
+        "barbeiro": (r.get("barbeiro") or ""),
+        "total": f"{float(r.get('total') or 0):.2f}"
+    } for r in por_barbeiro]
+
+    por_pagamento_fmt = [{
+        "pagamento": (r.get("pagamento") or "nao_informado"),
+        "total": f"{float(r.get('total') or 0):.2f}"
+    } for r in por_pagamento]
+
+    # Quebra por loja só na visão de todas as lojas
+    por_loja_fmt = [{
+        "loja": r["loja"],
+        "total": f"{float(r['total'] or 0):.2f}"
+    } for r in resumo.get("por_loja", [])] if loja is None and role == "admin" else []
+
+    return render_template(
+        "resumo_mes.html",
+        usuario=usuario,
+        tipo=role,
+        mes_inicio=mes_inicio.strftime("%d/%m/%Y"),
+        hoje=hoje.strftime("%d/%m/%Y"),
+        total_mes=f"{float(total_mes):.2f}",
+        loja=loja,
+        por_loja=por_loja_fmt,
+        por_barbeiro=por_barbeiro_fmt,
+        por_pagamento=por_pagamento_fmt,
+        por_dia=por_dia_fmt,
+    )
+
+
+# =========================
+# EXCLUIR VENDA (ADMIN)
+# =========================
+@bp.route("/venda/<int:venda_id>/excluir", methods=["POST"])
+def excluir_venda(venda_id: int):
+    if "usuario" not in session:
+        return redirect("/login")
+
+    if session.get("role") != "admin":
+        abort(403)
+
+    usuario = session.get("usuario")
+    # A chave de vendas é (id, data): com a data o Postgres vai direto na
+    # partição do mês em vez de procurar o id em todas
+    try:
+        data_venda = date.fromisoformat(request.form.get("data", ""))
+    except ValueError:
+        abort(400)
+
+    # Admin de uma loja só exclui vendas dela
+    params = {"id": venda_id, "data": data_venda, "deleted_by": usuario}
+    filtro_loja = ""
+    if session.get("loja"):
+        filtro_loja = "AND loja = :loja"
+        params["loja"] = session["loja"]
+
+    with get_engine().begin() as conn:
+        excluida = conn.execute(
+            text(f"""
+                UPDATE vendas
+                SET deleted_at = CURRENT_TIMESTAMP,
+                    updated_at = CURRENT_TIMESTAMP,
+                    deleted_by = :deleted_by
+                WHERE id = :id
+                  AND data = :data
+                  AND deleted_at IS NULL
+                  {filtro_loja}
+                RETURNING id, data, hora, cliente, barbeiro, pagamento, loja,
+                          total, cabelo, barba, sobrancelha, produto_valor, desconto
+            """),
+            params
+        ).mappings().first()
+
+        if excluida:
+            rollup_somar_vendas(conn, [excluida], sinal=-1)
+
+    if excluida:
+        invalidar_cache_vendas([excluida])
+        eventos_publicar("excluida", [excluida])
+        marcar_escrita()
+
+    # volta pro histórico preservando filtros atuais
+    filtros = {
+        "data_inicio": request.args.get("data_inicio", "") or "",
+        "data_fim": request.args.get("data_fim", "") or "",
+    }
+    if request.args.get("loja"):
+        filtros["loja"] = request.args["loja"]
+    return redirect("/historico?" + urlencode(filtros))
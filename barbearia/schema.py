@@ -0,0 +1,768 @@
+"""Migrações versionadas, partições de vendas e o comando `flask banco`."""
+from flask.cli import AppGroup
+import click
+import os
+import threading
+import time
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from barbearia.banco import DIALETO, get_engine
+from barbearia.helpers import ACENTOS_DE, ACENTOS_PARA
+
+# =========================
+# SCHEMA (migrações versionadas)
+# =========================
+# Cada passo tem um número de versão e o DDL por dialeto. init_db() aplica,
+# em ordem, só os passos que ainda não constam em schema_versao.
+# Somas guardadas no rollup por (loja, data, barbeiro, pagamento), além de qtd
+COLUNAS_ROLLUP = ["total", "cabelo", "barba", "sobrancelha", "produto_valor", "desconto"]
+
+# Recalcula o rollup a partir das vendas ativas (usado na migração e no rebuild)
+SQL_ROLLUP_RECALCULO = """
+    INSERT INTO vendas_diarias (loja, data, barbeiro, pagamento, total,
+                                cabelo, barba, sobrancelha, produto_valor, desconto, qtd)
+    SELECT loja, data, barbeiro, pagamento, COALESCE(SUM(total), 0),
+           COALESCE(SUM(cabelo), 0), COALESCE(SUM(barba), 0), COALESCE(SUM(sobrancelha), 0),
+           COALESCE(SUM(produto_valor), 0), COALESCE(SUM(desconto), 0), COUNT(*)
+    FROM vendas
+    {where_sql}
+    GROUP BY loja, data, barbeiro, pagamento
+"""
+# Histograma do ticket: quantas vendas de cada total por (loja, data, barbeiro).
+# Os valores se repetem muito (combinações de serviço), então os percentis
+# saem exatos de poucas linhas.
+SQL_TICKET_RECALCULO = """
+    INSERT INTO vendas_diarias_ticket (loja, data, barbeiro, total, qtd)
+    SELECT loja, data, barbeiro, total, COUNT(*)
+    FROM vendas
+    {where_sql}
+    GROUP BY loja, data, barbeiro, total
+"""
+# Nome do cliente para busca (normalizar_cliente) feito pelo Postgres: a mesma
+# tabela de acentos no translate() e os espaços colapsados
+SQL_NORMALIZAR_CLIENTE_PG = (
+    f"btrim(regexp_replace(lower(translate(cliente, '{ACENTOS_DE}', '{ACENTOS_PARA}')), '\\s+', ' ', 'g'))"
+)
+# Forma da migração 3 (antes da coluna loja); migrações antigas não mudam
+_SQL_ROLLUP_RECALCULO_V3 = """
+    INSERT INTO vendas_diarias (data, barbeiro, pagamento, total, qtd)
+    SELECT data, barbeiro, pagamento, COALESCE(SUM(total), 0), COUNT(*)
+    FROM vendas
+    WHERE deleted_at IS NULL
+    GROUP BY data, barbeiro, pagamento
+"""
+# Forma da migração 10 (rollup com loja e somas por serviço, ticket por total)
+_SQL_ROLLUP_RECALCULO_V10 = """
+    INSERT INTO vendas_diarias (loja, data, barbeiro, pagamento, total,
+                                cabelo, barba, sobrancelha, produto_valor, desconto, qtd)
+    SELECT loja, data, barbeiro, pagamento, COALESCE(SUM(total), 0),
+           COALESCE(SUM(cabelo), 0), COALESCE(SUM(barba), 0), COALESCE(SUM(sobrancelha), 0),
+           COALESCE(SUM(produto_valor), 0), COALESCE(SUM(desconto), 0), COUNT(*)
+    FROM vendas
+    WHERE deleted_at IS NULL
+    GROUP BY loja, data, barbeiro, pagamento
+"""
+_SQL_TICKET_RECALCULO_V10 = """
+    INSERT INTO vendas_diarias_ticket (loja, data, barbeiro, total, qtd)
+    SELECT loja, data, barbeiro, total, COUNT(*)
+    FROM vendas
+    WHERE deleted_at IS NULL
+    GROUP BY loja, data, barbeiro, total
+"""
+
+MIGRACOES = [
+    (1, "cria tabela vendas", {
+        "postgresql": ["""
+            CREATE TABLE IF NOT EXISTS vendas (
+                id SERIAL PRIMARY KEY,
+                data DATE NOT NULL,
+                hora VARCHAR(5) NOT NULL,
+                cliente TEXT NOT NULL,
+                barbeiro TEXT NOT NULL,
+                cabelo NUMERIC(10,2) NOT NULL DEFAULT 0,
+                barba NUMERIC(10,2) NOT NULL DEFAULT 0,
+                sobrancelha NUMERIC(10,2) NOT NULL DEFAULT 0,
+                produto_nome TEXT,
+                produto_valor NUMERIC(10,2) NOT NULL DEFAULT 0,
+                desconto NUMERIC(10,2) NOT NULL DEFAULT 0,
+                total NUMERIC(10,2) NOT NULL DEFAULT 0,
+                pagamento TEXT NOT NULL DEFAULT 'nao_informado',
+                deleted_at TIMESTAMP NULL,
+                deleted_by TEXT
+            )
+        """],
+        "sqlite": ["""
+            CREATE TABLE IF NOT EXISTS vendas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                data TEXT NOT NULL,
+                hora TEXT NOT NULL,
+                cliente TEXT NOT NULL,
+                barbeiro TEXT NOT NULL,
+                cabelo REAL NOT NULL DEFAULT 0,
+                barba REAL NOT NULL DEFAULT 0,
+                sobrancelha REAL NOT NULL DEFAULT 0,
+                produto_nome TEXT,
+                produto_valor REAL NOT NULL DEFAULT 0,
+                desconto REAL NOT NULL DEFAULT 0,
+                total REAL NOT NULL DEFAULT 0,
+                pagamento TEXT NOT NULL DEFAULT 'nao_informado',
+                deleted_at TEXT,
+                deleted_by TEXT
+            )
+        """],
+    }),
+    # Índices parciais para os filtros de historico/download/resumo_mes:
+    # sempre "deleted_at IS NULL" + faixa de data (+ barbeiro), ordenando
+    # por data/hora. A sintaxe é a mesma no Postgres e no SQLite.
+    (2, "índices parciais de vendas ativas", {
+        "*": [
+            """
+            CREATE INDEX IF NOT EXISTS ix_vendas_ativas_data_hora
+            ON vendas (data, hora)
+            WHERE deleted_at IS NULL
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS ix_vendas_ativas_barbeiro_data
+            ON vendas (barbeiro, data, hora)
+            WHERE deleted_at IS NULL
+            """,
+        ],
+    }),
+    # Rollup diário: somas/contagens por (data, barbeiro, pagamento), mantido
+    # por registrar/excluir_venda na mesma transação da venda.
+    (3, "rollup diário vendas_diarias", {
+        "postgresql": [
+            """
+            CREATE TABLE IF NOT EXISTS vendas_diarias (
+                data DATE NOT NULL,
+                barbeiro TEXT NOT NULL,
+                pagamento TEXT NOT NULL,
+                total NUMERIC(12,2) NOT NULL DEFAULT 0,
+                qtd INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (data, barbeiro, pagamento)
+            )
+            """,
+            _SQL_ROLLUP_RECALCULO_V3,
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS vendas_diarias (
+                data TEXT NOT NULL,
+                barbeiro TEXT NOT NULL,
+                pagamento TEXT NOT NULL,
+                total REAL NOT NULL DEFAULT 0,
+                qtd INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (data, barbeiro, pagamento)
+            )
+            """,
+            _SQL_ROLLUP_RECALCULO_V3,
+        ],
+    }),
+    # Chaves de idempotência dos lotes: a tabela separada garante que um
+    # reenvio nunca conta a mesma venda duas vezes.
+    (4, "chaves de idempotência de vendas", {
+        "*": [
+            "ALTER TABLE vendas ADD COLUMN idempotency_key TEXT",
+            """
+            CREATE TABLE IF NOT EXISTS vendas_idempotencia (
+                chave TEXT PRIMARY KEY,
+                criado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+    }),
+    # Progresso das importações do historico.csv legado (retomáveis)
+    (5, "progresso de importações", {
+        "*": [
+            """
+            CREATE TABLE IF NOT EXISTS importacoes (
+                arquivo_hash TEXT PRIMARY KEY,
+                arquivo TEXT NOT NULL,
+                linhas_lidas INTEGER NOT NULL DEFAULT 0,
+                inseridas INTEGER NOT NULL DEFAULT 0,
+                erros INTEGER NOT NULL DEFAULT 0,
+                concluida INTEGER NOT NULL DEFAULT 0,
+                atualizado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+    }),
+    # Cursor do /api/vendas/sync em ordem de gravação: quem insere ou exclui
+    # grava updated_at (inserir_vendas, excluir_venda, importação). Sem trigger
+    # nem default: venda sem updated_at (as anteriores à migração) não entra no
+    # sync até ser excluída. Um cursor por id perderia vendas no Postgres, que
+    # não confirma os ids em ordem.
+    (6, "updated_at e índice do sync de vendas", {
+        "postgresql": [
+            "ALTER TABLE vendas ADD COLUMN updated_at TIMESTAMP",
+            "CREATE INDEX IF NOT EXISTS ix_vendas_updated_at ON vendas (updated_at, id)",
+        ],
+        "sqlite": [
+            "ALTER TABLE vendas ADD COLUMN updated_at TEXT",
+            "CREATE INDEX IF NOT EXISTS ix_vendas_updated_at ON vendas (updated_at, id)",
+        ],
+    }),
+    # Usuários com senha em hash (substitui o dict USUARIOS)
+    (7, "tabela usuarios", {
+        "*": [
+            """
+            CREATE TABLE IF NOT EXISTS usuarios (
+                usuario TEXT PRIMARY KEY,
+                senha_hash TEXT NOT NULL,
+                role TEXT NOT NULL,
+                ativo INTEGER NOT NULL DEFAULT 1,
+                atualizado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+    }),
+    # Postgres: vendas particionada por mês (data), com partição default para
+    # datas sem partição ainda. Nos dois bancos: vendas_arquivo recebe as
+    # vendas excluídas de meses fechados (flask vendas arquivar).
+    (8, "vendas particionada por mês e vendas_arquivo", {
+        "postgresql": [
+            # Os índices são recriados na tabela nova (valem para cada partição)
+            "DROP INDEX IF EXISTS ix_vendas_ativas_data_hora",
+            "DROP INDEX IF EXISTS ix_vendas_ativas_barbeiro_data",
+            "DROP INDEX IF EXISTS ix_vendas_updated_at",
+            "ALTER TABLE vendas RENAME TO vendas_nao_particionada",
+            "ALTER TABLE vendas_nao_particionada RENAME CONSTRAINT vendas_pkey TO vendas_nao_particionada_pkey",
+            # A sequence dos ids continua a mesma (não pode sumir com a tabela antiga)
+            "ALTER SEQUENCE vendas_id_seq OWNED BY NONE",
+            """
+            CREATE TABLE vendas (
+                LIKE vendas_nao_particionada INCLUDING DEFAULTS,
+                PRIMARY KEY (id, data)
+            ) PARTITION BY RANGE (data)
+            """,
+            "ALTER SEQUENCE vendas_id_seq OWNED BY vendas.id",
+            "CREATE TABLE vendas_default PARTITION OF vendas DEFAULT",
+            """
+            CREATE OR REPLACE FUNCTION vendas_criar_particao(mes DATE) RETURNS TEXT AS $$
+            DECLARE
+                inicio DATE := date_trunc('month', mes)::date;
+                fim DATE := (date_trunc('month', mes) + INTERVAL '1 month')::date;
+                nome TEXT := 'vendas_' || to_char(mes, 'YYYY_MM');
+            BEGIN
+                IF to_regclass(nome) IS NOT NULL THEN
+                    RETURN nome;
+                END IF;
+                -- vários workers subindo juntos: um cria, os outros esperam
+                PERFORM pg_advisory_xact_lock(hashtext('vendas_criar_particao'));
+                IF to_regclass(nome) IS NOT NULL THEN
+                    RETURN nome;
+                END IF;
+                EXECUTE format('CREATE TABLE %I (LIKE vendas INCLUDING DEFAULTS)', nome);
+                -- vendas do mês que caíram na default antes da partição existir
+                EXECUTE format(
+                    'WITH movidas AS (DELETE FROM vendas_default WHERE data >= %L AND data < %L RETURNING *) '
+                    'INSERT INTO %I SELECT * FROM movidas', inicio, fim, nome);
+                EXECUTE format('ALTER TABLE vendas ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                               nome, inicio, fim);
+                RETURN nome;
+            END
+            $$ LANGUAGE plpgsql
+            """,
+            # Uma partição por mês com venda, até dois meses à frente
+            """
+            SELECT vendas_criar_particao(mes::date)
+            FROM (SELECT MIN(data) AS primeira, MAX(data) AS ultima FROM vendas_nao_particionada) AS l,
+                 generate_series(
+                     date_trunc('month', COALESCE(l.primeira, CURRENT_DATE)),
+                     date_trunc('month', GREATEST(COALESCE(l.ultima, CURRENT_DATE), CURRENT_DATE))
+                         + INTERVAL '2 months',
+                     INTERVAL '1 month'
+                 ) AS mes
+            """,
+            "INSERT INTO vendas SELECT * FROM vendas_nao_particionada",
+            "DROP TABLE vendas_nao_particionada",
+            """
+            CREATE INDEX IF NOT EXISTS ix_vendas_ativas_data_hora
+            ON vendas (data, hora)
+            WHERE deleted_at IS NULL
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS ix_vendas_ativas_barbeiro_data
+            ON vendas (barbeiro, data, hora)
+            WHERE deleted_at IS NULL
+            """,
+            "CREATE INDEX IF NOT EXISTS ix_vendas_updated_at ON vendas (updated_at, id)",
+            """
+            CREATE TABLE IF NOT EXISTS vendas_arquivo (
+                LIKE vendas,
+                arquivada_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id)
+            )
+            """,
+            "ANALYZE vendas",
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS vendas_arquivo (
+                id INTEGER PRIMARY KEY,
+                data TEXT NOT NULL,
+                hora TEXT NOT NULL,
+                cliente TEXT NOT NULL,
+                barbeiro TEXT NOT NULL,
+                cabelo REAL NOT NULL DEFAULT 0,
+                barba REAL NOT NULL DEFAULT 0,
+                sobrancelha REAL NOT NULL DEFAULT 0,
+                produto_nome TEXT,
+                produto_valor REAL NOT NULL DEFAULT 0,
+                desconto REAL NOT NULL DEFAULT 0,
+                total REAL NOT NULL DEFAULT 0,
+                pagamento TEXT NOT NULL DEFAULT 'nao_informado',
+                deleted_at TEXT,
+                deleted_by TEXT,
+                idempotency_key TEXT,
+                updated_at TEXT,
+                arquivada_em TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+    }),
+    # Filiais: loja em vendas, no rollup (chave começa pela loja), no arquivo
+    # e nos usuários (NULL = admin de todas as lojas). Os índices por barbeiro
+    # passam a começar pela loja; (data, hora) fica para a visão de todas.
+    (9, "lojas (filiais) em vendas, rollup e usuários", {
+        "postgresql": [
+            # Partições herdam a coluna; default constante não reescreve a tabela
+            "ALTER TABLE vendas ADD COLUMN loja TEXT NOT NULL DEFAULT 'matriz'",
+            "ALTER TABLE vendas_arquivo ADD COLUMN loja TEXT NOT NULL DEFAULT 'matriz'",
+            "ALTER TABLE vendas_diarias ADD COLUMN loja TEXT NOT NULL DEFAULT 'matriz'",
+            "ALTER TABLE vendas_diarias DROP CONSTRAINT vendas_diarias_pkey",
+            "ALTER TABLE vendas_diarias ADD PRIMARY KEY (loja, data, barbeiro, pagamento)",
+            "CREATE INDEX IF NOT EXISTS ix_vendas_diarias_data ON vendas_diarias (data)",
+            "ALTER TABLE usuarios ADD COLUMN loja TEXT",
+            "UPDATE usuarios SET loja = 'matriz' WHERE role <> 'admin'",
+            "DROP INDEX IF EXISTS ix_vendas_ativas_barbeiro_data",
+            """
+            CREATE INDEX IF NOT EXISTS ix_vendas_ativas_loja_data
+            ON vendas (loja, data, hora)
+            WHERE deleted_at IS NULL
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS ix_vendas_ativas_loja_barbeiro_data
+            ON vendas (loja, barbeiro, data, hora)
+            WHERE deleted_at IS NULL
+            """,
+            # Sync de uma loja; (updated_at, id) fica para o admin de todas
+            "CREATE INDEX IF NOT EXISTS ix_vendas_loja_updated_at ON vendas (loja, updated_at, id)",
+            "ANALYZE vendas",
+        ],
+        "sqlite": [
+            "ALTER TABLE vendas ADD COLUMN loja TEXT NOT NULL DEFAULT 'matriz'",
+            "ALTER TABLE vendas_arquivo ADD COLUMN loja TEXT NOT NULL DEFAULT 'matriz'",
+            # SQLite não troca a chave primária: recria o rollup
+            """
+            CREATE TABLE vendas_diarias_nova (
+                loja TEXT NOT NULL DEFAULT 'matriz',
+                data TEXT NOT NULL,
+                barbeiro TEXT NOT NULL,
+                pagamento TEXT NOT NULL,
+                total REAL NOT NULL DEFAULT 0,
+                qtd INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (loja, data, barbeiro, pagamento)
+            )
+            """,
+            """
+            INSERT INTO vendas_diarias_nova (loja, data, barbeiro, pagamento, total, qtd)
+            SELECT 'matriz', data, barbeiro, pagamento, total, qtd FROM vendas_diarias
+            """,
+            "DROP TABLE vendas_diarias",
+            "ALTER TABLE vendas_diarias_nova RENAME TO vendas_diarias",
+            "CREATE INDEX IF NOT EXISTS ix_vendas_diarias_data ON vendas_diarias (data)",
+            "ALTER TABLE usuarios ADD COLUMN loja TEXT",
+            "UPDATE usuarios SET loja = 'matriz' WHERE role <> 'admin'",
+            "DROP INDEX IF EXISTS ix_vendas_ativas_barbeiro_data",
+            """
+            CREATE INDEX IF NOT EXISTS ix_vendas_ativas_loja_data
+            ON vendas (loja, data, hora)
+            WHERE deleted_at IS NULL
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS ix_vendas_ativas_loja_barbeiro_data
+            ON vendas (loja, barbeiro, data, hora)
+            WHERE deleted_at IS NULL
+            """,
+            # Sync de uma loja; (updated_at, id) fica para o admin de todas
+            "CREATE INDEX IF NOT EXISTS ix_vendas_loja_updated_at ON vendas (loja, updated_at, id)",
+            "ANALYZE",
+        ],
+    }),
+    # Analytics sem reagregar vendas: somas por serviço no rollup (recalculado
+    # das vendas ativas) e o histograma diário do ticket
+    (10, "somas por serviço e histograma do ticket no rollup", {
+        "postgresql": [
+            """
+            CREATE TABLE IF NOT EXISTS vendas_diarias_ticket (
+                loja TEXT NOT NULL,
+                data DATE NOT NULL,
+                barbeiro TEXT NOT NULL,
+                total NUMERIC(10,2) NOT NULL,
+                qtd INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (loja, data, barbeiro, total)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS ix_vendas_diarias_ticket_data ON vendas_diarias_ticket (data)",
+            _SQL_TICKET_RECALCULO_V10,
+            """
+            ALTER TABLE vendas_diarias
+                ADD COLUMN cabelo NUMERIC(12,2) NOT NULL DEFAULT 0,
+                ADD COLUMN barba NUMERIC(12,2) NOT NULL DEFAULT 0,
+                ADD COLUMN sobrancelha NUMERIC(12,2) NOT NULL DEFAULT 0,
+                ADD COLUMN produto_valor NUMERIC(12,2) NOT NULL DEFAULT 0,
+                ADD COLUMN desconto NUMERIC(12,2) NOT NULL DEFAULT 0
+            """,
+            "DELETE FROM vendas_diarias",
+            _SQL_ROLLUP_RECALCULO_V10,
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS vendas_diarias_ticket (
+                loja TEXT NOT NULL,
+                data TEXT NOT NULL,
+                barbeiro TEXT NOT NULL,
+                total REAL NOT NULL,
+                qtd INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (loja, data, barbeiro, total)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS ix_vendas_diarias_ticket_data ON vendas_diarias_ticket (data)",
+            _SQL_TICKET_RECALCULO_V10,
+            "ALTER TABLE vendas_diarias ADD COLUMN cabelo REAL NOT NULL DEFAULT 0",
+            "ALTER TABLE vendas_diarias ADD COLUMN barba REAL NOT NULL DEFAULT 0",
+            "ALTER TABLE vendas_diarias ADD COLUMN sobrancelha REAL NOT NULL DEFAULT 0",
+            "ALTER TABLE vendas_diarias ADD COLUMN produto_valor REAL NOT NULL DEFAULT 0",
+            "ALTER TABLE vendas_diarias ADD COLUMN desconto REAL NOT NULL DEFAULT 0",
+            "DELETE FROM vendas_diarias",
+            _SQL_ROLLUP_RECALCULO_V10,
+        ],
+    }),
+    # Busca de clientes: nome normalizado (sem acento, minúsculo) em vendas,
+    # índice do histórico por cliente e o diretório clientes (um por loja e
+    # nome), com busca por prefixo do nome (btree) e por prefixo de palavra:
+    # GIN de tsvector no Postgres, FTS5 (clientes_busca) no SQLite
+    (11, "busca de clientes", {
+        "postgresql": [
+            "ALTER TABLE vendas ADD COLUMN cliente_norm TEXT",
+            "ALTER TABLE vendas_arquivo ADD COLUMN cliente_norm TEXT",
+            f"UPDATE vendas SET cliente_norm = {SQL_NORMALIZAR_CLIENTE_PG}",
+            f"UPDATE vendas_arquivo SET cliente_norm = {SQL_NORMALIZAR_CLIENTE_PG}",
+            """
+            CREATE INDEX IF NOT EXISTS ix_vendas_ativas_cliente
+            ON vendas (cliente_norm, loja, data)
+            WHERE deleted_at IS NULL
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS clientes (
+                id SERIAL PRIMARY KEY,
+                loja TEXT NOT NULL,
+                cliente_norm TEXT NOT NULL,
+                nome TEXT NOT NULL,
+                ultima_visita DATE NOT NULL,
+                UNIQUE (loja, cliente_norm)
+            )
+            """,
+            """
+            INSERT INTO clientes (loja, cliente_norm, nome, ultima_visita)
+            SELECT DISTINCT ON (loja, cliente_norm) loja, cliente_norm, cliente, data
+            FROM vendas
+            WHERE deleted_at IS NULL AND cliente_norm <> ''
+            ORDER BY loja, cliente_norm, data DESC, hora DESC
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS ix_clientes_busca
+            ON clientes USING GIN (to_tsvector('simple', cliente_norm))
+            """,
+            # Ordem por código (COLLATE "C"), como no SQLite: o prefixo vira
+            # um intervalo que usa o índice também em plano genérico
+            """
+            CREATE INDEX IF NOT EXISTS ix_clientes_prefixo
+            ON clientes ((cliente_norm COLLATE "C"))
+            """,
+            "ANALYZE vendas",
+            "ANALYZE clientes",
+        ],
+        "sqlite": [
+            "ALTER TABLE vendas ADD COLUMN cliente_norm TEXT",
+            "ALTER TABLE vendas_arquivo ADD COLUMN cliente_norm TEXT",
+            # normalizar_cliente() é registrada em cada conexão (criar_engine)
+            "UPDATE vendas SET cliente_norm = normalizar_cliente(cliente)",
+            "UPDATE vendas_arquivo SET cliente_norm = normalizar_cliente(cliente)",
+            """
+            CREATE INDEX IF NOT EXISTS ix_vendas_ativas_cliente
+            ON vendas (cliente_norm, loja, data)
+            WHERE deleted_at IS NULL
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS clientes (
+                id INTEGER PRIMARY KEY,
+                loja TEXT NOT NULL,
+                cliente_norm TEXT NOT NULL,
+                nome TEXT NOT NULL,
+                ultima_visita TEXT NOT NULL,
+                UNIQUE (loja, cliente_norm)
+            )
+            """,
+            # MAX() com coluna solta: o SQLite devolve o nome da linha mais recente
+            """
+            INSERT INTO clientes (loja, cliente_norm, nome, ultima_visita)
+            SELECT loja, cliente_norm, cliente, MAX(data)
+            FROM vendas
+            WHERE deleted_at IS NULL AND cliente_norm <> ''
+            GROUP BY loja, cliente_norm
+            """,
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS clientes_busca USING fts5(
+                cliente_norm, content='clientes', content_rowid='id', prefix='2 3'
+            )
+            """,
+            "INSERT INTO clientes_busca (clientes_busca) VALUES ('rebuild')",
+            "CREATE INDEX IF NOT EXISTS ix_clientes_prefixo ON clientes (cliente_norm)",
+            """
+            CREATE TRIGGER IF NOT EXISTS clientes_busca_ai AFTER INSERT ON clientes BEGIN
+                INSERT INTO clientes_busca (rowid, cliente_norm) VALUES (new.id, new.cliente_norm);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS clientes_busca_ad AFTER DELETE ON clientes BEGIN
+                INSERT INTO clientes_busca (clientes_busca, rowid, cliente_norm)
+                VALUES ('delete', old.id, old.cliente_norm);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS clientes_busca_au AFTER UPDATE OF cliente_norm ON clientes BEGIN
+                INSERT INTO clientes_busca (clientes_busca, rowid, cliente_norm)
+                VALUES ('delete', old.id, old.cliente_norm);
+                INSERT INTO clientes_busca (rowid, cliente_norm) VALUES (new.id, new.cliente_norm);
+            END
+            """,
+            "ANALYZE",
+        ],
+    }),
+    # Agendamentos: o intervalo [inicio, fim) em minutos desde 00:00 e, em
+    # agendamentos_horarios, uma linha por bloco de AGENDA_GRADE minutos
+    # ocupado; a chave primária dela é o que impede dois horários sobrepostos
+    # para o mesmo barbeiro, mesmo com pedidos simultâneos
+    (12, "agendamentos", {
+        "postgresql": [
+            """
+            CREATE TABLE IF NOT EXISTS agendamentos (
+                id SERIAL PRIMARY KEY,
+                loja TEXT NOT NULL,
+                barbeiro TEXT NOT NULL,
+                data DATE NOT NULL,
+                inicio INTEGER NOT NULL,
+                fim INTEGER NOT NULL,
+                cliente TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'marcado',
+                venda_id INTEGER,
+                criado_por TEXT NOT NULL,
+                criado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                CHECK (inicio < fim)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS agendamentos_horarios (
+                loja TEXT NOT NULL,
+                barbeiro TEXT NOT NULL,
+                data DATE NOT NULL,
+                horario INTEGER NOT NULL,
+                agendamento_id INTEGER NOT NULL,
+                PRIMARY KEY (loja, barbeiro, data, horario)
+            )
+            """,
+            # A disponibilidade lê os ocupados da semana de uma loja já na
+            # ordem da varredura (barbeiro, data, inicio)
+            """
+            CREATE INDEX IF NOT EXISTS ix_agendamentos_ocupados
+            ON agendamentos (loja, data, barbeiro, inicio)
+            WHERE status <> 'cancelado'
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS ix_agendamentos_horarios_agendamento
+            ON agendamentos_horarios (agendamento_id)
+            """,
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS agendamentos (
+                id INTEGER PRIMARY KEY,
+                loja TEXT NOT NULL,
+                barbeiro TEXT NOT NULL,
+                data TEXT NOT NULL,
+                inicio INTEGER NOT NULL,
+                fim INTEGER NOT NULL,
+                cliente TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'marcado',
+                venda_id INTEGER,
+                criado_por TEXT NOT NULL,
+                criado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                CHECK (inicio < fim)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS agendamentos_horarios (
+                loja TEXT NOT NULL,
+                barbeiro TEXT NOT NULL,
+                data TEXT NOT NULL,
+                horario INTEGER NOT NULL,
+                agendamento_id INTEGER NOT NULL,
+                PRIMARY KEY (loja, barbeiro, data, horario)
+            )
+            """,
+            # A disponibilidade lê os ocupados da semana de uma loja já na
+            # ordem da varredura (barbeiro, data, inicio)
+            """
+            CREATE INDEX IF NOT EXISTS ix_agendamentos_ocupados
+            ON agendamentos (loja, data, barbeiro, inicio)
+            WHERE status <> 'cancelado'
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS ix_agendamentos_horarios_agendamento
+            ON agendamentos_horarios (agendamento_id)
+            """,
+        ],
+    }),
+]
+
+
+PARTICOES_A_FRENTE = int(os.environ.get("PARTICOES_A_FRENTE", "2"))
+
+
+def garantir_particoes(conn, meses_a_frente=PARTICOES_A_FRENTE):
+    """Cria as partições do mês atual e dos próximos meses (só Postgres)."""
+    if DIALETO != "postgresql":
+        return []
+    return conn.execute(
+        text("""
+            SELECT vendas_criar_particao((date_trunc('month', CURRENT_DATE) + make_interval(months => m))::date)
+            FROM generate_series(0, :meses) AS m
+        """),
+        {"meses": meses_a_frente},
+    ).scalars().all()
+
+
+def particionar_default(conn):
+    """Cria a partição de cada mês com vendas em vendas_default (só Postgres).
+
+    vendas_criar_particao() move as linhas do mês para a partição nova.
+    Para o cron/release (`flask vendas particoes`), não para requisições.
+    """
+    if DIALETO != "postgresql":
+        return []
+    return conn.execute(text("""
+        SELECT vendas_criar_particao(mes::date)
+        FROM (SELECT DISTINCT date_trunc('month', data) AS mes FROM vendas_default) AS meses
+        ORDER BY mes
+    """)).scalars().all()
+
+
+def init_db():
+    """Aplica as migrações pendentes (Postgres/Neon e SQLite)."""
+    dialeto = DIALETO
+
+    with get_engine().begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_versao (
+                versao INTEGER PRIMARY KEY,
+                descricao TEXT NOT NULL,
+                aplicada_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        aplicadas = set(conn.execute(text("SELECT versao FROM schema_versao")).scalars())
+
+    for versao, descricao, passos in MIGRACOES:
+        if versao in aplicadas:
+            continue
+
+        # Cada passo roda na sua própria transação, junto com o registro da versão
+        with get_engine().begin() as conn:
+            for ddl in passos.get(dialeto, passos.get("*", [])):
+                conn.execute(text(ddl))
+            conn.execute(
+                text("INSERT INTO schema_versao (versao, descricao) VALUES (:versao, :descricao)"),
+                {"versao": versao, "descricao": descricao}
+            )
+        print(f">>> MIGRAÇÃO {versao} aplicada: {descricao}")
+
+
+# O import não roda DDL: as migrações são aplicadas por `flask banco migrar`
+# (passo de deploy). O app só confere, na primeira requisição de cada
+# processo, se o schema está em dia. No SQLite local (desenvolvimento) ele
+# mesmo migra nessa hora, a menos que AUTO_MIGRAR=0.
+AUTO_MIGRAR = os.environ.get("AUTO_MIGRAR", "1" if DIALETO == "sqlite" else "0") == "1"
+_schema_ok = False
+_schema_lock = threading.Lock()
+
+
+def migrar_banco():
+    """Migrações pendentes + migração única dos usuários antigos + partições."""
+    # Import aqui: usuarios importa este módulo (callback dos grupos do CLI)
+    from barbearia.usuarios import usuarios_semear_se_vazio
+
+    init_db()
+    usuarios_semear_se_vazio()
+    with get_engine().begin() as conn:
+        garantir_particoes(conn)
+        particionar_default(conn)
+
+
+def migracoes_pendentes():
+    """Versões de MIGRACOES ainda não aplicadas (todas, se o banco é novo)."""
+    try:
+        with get_engine().connect() as conn:
+            aplicadas = set(conn.execute(text("SELECT versao FROM schema_versao")).scalars())
+    except (OperationalError, ProgrammingError):
+        # schema_versao ainda não existe
+        aplicadas = set()
+    return [versao for versao, _, _ in MIGRACOES if versao not in aplicadas]
+
+
+def exigir_schema():
+    """Confere o schema uma vez por processo; levanta RuntimeError se atrasado."""
+    global _schema_ok
+    if _schema_ok:
+        return
+    with _schema_lock:
+        if _schema_ok:
+            return
+        pendentes = migracoes_pendentes()
+        if pendentes and AUTO_MIGRAR:
+            migrar_banco()
+        elif pendentes:
+            raise RuntimeError(f"migrações pendentes {pendentes}: rode `flask --app app banco migrar`")
+        else:
+            # Processo novo: garante a partição do mês (virada de mês sem deploy)
+            with get_engine().begin() as conn:
+                garantir_particoes(conn)
+        _schema_ok = True
+
+
+def _exigir_schema_cli():
+    """Callback dos grupos do CLI que usam as tabelas."""
+    try:
+        exigir_schema()
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+
+banco_cli = AppGroup("banco", help="Schema do banco (migrações).")
+
+
+@banco_cli.command("migrar")
+def banco_migrar_cmd():
+    """Aplica as migrações pendentes (rodar no deploy, antes de subir o app)."""
+    t0 = time.perf_counter()
+    migrar_banco()
+    click.echo(f">>> schema em dia ({time.perf_counter() - t0:.2f} s)")
+
+
+@banco_cli.command("status")
+def banco_status_cmd():
+    """Mostra as migrações aplicadas e pendentes."""
+    pendentes = set(migracoes_pendentes())
+    for versao, descricao, _ in MIGRACOES:
+        click.echo(f"{versao:3d} {'pendente ' if versao in pendentes else 'aplicada '} {descricao}")
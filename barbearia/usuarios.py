@@ -0,0 +1,338 @@
+"""Usuários: diretório em memória, login/logout, sessão e o comando `flask usuarios`."""
+from flask import Blueprint, g, redirect, render_template, request, session
+from flask.cli import AppGroup
+from werkzeug.security import check_password_hash, generate_password_hash
+import click
+import json
+import os
+import threading
+import time
+import uuid
+from functools import lru_cache
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from barbearia.banco import LOJA_PADRAO, get_engine
+from barbearia.helpers import normalizar_loja
+from barbearia.metricas import metricas
+from barbearia.schema import _exigir_schema_cli
+
+bp = Blueprint("usuarios", __name__)
+
+# =========================
+# USUÁRIOS (tabela usuarios + cache em memória)
+# =========================
+# O diretório inteiro (são poucos usuários) fica em memória por
+# USUARIOS_CACHE_TTL segundos: o papel conferido a cada requisição nunca vai
+# ao banco. Mudanças feitas neste processo invalidam na hora; as feitas por
+# outro worker ou pelo CLI aparecem quando o TTL vence.
+USUARIOS_CACHE_TTL = float(os.environ.get("USUARIOS_CACHE_TTL", "60"))
+# Usuários de antes da tabela (o antigo dict do código), só para a migração
+# única: JSON {"nome": {"senha": "...", "role": "admin|barbeiro"}}. Senha em
+# texto puro não fica no código; depois da migração a variável pode sair.
+USUARIOS_LEGADO = os.environ.get("USUARIOS_LEGADO", "")
+ROLES = ("admin", "barbeiro")
+
+# Proteção do hash (lento de propósito): falhas por usuário e por IP numa
+# janela, e quantos hashes podem ser calculados ao mesmo tempo no processo
+LOGIN_MAX_FALHAS = int(os.environ.get("LOGIN_MAX_FALHAS", "5"))
+# Por IP é mais folgado: os tablets da loja saem todos pelo mesmo IP
+LOGIN_MAX_FALHAS_IP = int(os.environ.get("LOGIN_MAX_FALHAS_IP", "20"))
+LOGIN_JANELA = float(os.environ.get("LOGIN_JANELA", "300"))
+LOGIN_HASHES_SIMULTANEOS = int(os.environ.get("LOGIN_HASHES_SIMULTANEOS", "2"))
+LOGIN_ESPERA_HASH = float(os.environ.get("LOGIN_ESPERA_HASH", "3"))
+
+
+class DiretorioUsuarios:
+    """Cópia em memória da tabela usuarios, recarregada pelo TTL ou invalidar()."""
+
+    def __init__(self, ttl=USUARIOS_CACHE_TTL):
+        self.ttl = ttl
+        self._usuarios = None
+        self._carregado_em = 0.0
+        self._lock = threading.Lock()
+
+    def _atuais(self):
+        with self._lock:
+            if self._usuarios is None or time.monotonic() - self._carregado_em > self.ttl:
+                try:
+                    with get_engine().connect() as conn:
+                        rows = conn.execute(
+                            text("SELECT usuario, senha_hash, role, loja FROM usuarios WHERE ativo = 1")
+                        ).all()
+                except OperationalError as e:
+                    # Banco fora do ar: segue com a cópia antiga até o próximo TTL
+                    # (com o outbox, o caixa continua registrando)
+                    if self._usuarios is None:
+                        raise
+                    print(">>> ERRO recarregando usuários (usando a cópia em memória):", repr(e))
+                    self._carregado_em = time.monotonic()
+                    return self._usuarios
+                self._usuarios = {
+                    r.usuario: {"senha_hash": r.senha_hash, "role": r.role, "loja": r.loja} for r in rows
+                }
+                self._carregado_em = time.monotonic()
+            return self._usuarios
+
+    def get(self, usuario):
+        return self._atuais().get(usuario)
+
+    def role(self, usuario):
+        dados = self.get(usuario)
+        return dados["role"] if dados else None
+
+    def loja(self, usuario):
+        """Loja fixa do usuário; None = admin de todas as lojas."""
+        dados = self.get(usuario)
+        return dados["loja"] if dados else None
+
+    def nomes(self, loja=None):
+        """Usuários ativos (só os da loja, se informada)."""
+        return sorted(u for u, d in self._atuais().items() if loja is None or d["loja"] == loja)
+
+    def barbeiros(self, loja):
+        """Barbeiros ativos da loja (os que têm agenda)."""
+        return sorted(u for u, d in self._atuais().items() if d["role"] == "barbeiro" and d["loja"] == loja)
+
+    def lojas(self):
+        """Lojas conhecidas: as dos usuários mais a LOJA_PADRAO."""
+        return sorted({d["loja"] for d in self._atuais().values() if d["loja"]} | {LOJA_PADRAO})
+
+    def invalidar(self):
+        with self._lock:
+            self._usuarios = None
+
+
+diretorio_usuarios = DiretorioUsuarios()
+
+
+def usuario_salvar(conn, usuario, senha, role, sobrescrever=True, loja=None):
+    """Cria (ou atualiza) o usuário com a senha em hash; retorna se gravou.
+
+    Barbeiro sempre tem loja (padrão: LOJA_PADRAO); admin sem loja vê todas.
+    """
+    usuario = usuario.strip().lower()
+    loja = normalizar_loja(loja) or (LOJA_PADRAO if role != "admin" else None)
+    if role not in ROLES:
+        raise ValueError(f"role inválida: {role} (use {', '.join(ROLES)})")
+    if not usuario or not senha:
+        raise ValueError("usuário e senha são obrigatórios")
+
+    conflito = """
+        DO UPDATE SET senha_hash = excluded.senha_hash, role = excluded.role, loja = excluded.loja,
+                      ativo = 1, atualizado_em = CURRENT_TIMESTAMP
+    """ if sobrescrever else "DO NOTHING"
+    gravado = conn.execute(
+        text(f"""
+            INSERT INTO usuarios (usuario, senha_hash, role, loja)
+            VALUES (:usuario, :senha_hash, :role, :loja)
+            ON CONFLICT (usuario) {conflito}
+            RETURNING usuario
+        """),
+        {"usuario": usuario, "senha_hash": generate_password_hash(senha), "role": role, "loja": loja},
+    ).first()
+    diretorio_usuarios.invalidar()
+    return gravado is not None
+
+
+def usuarios_migrar_legado(conn):
+    """Migração única: USUARIOS_LEGADO (ambiente) -> tabela usuarios.
+
+    Não mexe em quem já existe na tabela. Sem a variável não cria ninguém:
+    o primeiro admin sai de "flask usuarios senha NOME --role admin".
+    """
+    try:
+        legado = json.loads(USUARIOS_LEGADO) if USUARIOS_LEGADO.strip() else {}
+        origem = {nome.strip().lower(): (dados["senha"], dados["role"]) for nome, dados in legado.items()}
+    except (ValueError, AttributeError, KeyError, TypeError) as e:
+        # Só o tipo do erro: a mensagem pode citar o conteúdo, que tem senhas
+        raise RuntimeError(f"USUARIOS_LEGADO inválido ({type(e).__name__}): esperado "
+                           '{"nome": {"senha": "...", "role": "..."}}')
+
+    return [nome for nome, (senha, role) in sorted(origem.items())
+            if usuario_salvar(conn, nome, senha, role, sobrescrever=False)]
+
+
+def usuarios_semear_se_vazio():
+    """Primeiro start depois da migração 7: roda a migração única sozinha."""
+    with get_engine().begin() as conn:
+        if conn.execute(text("SELECT 1 FROM usuarios LIMIT 1")).first() is None:
+            print(">>> USUÁRIOS migrados para a tabela:", usuarios_migrar_legado(conn))
+
+
+class LimiteLogin:
+    """Janela deslizante de falhas de login por chave (usuário ou IP)."""
+
+    def __init__(self, maximo, janela=LOGIN_JANELA):
+        self.maximo = maximo
+        self.janela = janela
+        self._falhas = {}
+        self._lock = threading.Lock()
+
+    def _recentes(self, chave, agora):
+        falhas = [t for t in self._falhas.get(chave, ()) if agora - t < self.janela]
+        if falhas:
+            self._falhas[chave] = falhas
+        else:
+            self._falhas.pop(chave, None)
+        return falhas
+
+    def bloqueado(self, chave):
+        with self._lock:
+            return len(self._recentes(chave, time.monotonic())) >= self.maximo
+
+    def falhou(self, chave):
+        with self._lock:
+            self._falhas.setdefault(chave, []).append(time.monotonic())
+
+    def limpar(self, chave):
+        with self._lock:
+            self._falhas.pop(chave, None)
+
+
+limite_login_usuario = LimiteLogin(LOGIN_MAX_FALHAS)
+limite_login_ip = LimiteLogin(LOGIN_MAX_FALHAS_IP)
+_hashes_login = threading.BoundedSemaphore(LOGIN_HASHES_SIMULTANEOS)
+# Usuário inexistente também paga um hash: o tempo de resposta não entrega quem existe
+@lru_cache(maxsize=1)
+def _hash_falso():
+    return generate_password_hash(uuid.uuid4().hex)
+
+
+def autenticar(usuario, senha):
+    """Retorna a role se usuário/senha conferem, senão None.
+
+    Levanta TimeoutError se já há LOGIN_HASHES_SIMULTANEOS hashes rodando
+    por mais de LOGIN_ESPERA_HASH segundos (muita tentativa ao mesmo tempo).
+    """
+    dados = diretorio_usuarios.get(usuario)
+    if not _hashes_login.acquire(timeout=LOGIN_ESPERA_HASH):
+        raise TimeoutError("fila de login cheia")
+    try:
+        ok = check_password_hash(dados["senha_hash"] if dados else _hash_falso(), senha)
+    finally:
+        _hashes_login.release()
+    return dados["role"] if ok and dados else None
+
+
+usuarios_cli = AppGroup(
+    "usuarios", help="Usuários do sistema (tabela usuarios).", callback=_exigir_schema_cli
+)
+
+
+@usuarios_cli.command("migrar")
+def usuarios_migrar_cmd():
+    """Copia USUARIOS_LEGADO (ambiente) para a tabela (sem sobrescrever)."""
+    try:
+        with get_engine().begin() as conn:
+            criados = usuarios_migrar_legado(conn)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(f">>> {len(criados)} usuário(s) criado(s): {', '.join(criados) or '-'}")
+
+
+@usuarios_cli.command("senha")
+@click.argument("usuario")
+@click.option("--role", type=click.Choice(ROLES), help="Obrigatória para usuário novo")
+@click.option("--loja", help=f"Loja do usuário (barbeiro sem loja: {LOJA_PADRAO}; admin sem loja: todas)")
+@click.password_option("--senha", prompt="Nova senha")
+def usuarios_senha_cmd(usuario, role, loja, senha):
+    """Cria o usuário ou troca a senha (e a role/loja, se informadas)."""
+    with get_engine().begin() as conn:
+        atual = conn.execute(
+            text("SELECT role, loja FROM usuarios WHERE usuario = :u"), {"u": usuario.strip().lower()}
+        ).first()
+        if atual is None and role is None:
+            raise click.UsageError("usuário novo: informe --role")
+        usuario_salvar(conn, usuario, senha, role or atual.role, loja=loja or (atual.loja if atual else None))
+    click.echo(f">>> senha de {usuario} gravada")
+
+
+@usuarios_cli.command("desativar")
+@click.argument("usuario")
+def usuarios_desativar_cmd(usuario):
+    """Bloqueia o login (as sessões abertas caem quando o cache expira)."""
+    with get_engine().begin() as conn:
+        conn.execute(
+            text("UPDATE usuarios SET ativo = 0, atualizado_em = CURRENT_TIMESTAMP WHERE usuario = :u"),
+            {"u": usuario.strip().lower()},
+        )
+    diretorio_usuarios.invalidar()
+    click.echo(f">>> {usuario} desativado")
+
+
+@usuarios_cli.command("listar")
+def usuarios_listar_cmd():
+    with get_engine().connect() as conn:
+        for r in conn.execute(text("SELECT usuario, role, loja, ativo FROM usuarios ORDER BY loja, usuario")):
+            click.echo(f"{r.usuario:20s} {r.role:10s} {r.loja or '(todas)':15s} {'ativo' if r.ativo else 'inativo'}")
+
+
+@bp.before_app_request
+def _sessao_atualizada():
+    """Confere role e loja da sessão com o diretório em memória (sem ir ao banco).
+
+    Usuário desativado perde a sessão; role/loja trocadas valem na próxima
+    requisição. Deixa em g.loja a loja da requisição (escolhe o pool).
+    """
+    usuario = session.get("usuario")
+    if usuario is None:
+        return
+    dados = diretorio_usuarios.get(usuario)
+    if dados is None:
+        session.clear()
+        return
+    if dados["role"] != session.get("role"):
+        session["role"] = dados["role"]
+    if dados["loja"] != session.get("loja"):
+        session["loja"] = dados["loja"]
+    g.loja = loja_da_requisicao()
+
+
+def loja_da_requisicao():
+    """Loja que a requisição enxerga: a fixa do usuário ou, para admin de
+    todas as lojas, a escolhida em ?loja= (None = todas)."""
+    if session.get("loja"):
+        return session["loja"]
+    if session.get("role") == "admin":
+        return normalizar_loja(request.args.get("loja"))
+    return None
+
+
+@bp.route("/", methods=["GET", "POST"])
+@bp.route("/login", methods=["GET", "POST"])
+def login():
+    if request.method == "POST":
+        usuario = (request.form.get("usuario") or "").strip().lower()
+        senha = (request.form.get("senha") or "").strip()
+
+        # Bloqueio antes do hash: tentativa em massa não gasta CPU
+        ip = request.remote_addr or ""
+        if limite_login_usuario.bloqueado(usuario) or limite_login_ip.bloqueado(ip):
+            metricas.somar("barbearia_login_bloqueado_total", {})
+            return render_template("login.html", erro="Muitas tentativas. Aguarde alguns minutos."), 429
+
+        try:
+            role = autenticar(usuario, senha)
+        except TimeoutError:
+            return render_template("login.html", erro="Servidor ocupado, tente de novo."), 503
+
+        if role:
+            limite_login_usuario.limpar(usuario)
+            session.clear()
+            session["usuario"] = usuario
+            session["role"] = role
+            session["loja"] = diretorio_usuarios.loja(usuario)
+            return redirect("/historico")
+
+        limite_login_usuario.falhou(usuario)
+        limite_login_ip.falhou(ip)
+        return render_template("login.html", erro="Usuário ou senha inválidos")
+
+    return render_template("login.html")
+
+
+@bp.route("/logout")
+def logout():
+    session.clear()
+    return redirect("/login")
@@ -0,0 +1,164 @@
+"""Regras de registro e gravação de vendas em lote e o grupo `flask vendas`."""
+from flask.cli import AppGroup
+import os
+from datetime import datetime
+from sqlalchemy import text
+
+from barbearia.banco import LOJA_PADRAO, TZ_BR
+from barbearia.cache import cache_resumos
+from barbearia.clientes import clientes_registrar
+from barbearia.helpers import normalizar_cliente, normalizar_loja, parse_date_yyyy_mm_dd, to_float
+from barbearia.relatorios import relatorios_invalidar
+from barbearia.rollup import rollup_somar_vendas
+from barbearia.schema import _exigir_schema_cli
+
+# =========================
+# VENDAS (regras de registro e gravação em lote)
+# =========================
+COLUNAS_VENDA = [
+    "data", "hora", "cliente", "barbeiro", "cabelo", "barba", "sobrancelha",
+    "produto_nome", "produto_valor", "desconto", "total", "pagamento", "idempotency_key", "loja",
+    "cliente_norm",
+]
+
+# Linhas por INSERT multi-linha (15 params cada; folgado p/ o limite do SQLite)
+LOTE_LINHAS_POR_INSERT = 500
+# Tamanho máximo de um lote recebido pela API
+LOTE_MAX_VENDAS = int(os.environ.get("LOTE_MAX_VENDAS", "5000"))
+
+
+def normalizar_venda(dados, role, usuario, agora=None, aceita_data_hora=False, loja=None):
+    """Aplica as regras do registrar() a um form/dict e devolve os params do INSERT.
+
+    Com aceita_data_hora=True (lotes offline) usa "data"/"hora" enviados, se houver.
+    loja é a loja fixa do usuário; sem ela (admin de todas as lojas) vale a
+    "loja" enviada ou a LOJA_PADRAO. Levanta ValueError se algo vier inválido.
+    """
+    cabelo = to_float(dados.get("cabelo"))
+    barba = to_float(dados.get("barba"))
+    sobrancelha = to_float(dados.get("sobrancelha"))
+
+    # Produto
+    produto_nome_raw = str(dados.get("produto_nome") or "").strip()
+    produto_nome_norm = produto_nome_raw.lower()
+    produto_valor = to_float(dados.get("produto_valor"))
+
+    # ✅ REGRA: se vier vazio/nenhum -> zera valor e salva NULL
+    if produto_nome_norm in ("", "nenhum", "null", "none"):
+        produto_nome = None
+        produto_valor = 0.0
+    else:
+        produto_nome = produto_nome_raw
+
+    desconto = to_float(dados.get("desconto"))
+
+    total = cabelo + barba + sobrancelha + produto_valor - desconto
+    if total < 0:
+        total = 0.0
+
+    # barbeiro correto
+    if role == "admin":
+        barbeiro = str(dados.get("barbeiro") or usuario).strip().lower()
+    else:
+        barbeiro = usuario
+
+    cliente = str(dados.get("cliente") or "").strip()
+
+    loja = loja or normalizar_loja(dados.get("loja")) or LOJA_PADRAO
+
+    # ✅ Forma de pagamento (obrigatória no form)
+    pagamento = str(dados.get("pagamento") or "nao_informado").strip().lower()
+
+    # ✅ Agora com timezone do Brasil
+    agora = agora or datetime.now(TZ_BR)
+    data_venda = agora.date()
+    hora = agora.strftime("%H:%M")
+
+    if aceita_data_hora and dados.get("data"):
+        data_venda = parse_date_yyyy_mm_dd(str(dados.get("data")))
+        if not data_venda or data_venda > agora.date():
+            raise ValueError("data inválida (use YYYY-MM-DD, até hoje)")
+    if aceita_data_hora and dados.get("hora"):
+        try:
+            hora = datetime.strptime(str(dados.get("hora"))[:5], "%H:%M").strftime("%H:%M")
+        except Exception:
+            raise ValueError("hora inválida (use HH:MM)")
+
+    chave = dados.get("idempotency_key")
+
+    return {
+        "data": data_venda,
+        "hora": hora,
+        "cliente": cliente,
+        "barbeiro": barbeiro,
+        "cabelo": round(cabelo, 2),
+        "barba": round(barba, 2),
+        "sobrancelha": round(sobrancelha, 2),
+        "produto_nome": produto_nome,
+        "produto_valor": round(produto_valor, 2),
+        "desconto": round(desconto, 2),
+        "total": round(total, 2),
+        "pagamento": pagamento,
+        "idempotency_key": str(chave).strip() if chave else None,
+        "loja": loja,
+        "cliente_norm": normalizar_cliente(cliente),
+    }
+
+
+def inserir_vendas(conn, vendas):
+    """Grava vendas normalizadas com INSERT multi-linha e atualiza o rollup.
+
+    Vendas cuja idempotency_key já foi gravada antes são ignoradas. Retorna
+    a lista das vendas realmente inseridas (cada uma com seu "id").
+    """
+    # 1) Reserva as chaves de idempotência; só as novas voltam no RETURNING
+    chaves = [v["idempotency_key"] for v in vendas if v["idempotency_key"]]
+    novas = set()
+    for i in range(0, len(chaves), LOTE_LINHAS_POR_INSERT):
+        parte = chaves[i:i + LOTE_LINHAS_POR_INSERT]
+        valores = ", ".join(f"(:c{j})" for j in range(len(parte)))
+        novas.update(conn.execute(
+            text(f"""
+                INSERT INTO vendas_idempotencia (chave) VALUES {valores}
+                ON CONFLICT (chave) DO NOTHING
+                RETURNING chave
+            """),
+            {f"c{j}": chave for j, chave in enumerate(parte)}
+        ).scalars())
+
+    vendas = [v for v in vendas if not v["idempotency_key"] or v["idempotency_key"] in novas]
+
+    # 2) INSERT multi-linha em vendas (updated_at = agora: entra no sync)
+    colunas = ", ".join(COLUNAS_VENDA)
+    for i in range(0, len(vendas), LOTE_LINHAS_POR_INSERT):
+        parte = vendas[i:i + LOTE_LINHAS_POR_INSERT]
+        valores = ", ".join(
+            "(" + ", ".join(f":{col}_{j}" for col in COLUNAS_VENDA) + ", CURRENT_TIMESTAMP)"
+            for j in range(len(parte))
+        )
+        params = {f"{col}_{j}": v[col] for j, v in enumerate(parte) for col in COLUNAS_VENDA}
+        ids = conn.execute(
+            text(f"INSERT INTO vendas ({colunas}, updated_at) VALUES {valores} RETURNING id"),
+            params
+        ).scalars().all()
+        for v, venda_id in zip(parte, ids):
+            v["id"] = venda_id
+
+    # 3) Rollup agregado por (loja, data, barbeiro, pagamento) e diretório de clientes
+    rollup_somar_vendas(conn, vendas)
+    clientes_registrar(conn, vendas)
+
+    return vendas
+
+
+def invalidar_cache_vendas(vendas):
+    """Invalida o cache e os relatórios guardados de cada (data, barbeiro, loja) afetado."""
+    for data_venda, barbeiro, loja in {(v["data"], v["barbeiro"], v["loja"]) for v in vendas}:
+        cache_resumos.invalidar_venda(data_venda, barbeiro, loja)
+        relatorios_invalidar(data_venda, barbeiro, loja)
+
+
+# Grupo `flask vendas`: os comandos ficam em importacao e particoes
+vendas_cli = AppGroup(
+    "vendas", help="Manutenção da tabela vendas.", callback=_exigir_schema_cli
+)
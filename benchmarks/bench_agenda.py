@@ -0,0 +1,244 @@
+"""Disponibilidade da agenda numa semana cheia (/api/agendamentos/disponibilidade).
+
+Popula um ano de agendamentos passados e uma semana à frente com a agenda
+quase lotada (ocupação de --ocupacao) para --barbeiros barbeiros por loja e
+mede:
+
+  * a disponibilidade da semana inteira, de todos os barbeiros da loja e de
+    um barbeiro só (uma consulta + varredura dos intervalos);
+  * a forma ingênua, uma consulta de sobreposição por horário candidato,
+    conferindo que as duas acham os mesmos horários livres;
+  * marcações simultâneas em threads: quantas passam, quantas recebem 409 e
+    se sobrou algum par de agendamentos sobrepostos (deve ser zero).
+
+Uso:
+    python benchmarks/bench_agenda.py --barbeiros 12
+    python benchmarks/bench_agenda.py --url postgresql+psycopg://... --lojas 10 --barbeiros 20
+"""
+import argparse
+import random
+import threading
+import time
+from datetime import date, timedelta
+
+from comum import preparar_banco, resumo_latencias, salvar_resultado
+from dados import nomes_lojas
+
+SENHA = "bench"
+DURACOES = [20, 30, 30, 30, 40, 45, 60]
+
+
+def gerar_agendamentos(barbearia, lojas, barbeiros, dias_passados, inicio_semana, ocupacao, seed=42):
+    """Agendamentos back-to-back com buracos aleatórios: (loja, barbeiro, data, inicio, fim, status)."""
+    rnd = random.Random(seed)
+    abertura = barbearia.agenda.minutos_do_dia(barbearia.agenda.AGENDA_ABERTURA)
+    fechamento = barbearia.agenda.minutos_do_dia(barbearia.agenda.AGENDA_FECHAMENTO)
+    dias = [inicio_semana + timedelta(days=i) for i in range(-dias_passados, 7)]
+    for loja in lojas:
+        for barbeiro in barbeiros[loja]:
+            for dia in dias:
+                if dia.weekday() in barbearia.agenda.AGENDA_DIAS_FECHADOS:
+                    continue
+                futuro = dia >= inicio_semana
+                cursor = abertura
+                while cursor < fechamento:
+                    duracao = rnd.choice(DURACOES)
+                    if rnd.random() < ocupacao and cursor + duracao <= fechamento:
+                        if rnd.random() < 0.08:
+                            status = "cancelado"
+                        else:
+                            status = "marcado" if futuro else "concluido"
+                        yield loja, barbeiro, dia, cursor, cursor + duracao, status
+                        cursor += duracao
+                    else:
+                        cursor += barbearia.agenda.AGENDA_INTERVALO
+
+
+def popular_agenda(barbearia, text, linhas, inicio_semana):
+    """Grava os agendamentos; os blocos da grade só para a semana medida (o
+    passado não concorre com marcações novas)."""
+    agendamentos, blocos = [], []
+    for loja, barbeiro, dia, ini, fim, status in linhas:
+        agendamentos.append({"loja": loja, "barbeiro": barbeiro, "data": dia, "inicio": ini, "fim": fim,
+                             "status": status, "cliente": "bench", "criado_por": "bench"})
+    with barbearia.banco.get_engine().begin() as conn:
+        for i in range(0, len(agendamentos), 20_000):
+            conn.execute(text("""
+                INSERT INTO agendamentos (loja, barbeiro, data, inicio, fim, cliente, status, criado_por)
+                VALUES (:loja, :barbeiro, :data, :inicio, :fim, :cliente, :status, :criado_por)
+            """), agendamentos[i:i + 20_000])
+        for r in conn.execute(text("""
+            SELECT id, loja, barbeiro, data, inicio, fim FROM agendamentos
+            WHERE data >= :inicio AND status = 'marcado'
+        """), {"inicio": inicio_semana}):
+            blocos.extend({"loja": r.loja, "barbeiro": r.barbeiro, "data": r.data, "horario": h, "id": r.id}
+                          for h in range(r.inicio, r.fim, barbearia.agenda.AGENDA_GRADE))
+        conn.execute(text("""
+            INSERT INTO agendamentos_horarios (loja, barbeiro, data, horario, agendamento_id)
+            VALUES (:loja, :barbeiro, :data, :horario, :id)
+        """), blocos)
+        conn.execute(text("ANALYZE"))
+    return len(agendamentos)
+
+
+def horarios_por_consulta(barbearia, text, conn, loja, barbeiros, dias, duracao):
+    """A forma ingênua: para cada barbeiro, dia e horário candidato, pergunta
+    ao banco se há agendamento sobreposto."""
+    abertura = barbearia.agenda.minutos_do_dia(barbearia.agenda.AGENDA_ABERTURA)
+    fechamento = barbearia.agenda.minutos_do_dia(barbearia.agenda.AGENDA_FECHAMENTO)
+    sql = text("""
+        SELECT 1 FROM agendamentos
+        WHERE loja = :loja AND barbeiro = :barbeiro AND data = :data AND status <> 'cancelado'
+          AND inicio < :fim AND fim > :inicio
+        LIMIT 1
+    """)
+    livres, consultas = {}, 0
+    for barbeiro in barbeiros:
+        for dia in dias:
+            horarios = []
+            for inicio in range(abertura, fechamento - duracao + 1, barbearia.agenda.AGENDA_INTERVALO):
+                consultas += 1
+                ocupado = conn.execute(sql, {"loja": loja, "barbeiro": barbeiro, "data": dia,
+                                             "inicio": inicio, "fim": inicio + duracao}).first()
+                if ocupado is None:
+                    horarios.append(barbearia.agenda.hhmm(inicio))
+            livres[(barbeiro, dia.isoformat())] = horarios
+    return livres, consultas
+
+
+def medir_rota(cliente, rota, rodadas):
+    latencias = []
+    for _ in range(rodadas):
+        t0 = time.perf_counter()
+        resposta = cliente.get(rota)
+        resposta.get_data()
+        latencias.append(time.perf_counter() - t0)
+        if resposta.status_code != 200:
+            raise SystemExit(f"{rota} respondeu {resposta.status_code}")
+    return resumo_latencias(latencias), resposta.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="URL do banco (padrão: SQLite temporário)")
+    parser.add_argument("--lojas", type=int, default=1, help="quantidade de lojas (filiais)")
+    parser.add_argument("--barbeiros", type=int, default=12, help="barbeiros por loja")
+    parser.add_argument("--dias-passados", type=int, default=365)
+    parser.add_argument("--ocupacao", type=float, default=0.85)
+    parser.add_argument("--duracao", type=int, default=30)
+    parser.add_argument("--rodadas", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=8, help="threads marcando ao mesmo tempo")
+    parser.add_argument("--marcacoes", type=int, default=40, help="tentativas por thread")
+    parser.add_argument("--nao-salvar", action="store_true")
+    args = parser.parse_args()
+
+    url = preparar_banco(args.url)
+    import barbearia
+    from sqlalchemy import text
+
+    barbearia.schema.migrar_banco()
+    lojas = nomes_lojas(args.lojas)
+    loja = lojas[0]
+    barbeiros = {l: [f"barbeiro{i:02d}_{l}" for i in range(args.barbeiros)] for l in lojas}
+    with barbearia.banco.get_engine().begin() as conn:
+        barbearia.usuarios.usuario_salvar(conn, "bench_admin", SENHA, "admin")
+        for l in lojas:
+            for b in barbeiros[l]:
+                barbearia.usuarios.usuario_salvar(conn, b, SENHA, "barbeiro", loja=l)
+
+    # A semana medida começa amanhã (hoje teria os horários já passados)
+    inicio_semana = date.today() + timedelta(days=1)
+    t0 = time.perf_counter()
+    linhas = gerar_agendamentos(barbearia, lojas, barbeiros, args.dias_passados, inicio_semana, args.ocupacao)
+    total = popular_agenda(barbearia, text, linhas, inicio_semana)
+    print(f">>> {total} agendamentos, {len(lojas)} loja(s) x {args.barbeiros} barbeiros "
+          f"({barbearia.banco.DIALETO}) em {time.perf_counter() - t0:.1f} s")
+
+    admin = barbearia.app.test_client()
+    admin.post("/login", data={"usuario": "bench_admin", "senha": SENHA})
+    barbeiro = barbearia.app.test_client()
+    barbeiro.post("/login", data={"usuario": barbeiros[loja][0], "senha": SENHA})
+    rota = f"/api/agendamentos/disponibilidade?inicio={inicio_semana.isoformat()}&dias=7&duracao={args.duracao}"
+
+    medidas = {}
+    medir_rota(admin, rota + f"&loja={loja}", 3)  # aquecimento
+    medidas["semana, todos os barbeiros"], agenda = medir_rota(admin, rota + f"&loja={loja}", args.rodadas)
+    medidas["semana, um barbeiro"], _ = medir_rota(barbeiro, rota, args.rodadas)
+    for nome in ("semana, todos os barbeiros", "semana, um barbeiro"):
+        m = medidas[nome]
+        print(f"{nome:28s} p50 {m['p50_ms']:8.2f}  p95 {m['p95_ms']:8.2f}  p99 {m['p99_ms']:8.2f} ms")
+
+    # Forma ingênua (uma consulta por horário candidato) e conferência
+    dias = [inicio_semana + timedelta(days=i) for i in range(7)
+            if (inicio_semana + timedelta(days=i)).weekday() not in barbearia.agenda.AGENDA_DIAS_FECHADOS]
+    with barbearia.banco.get_engine().connect() as conn:
+        t0 = time.perf_counter()
+        livres, consultas = horarios_por_consulta(barbearia, text, conn, loja, barbeiros[loja], dias, args.duracao)
+        segundos = time.perf_counter() - t0
+    medidas["uma consulta por horário (antes)"] = {"ms": round(segundos * 1000, 2), "consultas": consultas}
+    print(f"{'uma consulta por horário':28s} {segundos * 1000:8.2f} ms ({consultas} consultas)")
+    iguais = all(agenda["barbeiros"][b][d]["horarios"] == h for (b, d), h in livres.items())
+    print(f">>> mesmos horários livres nas duas formas: {'sim' if iguais else 'NÃO'}")
+    if not iguais:
+        raise SystemExit("disponibilidade diverge da consulta por horário")
+
+    # Marcações simultâneas: threads disputando os horários livres da semana
+    candidatos = [(b, d, h) for b, por_dia in agenda["barbeiros"].items()
+                  for d, dia in por_dia.items() for h in dia["horarios"]]
+    status, lock = [], threading.Lock()
+
+    def marcar(seed):
+        rnd = random.Random(seed)
+        cliente = barbearia.app.test_client()
+        cliente.post("/login", data={"usuario": "bench_admin", "senha": SENHA})
+        locais = []
+        for _ in range(args.marcacoes):
+            b, d, h = rnd.choice(candidatos)
+            t0 = time.perf_counter()
+            r = cliente.post("/api/agendamentos", json={
+                "barbeiro": b, "cliente": "corrida", "data": d, "hora": h, "duracao": rnd.choice(DURACOES),
+            })
+            locais.append((r.status_code, time.perf_counter() - t0))
+        with lock:
+            status.extend(locais)
+
+    threads = [threading.Thread(target=marcar, args=(i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    with barbearia.banco.get_engine().connect() as conn:
+        sobrepostos = conn.execute(text("""
+            SELECT COUNT(*) FROM agendamentos AS a
+            JOIN agendamentos AS b
+              ON b.loja = a.loja AND b.barbeiro = a.barbeiro AND b.data = a.data AND b.id > a.id
+             AND b.inicio < a.fim AND a.inicio < b.fim
+            WHERE a.data >= :inicio AND a.status <> 'cancelado' AND b.status <> 'cancelado'
+        """), {"inicio": inicio_semana}).scalar()
+    contagem = {codigo: sum(1 for c, _ in status if c == codigo) for codigo in sorted({c for c, _ in status})}
+    medidas["marcações simultâneas"] = m = {
+        "latencia": resumo_latencias([s for _, s in status]),
+        "status": contagem,
+        "sobrepostos": sobrepostos,
+    }
+    print(f"{'marcações simultâneas':28s} p50 {m['latencia']['p50_ms']:8.2f}  p95 {m['latencia']['p95_ms']:8.2f} ms  "
+          f"status {contagem}  sobrepostos {sobrepostos}")
+    if sobrepostos:
+        raise SystemExit("agendamentos sobrepostos!")
+
+    if not args.nao_salvar:
+        salvar_resultado("agenda", {
+            "dialeto": barbearia.banco.DIALETO,
+            "banco": url[:40],
+            "lojas": len(lojas),
+            "barbeiros": args.barbeiros,
+            "agendamentos": total,
+            "ocupacao": args.ocupacao,
+            "duracao": args.duracao,
+            "rodadas": args.rodadas,
+            "threads": args.threads,
+        }, medidas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Latência do /api/analytics num ano de vendas (orçamento: 100 ms).
+
+Popula um ano de vendas e mede a rota com o cache frio (cada chamada recalcula
+comparações, médias móveis, meses e percentis) e quente, nas visões de
+todas as lojas, de uma loja e de um barbeiro. O p95 frio é comparado com o
+orçamento de ANALYTICS_ORCAMENTO_MS.
+
+Uso:
+    python benchmarks/bench_analytics.py --linhas 200000
+    python benchmarks/bench_analytics.py --lojas 10 --linhas 1000000
+    python benchmarks/bench_analytics.py --url postgresql+psycopg://... --linhas 1000000
+"""
+import argparse
+import time
+
+from comum import preparar_banco, resumo_latencias, salvar_resultado
+from dados import barbeiro_da_loja, nomes_lojas, popular
+
+SENHA = "bench"
+ANALYTICS_ORCAMENTO_MS = 100
+
+
+def medir(barbearia, cliente, rota, rodadas, frio):
+    latencias = []
+    for _ in range(rodadas):
+        if frio:
+            barbearia.cache.cache_resumos.backend.invalidar(lambda chave: True)
+        t0 = time.perf_counter()
+        resposta = cliente.get(rota)
+        resposta.get_data()
+        latencias.append(time.perf_counter() - t0)
+        if resposta.status_code != 200:
+            raise SystemExit(f"{rota} respondeu {resposta.status_code}")
+    return resumo_latencias(latencias)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="URL do banco (padrão: SQLite temporário)")
+    parser.add_argument("--linhas", type=int, default=200_000)
+    parser.add_argument("--dias", type=int, default=365)
+    parser.add_argument("--lojas", type=int, default=1, help="quantidade de lojas (filiais)")
+    parser.add_argument("--rodadas", type=int, default=30)
+    parser.add_argument("--nao-salvar", action="store_true")
+    args = parser.parse_args()
+
+    url = preparar_banco(args.url)
+    import barbearia
+
+    barbearia.schema.migrar_banco()
+    lojas = nomes_lojas(args.lojas)
+    loja = lojas[0]
+    t0 = time.perf_counter()
+    popular(barbearia.banco.get_engine(), args.linhas, args.dias, lojas=lojas)
+    with barbearia.banco.get_engine().begin() as conn:
+        barbearia.usuarios.usuario_salvar(conn, "bench_admin", SENHA, "admin")
+        barbearia.usuarios.usuario_salvar(conn, barbeiro_da_loja("vini", loja), SENHA, "barbeiro", loja=loja)
+    print(f">>> {args.linhas} vendas em {args.dias} dias, {len(lojas)} loja(s) "
+          f"({barbearia.banco.DIALETO}) em {time.perf_counter() - t0:.1f} s")
+
+    admin = barbearia.app.test_client()
+    admin.post("/login", data={"usuario": "bench_admin", "senha": SENHA})
+    barbeiro = barbearia.app.test_client()
+    barbeiro.post("/login", data={"usuario": barbeiro_da_loja("vini", loja), "senha": SENHA})
+    visoes = [
+        ("todas as lojas", admin, "/api/analytics"),
+        ("uma loja", admin, f"/api/analytics?loja={loja}"),
+        ("barbeiro", barbeiro, "/api/analytics"),
+        ("série de 1 ano", admin, "/api/analytics?dias=365"),
+    ]
+
+    medidas = {}
+    for nome, cliente, rota in visoes:
+        medir(barbearia, cliente, rota, 1, frio=True)  # aquecimento (conexão, planos)
+        medidas[nome] = {
+            "frio": medir(barbearia, cliente, rota, args.rodadas, frio=True),
+            "quente": medir(barbearia, cliente, rota, args.rodadas, frio=False),
+        }
+        m = medidas[nome]
+        situacao = "ok" if m["frio"]["p95_ms"] <= ANALYTICS_ORCAMENTO_MS else "ACIMA DO ORÇAMENTO"
+        print(f"{nome:16s} frio p50 {m['frio']['p50_ms']:8.2f}  p95 {m['frio']['p95_ms']:8.2f} ms  "
+              f"quente p50 {m['quente']['p50_ms']:6.2f} ms  [{situacao}]")
+
+    if not args.nao_salvar:
+        salvar_resultado("analytics", {
+            "dialeto": barbearia.banco.DIALETO,
+            "banco": url[:40],
+            "linhas": args.linhas,
+            "dias": args.dias,
+            "lojas": len(lojas),
+            "rodadas": args.rodadas,
+            "orcamento_ms": ANALYTICS_ORCAMENTO_MS,
+        }, medidas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Busca de clientes (/api/clientes) e histórico por cliente (/api/clientes/historico).
+
+Popula vendas com nomes de clientes realistas (com acentos) e mede, pelo
+Flask test client, o autocompletar com prefixos de 2 a 6 letras e o
+histórico de clientes sorteados. Para comparação mede também a forma
+antiga, sem índice: varrer vendas.cliente com LIKE.
+
+Uso:
+    python benchmarks/bench_clientes.py --linhas 1000000
+    python benchmarks/bench_clientes.py --url postgresql+psycopg://... --linhas 3000000 --lojas 10
+"""
+import argparse
+import random
+import time
+
+from comum import preparar_banco, resumo_latencias, salvar_resultado
+from dados import NOMES, SOBRENOMES, nomes_lojas, popular
+
+SENHA = "bench"
+
+
+def buscas(rnd, n):
+    """Prefixos como alguém digitando: 2 a 6 letras do nome, às vezes + sobrenome."""
+    for _ in range(n):
+        nome = rnd.choice(NOMES)[:rnd.randint(2, 6)]
+        if rnd.random() < 0.4:
+            nome += " " + rnd.choice(SOBRENOMES)[:rnd.randint(2, 4)]
+        yield nome
+
+
+def medir_rota(cliente, rotas):
+    latencias = []
+    for rota, params in rotas:
+        t0 = time.perf_counter()
+        resposta = cliente.get(rota, query_string=params)
+        resposta.get_data()
+        latencias.append(time.perf_counter() - t0)
+        if resposta.status_code != 200:
+            raise SystemExit(f"{rota} respondeu {resposta.status_code}")
+    return resumo_latencias(latencias)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="URL do banco (padrão: SQLite temporário)")
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--dias", type=int, default=3 * 365)
+    parser.add_argument("--lojas", type=int, default=1, help="quantidade de lojas (filiais)")
+    parser.add_argument("--rodadas", type=int, default=300)
+    parser.add_argument("--nao-salvar", action="store_true")
+    args = parser.parse_args()
+
+    url = preparar_banco(args.url)
+    import barbearia
+    from sqlalchemy import text
+
+    barbearia.schema.migrar_banco()
+    lojas = nomes_lojas(args.lojas)
+    t0 = time.perf_counter()
+    popular(barbearia.banco.get_engine(), args.linhas, args.dias, lojas=lojas)
+    with barbearia.banco.get_engine().begin() as conn:
+        barbearia.usuarios.usuario_salvar(conn, "bench_admin", SENHA, "admin")
+        barbearia.usuarios.usuario_salvar(conn, "bench_gerente", SENHA, "admin", loja=lojas[0])
+        qtd_clientes = conn.execute(text("SELECT COUNT(*) FROM clientes")).scalar()
+        amostra = conn.execute(
+            text("SELECT nome FROM clientes ORDER BY id LIMIT :n"), {"n": max(args.rodadas * 20, 1000)}
+        ).scalars().all()
+    print(f">>> {args.linhas} vendas, {qtd_clientes} clientes, {len(lojas)} loja(s) "
+          f"({barbearia.banco.DIALETO}) em {time.perf_counter() - t0:.1f} s")
+
+    rnd = random.Random(7)
+    termos = list(buscas(rnd, args.rodadas))
+    nomes = [rnd.choice(amostra) for _ in range(args.rodadas)]
+
+    admin = barbearia.app.test_client()
+    admin.post("/login", data={"usuario": "bench_admin", "senha": SENHA})
+    gerente = barbearia.app.test_client()
+    gerente.post("/login", data={"usuario": "bench_gerente", "senha": SENHA})
+
+    medidas = {}
+    for nome, cliente, rotas in (
+        ("busca (todas as lojas)", admin, [("/api/clientes", {"q": q}) for q in termos]),
+        ("busca (uma loja)", gerente, [("/api/clientes", {"q": q}) for q in termos]),
+        ("historico (todas as lojas)", admin, [("/api/clientes/historico", {"cliente": c}) for c in nomes]),
+        ("historico (uma loja)", gerente, [("/api/clientes/historico", {"cliente": c}) for c in nomes]),
+    ):
+        medir_rota(cliente, rotas[:5])  # aquecimento
+        medidas[nome] = m = medir_rota(cliente, rotas)
+        print(f"{nome:28s} p50 {m['p50_ms']:7.2f}  p95 {m['p95_ms']:7.2f}  p99 {m['p99_ms']:7.2f} ms")
+
+    # Forma antiga: varre vendas.cliente com LIKE (sem índice e sensível a
+    # acento), agrupando por cliente para ordenar pela última visita
+    latencias = []
+    with barbearia.banco.get_engine().connect() as conn:
+        for q in termos[:5]:
+            t0 = time.perf_counter()
+            conn.execute(text("""
+                SELECT cliente, MAX(data) FROM vendas
+                WHERE deleted_at IS NULL AND (cliente LIKE :inicio OR cliente LIKE :palavra)
+                GROUP BY cliente
+                ORDER BY 2 DESC
+                LIMIT 10
+            """), {"inicio": f"{q.split()[0]}%", "palavra": f"% {q.split()[0]}%"}).all()
+            latencias.append(time.perf_counter() - t0)
+    medidas["LIKE em vendas (antes)"] = m = resumo_latencias(latencias)
+    print(f"{'LIKE em vendas (antes)':28s} p50 {m['p50_ms']:7.2f}  p95 {m['p95_ms']:7.2f} ms")
+
+    if not args.nao_salvar:
+        salvar_resultado("clientes", {
+            "dialeto": barbearia.banco.DIALETO,
+            "banco": url[:40],
+            "linhas": args.linhas,
+            "lojas": len(lojas),
+            "clientes": qtd_clientes,
+            "rodadas": args.rodadas,
+        }, medidas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Benchmark dos índices parciais de vendas ativas (ix_vendas_ativas_*).
+
+Popula um banco com vendas sintéticas, roda as consultas de historico,
+download e resumo_mes sem os índices e depois com eles, mostrando o plano
+de execução e a latência de cada uma. Os índices são os que as migrações
+criaram: a definição é lida do banco, removida e recriada igual.
+
+Uso:
+    python benchmarks/bench_indices.py --linhas 2000000
+    python benchmarks/bench_indices.py --linhas 2000000 --lojas 40
+    python benchmarks/bench_indices.py --url postgresql+psycopg://... --linhas 3000000
+
+Sem --url usa um arquivo SQLite temporário (nunca o barbearia.db local).
+"""
+import argparse
+import time
+from datetime import date
+
+from comum import preparar_banco
+from dados import barbeiro_da_loja, nomes_lojas, popular
+
+
+def consultas(loja):
+    """As mesmas formas de filtro usadas pelas rotas."""
+    hoje = date.today()
+    mes_inicio = hoje.replace(day=1)
+    linhas = """
+        SELECT id, data, hora, cliente, barbeiro,
+               cabelo, barba, sobrancelha, produto_nome, produto_valor, desconto, total,
+               pagamento
+        FROM vendas
+        WHERE {where}
+        ORDER BY data DESC, hora DESC
+    """
+    return [
+        ("historico admin (hoje)",
+         linhas.format(where="deleted_at IS NULL AND data >= :ini AND data <= :fim"),
+         {"ini": hoje, "fim": hoje}),
+        ("historico loja (mês)",
+         linhas.format(where="deleted_at IS NULL AND loja = :loja AND data >= :ini AND data <= :fim"),
+         {"loja": loja, "ini": mes_inicio, "fim": hoje}),
+        ("historico barbeiro (mês)",
+         linhas.format(where="deleted_at IS NULL AND loja = :loja AND barbeiro = :b "
+                             "AND data >= :ini AND data <= :fim"),
+         {"loja": loja, "b": barbeiro_da_loja("vini", loja), "ini": mes_inicio, "fim": hoje}),
+        ("total do dia",
+         "SELECT COALESCE(SUM(total), 0) FROM vendas "
+         "WHERE deleted_at IS NULL AND data = :hoje",
+         {"hoje": hoje}),
+        ("resumo_mes por barbeiro",
+         "SELECT barbeiro, COALESCE(SUM(total), 0) FROM vendas "
+         "WHERE deleted_at IS NULL AND data >= :ini AND data <= :fim GROUP BY barbeiro",
+         {"ini": mes_inicio, "fim": hoje}),
+    ]
+
+
+def indices_ativos(conn, text):
+    """(nome, DDL) dos índices parciais de vendas ativas, como estão no banco."""
+    if conn.dialect.name == "sqlite":
+        sql = "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND name LIKE 'ix_vendas_ativas%'"
+    else:
+        sql = "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'vendas' AND indexname LIKE 'ix_vendas_ativas%'"
+    # Postgres mostra "ON ONLY vendas" no índice da tabela particionada; recriado
+    # sem o ONLY ele volta a valer para todas as partições
+    return [(nome, ddl.replace(" ON ONLY ", " ON ")) for nome, ddl in conn.execute(text(sql)).all()]
+
+
+def medir(engine, text, rodadas, loja):
+    dialeto = engine.dialect.name
+    explain = "EXPLAIN QUERY PLAN " if dialeto == "sqlite" else "EXPLAIN "
+    resultado = {}
+    with engine.connect() as conn:
+        for nome, sql, params in consultas(loja):
+            plano = conn.execute(text(explain + sql), params).all()
+            tempos = []
+            for _ in range(rodadas):
+                t0 = time.perf_counter()
+                conn.execute(text(sql), params).all()
+                tempos.append((time.perf_counter() - t0) * 1000)
+            tempos.sort()
+            resultado[nome] = tempos[len(tempos) // 2]
+            print(f"\n--- {nome}: mediana {resultado[nome]:.2f} ms")
+            for linha in plano:
+                print("    ", " | ".join(str(c) for c in linha))
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="URL do banco (padrão: SQLite temporário)")
+    parser.add_argument("--linhas", type=int, default=2_000_000)
+    parser.add_argument("--dias", type=int, default=3 * 365)
+    parser.add_argument("--rodadas", type=int, default=5)
+    parser.add_argument("--lojas", type=int, default=1, help="quantidade de lojas (filiais)")
+    args = parser.parse_args()
+    lojas = nomes_lojas(args.lojas)
+    # consultas por loja numa filial do meio (nem a maior, nem a menor)
+    loja = lojas[len(lojas) // 2]
+
+    preparar_banco(args.url)
+
+    # Importa o app já apontando para o banco do benchmark
+    import barbearia
+    from sqlalchemy import text
+
+    barbearia.schema.migrar_banco()
+    engine = barbearia.banco.get_engine()
+
+    # "Antes": guarda a definição dos índices e remove
+    with engine.begin() as conn:
+        indices = indices_ativos(conn, text)
+        for nome, _ in indices:
+            conn.execute(text(f"DROP INDEX IF EXISTS {nome}"))
+
+    print(f">>> Populando {args.linhas} vendas ({len(lojas)} loja(s)) em {engine.dialect.name}...")
+    t0 = time.perf_counter()
+    popular(engine, args.linhas, args.dias, lojas=lojas)
+    print(f">>> Populado em {time.perf_counter() - t0:.1f} s")
+
+    print("\n========== SEM ÍNDICES ==========")
+    antes = medir(engine, text, args.rodadas, loja)
+
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        for _, ddl in indices:
+            conn.execute(text(ddl))
+        conn.execute(text("ANALYZE"))
+    print(f"\n>>> Índices criados em {time.perf_counter() - t0:.1f} s: {', '.join(n for n, _ in indices)}")
+
+    print("\n========== COM ÍNDICES ==========")
+    depois = medir(engine, text, args.rodadas, loja)
+
+    print("\n========== RESUMO (mediana, ms) ==========")
+    for nome in antes:
+        ganho = antes[nome] / depois[nome] if depois[nome] else float("inf")
+        print(f"{nome:32s} {antes[nome]:10.2f} -> {depois[nome]:10.2f}  ({ganho:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
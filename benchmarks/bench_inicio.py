@@ -0,0 +1,89 @@
+"""Tempo de inicialização: do processo novo até a primeira resposta.
+
+Cada rodada sobe um interpretador limpo (como um worker do gunicorn ou um
+teste importando o app), importa app.py e faz GET /healthz. Mede o import,
+a primeira requisição e o tempo total do processo. O banco é migrado uma vez
+antes das rodadas, então a medida é a do boot normal (schema em dia).
+
+Uso:
+    python benchmarks/bench_inicio.py --rodadas 15
+    python benchmarks/bench_inicio.py --url postgresql+psycopg://... --rodadas 15
+
+Para comparar com outro commit: rode o script numa cópia (git worktree)
+daquele commit e depois `python benchmarks/comum.py comparar inicio`.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from comum import RAIZ, preparar_banco, resumo_latencias, salvar_resultado
+
+# Roda no processo filho: import + primeira requisição
+MEDIR = """
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+resposta = app.app.test_client().get("/healthz")
+t2 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "primeira": t2 - t1, "status": resposta.status_code}))
+"""
+
+# Migra o banco do benchmark (com e sem o comando explícito de migração)
+MIGRAR = """
+import app
+try:
+    from barbearia.schema import migrar_banco as migrar
+except ImportError:  # commits de antes do pacote barbearia
+    migrar = getattr(app, "migrar_banco", None)
+if migrar:
+    migrar()
+"""
+
+
+def rodar(codigo):
+    t0 = time.perf_counter()
+    saida = subprocess.run(
+        [sys.executable, "-c", codigo], cwd=RAIZ, env=os.environ.copy(),
+        capture_output=True, text=True, check=True,
+    )
+    return time.perf_counter() - t0, saida.stdout.strip().splitlines()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="URL do banco (padrão: SQLite temporário)")
+    parser.add_argument("--rodadas", type=int, default=15)
+    parser.add_argument("--nao-salvar", action="store_true")
+    args = parser.parse_args()
+
+    url = preparar_banco(args.url)
+    rodar(MIGRAR)
+
+    imports, primeiras, processos = [], [], []
+    for _ in range(args.rodadas):
+        segundos, linhas = rodar(MEDIR)
+        medida = json.loads(linhas[-1])
+        if medida["status"] != 200:
+            sys.exit(f"/healthz respondeu {medida['status']}")
+        imports.append(medida["import"])
+        primeiras.append(medida["primeira"])
+        processos.append(segundos)
+
+    medidas = {
+        "import": resumo_latencias(imports),
+        "primeira_requisicao": resumo_latencias(primeiras),
+        "processo_ate_resposta": resumo_latencias(processos),
+    }
+    for nome, m in medidas.items():
+        print(f"{nome:24s} p50 {m['p50_ms']:9.2f} ms  p95 {m['p95_ms']:9.2f} ms")
+
+    if not args.nao_salvar:
+        salvar_resultado("inicio", {"banco": url[:40], "rodadas": args.rodadas}, medidas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Várias lojas (filiais): o caixa de uma loja sob o relatório pesado de outra.
+
+Popula dezenas de lojas (movimento em Zipf: a matriz é a maior) e, com o
+Flask test client em threads, mede por alguns segundos:
+
+  * caixa: POST /registrar de barbeiros das outras lojas;
+  * historico: GET /historico do dia desses mesmos barbeiros;
+
+enquanto a gerência da loja mais movimentada baixa o período inteiro sem
+parar (o "vizinho barulhento", que segura conexões durante o streaming).
+Roda duas vezes: com o pool compartilhado e com LOJAS_POOL_ISOLADO (um pool
+por loja). O pool isolado só existe no Postgres; no SQLite as duas rodadas
+medem a mesma coisa.
+
+Uso:
+    python benchmarks/bench_lojas.py --lojas 40 --linhas 400000
+    python benchmarks/bench_lojas.py --url postgresql+psycopg://... --lojas 40 --linhas 2000000
+"""
+import argparse
+import itertools
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+from comum import preparar_banco, resumo_latencias, salvar_resultado
+from dados import barbeiro_da_loja, nomes_lojas, popular
+
+SENHA = "bench"
+
+
+def cliente(app, usuario):
+    c = app.test_client()
+    c.post("/login", data={"usuario": usuario, "senha": SENHA})
+    return c
+
+
+def rodada(barbearia, lojas, args, isolado):
+    """Uma rodada de args.segundos com ou sem pool por loja."""
+    barbearia.banco.LOJAS_POOL_ISOLADO = isolado
+    app = barbearia.app
+    movimentada, outras = lojas[0], lojas[1:]
+    inicio = (date.today() - timedelta(days=args.dias)).isoformat()
+    rota_download = f"/download?data_inicio={inicio}&data_fim={date.today().isoformat()}"
+
+    parar = threading.Event()
+    lock = threading.Lock()
+    caixa, historico, erros, downloads = [], [], [0], [0]
+
+    # Logins (hash de senha) antes de começar a medir
+    gerentes = [cliente(app, f"gerente_{movimentada}") for _ in range(args.barulho)]
+    fatias = [outras[i::args.caixas] or outras for i in range(args.caixas)]
+    balcoes = [[cliente(app, barbeiro_da_loja("vini", loja)) for loja in fatia] for fatia in fatias]
+
+    def barulho(c):
+        while not parar.is_set():
+            resposta = c.get(rota_download, buffered=False)
+            for _ in resposta.response:
+                pass
+            resposta.close()
+            with lock:
+                downloads[0] += 1
+
+    def caixa_das_outras(clientes):
+        # cada thread atende uma fatia das outras lojas, em rodízio
+        locais_caixa, locais_hist, locais_erros = [], [], 0
+        for c in itertools.cycle(clientes):
+            if parar.is_set():
+                break
+            t0 = time.perf_counter()
+            r = c.post("/registrar", data={
+                "cliente": "bench", "cabelo": "40", "pagamento": "pix",
+            })
+            locais_caixa.append(time.perf_counter() - t0)
+            locais_erros += r.status_code >= 400
+
+            t0 = time.perf_counter()
+            r = c.get("/historico")
+            r.get_data()
+            locais_hist.append(time.perf_counter() - t0)
+            locais_erros += r.status_code >= 400
+        with lock:
+            caixa.extend(locais_caixa)
+            historico.extend(locais_hist)
+            erros[0] += locais_erros
+
+    threads = [threading.Thread(target=barulho, args=(c,)) for c in gerentes]
+    for t in threads:
+        t.start()
+    time.sleep(1)  # o barulho já está segurando conexões quando o caixa começa
+    caixas = [threading.Thread(target=caixa_das_outras, args=(clientes,)) for clientes in balcoes]
+    for t in caixas:
+        t.start()
+    time.sleep(args.segundos)
+    parar.set()
+    for t in threads + caixas:
+        t.join()
+
+    return {
+        "caixa": resumo_latencias(caixa),
+        "historico": resumo_latencias(historico),
+        "caixa_por_s": round(len(caixa) / args.segundos, 2),
+        "downloads_loja_movimentada": downloads[0],
+        "erros": erros[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="URL do banco (padrão: SQLite temporário)")
+    parser.add_argument("--lojas", type=int, default=40)
+    parser.add_argument("--linhas", type=int, default=400_000)
+    parser.add_argument("--dias", type=int, default=365)
+    parser.add_argument("--barulho", type=int, default=6, help="threads baixando o período da matriz")
+    parser.add_argument("--caixas", type=int, default=4, help="threads registrando nas outras lojas")
+    parser.add_argument("--segundos", type=float, default=15)
+    parser.add_argument("--nao-salvar", action="store_true")
+    args = parser.parse_args()
+
+    url = preparar_banco(args.url)
+    # Pool principal pequeno (como um worker do Render): é ele que o
+    # relatório da loja movimentada esgota quando o pool é compartilhado
+    os.environ.setdefault("DB_POOL_SIZE", "4")
+    os.environ.setdefault("DB_MAX_OVERFLOW", "0")
+    os.environ.setdefault("DB_POOL_TIMEOUT", "60")
+    import barbearia
+
+    barbearia.schema.migrar_banco()
+    lojas = nomes_lojas(args.lojas)
+    t0 = time.perf_counter()
+    popular(barbearia.banco.get_engine(), args.linhas, args.dias, lojas=lojas)
+    with barbearia.banco.get_engine().begin() as conn:
+        for loja in lojas:
+            barbearia.usuarios.usuario_salvar(conn, barbeiro_da_loja("vini", loja), SENHA, "barbeiro", loja=loja)
+            barbearia.usuarios.usuario_salvar(conn, f"gerente_{loja}", SENHA, "admin", loja=loja)
+    print(f">>> {args.linhas} vendas em {len(lojas)} lojas ({barbearia.banco.DIALETO}) "
+          f"em {time.perf_counter() - t0:.1f} s")
+
+    medidas = {}
+    for nome, isolado in (("pool_compartilhado", False), ("pool_por_loja", True)):
+        medidas[nome] = m = rodada(barbearia, lojas, args, isolado)
+        print(f"{nome:20s} caixa p50 {m['caixa']['p50_ms']:8.2f}  p95 {m['caixa']['p95_ms']:8.2f}  "
+              f"p99 {m['caixa']['p99_ms']:8.2f} ms  ({m['caixa_por_s']:.1f}/s)  "
+              f"historico p95 {m['historico']['p95_ms']:8.2f} ms  "
+              f"downloads {m['downloads_loja_movimentada']}  erros {m['erros']}")
+
+    if not args.nao_salvar:
+        salvar_resultado("lojas", {
+            "dialeto": barbearia.banco.DIALETO,
+            "banco": url[:40],
+            "lojas": len(lojas),
+            "linhas": args.linhas,
+            "barulho": args.barulho,
+            "caixas": args.caixas,
+            "segundos": args.segundos,
+            "db_pool_size": barbearia.banco.DB_POOL_SIZE,
+            "loja_pool_size": barbearia.banco.LOJA_POOL_SIZE,
+        }, medidas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Registro de vendas com e sem o outbox local (OUTBOX_PATH).
+
+Mede a gravação de uma venda no outbox (o que o /registrar espera quando o
+outbox está ligado) contra o INSERT direto no banco, e o POST /registrar
+completo nos dois modos. Por fim mede quanto a thread de envio leva para
+esvaziar o outbox. Com --url aponte para o Postgres remoto (Neon) para ver a
+diferença que a rede faz no INSERT direto.
+
+Uso:
+    python benchmarks/bench_outbox.py
+    python benchmarks/bench_outbox.py --url postgresql+psycopg://... --rodadas 500
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import uuid
+
+from comum import preparar_banco, resumo_latencias, salvar_resultado
+
+SENHA = "bench"
+
+
+def venda_form(rnd):
+    return {
+        "cliente": f"Cliente {rnd.randint(1, 5000)}",
+        "barbeiro": "vini",
+        "cabelo": str(rnd.choice([35, 40, 45])),
+        "barba": str(rnd.choice([0, 25])),
+        "pagamento": rnd.choice(["pix", "dinheiro", "debito", "credito"]),
+        "idempotency_key": uuid.uuid4().hex,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="URL do banco (padrão: SQLite temporário)")
+    parser.add_argument("--rodadas", type=int, default=2000)
+    parser.add_argument("--nao-salvar", action="store_true")
+    args = parser.parse_args()
+
+    url = preparar_banco(args.url)
+    os.environ["OUTBOX_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench_outbox_"), "outbox.db")
+    import barbearia
+    from sqlalchemy import text
+
+    barbearia.schema.migrar_banco()
+    with barbearia.banco.get_engine().begin() as conn:
+        barbearia.usuarios.usuario_salvar(conn, "bench_admin", SENHA, "admin")
+    print(f">>> {args.rodadas} vendas por modo ({barbearia.banco.DIALETO}), outbox em {barbearia.outbox.OUTBOX_PATH}")
+
+    rnd = random.Random(7)
+    outbox = barbearia.outbox.local
+    medidas = {}
+    with barbearia.banco.get_engine().connect() as conn:
+        antes = conn.execute(text("SELECT COUNT(*) FROM vendas")).scalar()
+
+    def normalizada():
+        return barbearia.vendas.normalizar_venda(venda_form(rnd), "admin", "bench_admin")
+
+    # Só a gravação: outbox local x INSERT no banco
+    latencias = []
+    for _ in range(args.rodadas):
+        venda = normalizada()
+        t0 = time.perf_counter()
+        outbox.acrescentar(venda)
+        latencias.append(time.perf_counter() - t0)
+    medidas["gravar no outbox"] = resumo_latencias(latencias)
+
+    # Quanto a thread de envio leva, depois da última venda, para esvaziar o outbox
+    t0 = time.perf_counter()
+    while outbox.quantidade():
+        time.sleep(0.005)
+    medidas["esvaziar outbox_s"] = round(time.perf_counter() - t0, 3)
+
+    latencias = []
+    for _ in range(args.rodadas):
+        venda = normalizada()
+        t0 = time.perf_counter()
+        with barbearia.banco.get_engine().begin() as conn:
+            barbearia.vendas.inserir_vendas(conn, [venda])
+        latencias.append(time.perf_counter() - t0)
+    medidas["INSERT direto"] = resumo_latencias(latencias)
+
+    # POST /registrar completo (sessão, normalização, redirect) nos dois modos
+    cliente = barbearia.app.test_client()
+    cliente.post("/login", data={"usuario": "bench_admin", "senha": SENHA})
+    for nome, ligado in (("POST /registrar (outbox)", outbox), ("POST /registrar (direto)", None)):
+        barbearia.outbox.local = ligado
+        latencias = []
+        for _ in range(args.rodadas):
+            t0 = time.perf_counter()
+            resposta = cliente.post("/registrar", data=venda_form(rnd))
+            latencias.append(time.perf_counter() - t0)
+            if resposta.status_code != 302:
+                raise SystemExit(f"/registrar respondeu {resposta.status_code}")
+        medidas[nome] = resumo_latencias(latencias)
+    barbearia.outbox.local = outbox
+
+    for nome, m in medidas.items():
+        if isinstance(m, dict):
+            print(f"{nome:26s} p50 {m['p50_ms']:7.3f}  p95 {m['p95_ms']:7.3f}  p99 {m['p99_ms']:7.3f} ms")
+
+    while outbox.quantidade():
+        time.sleep(0.005)
+    with barbearia.banco.get_engine().connect() as conn:
+        gravadas = conn.execute(text("SELECT COUNT(*) FROM vendas")).scalar() - antes
+    print(f"outbox esvaziado {medidas['esvaziar outbox_s']:.3f} s depois da última venda; "
+          f"{gravadas} vendas novas no banco (esperado {args.rodadas * 4})")
+
+    if not args.nao_salvar:
+        salvar_resultado("outbox", {
+            "dialeto": barbearia.banco.DIALETO,
+            "banco": url[:40],
+            "rodadas": args.rodadas,
+            "sync": barbearia.outbox.OUTBOX_SYNC,
+        }, medidas)
+
+
+if __name__ == "__main__":
+    main()
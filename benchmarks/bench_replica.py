@@ -0,0 +1,155 @@
+"""Caixa (POST /registrar) enquanto a gerência exporta o período inteiro, com e sem réplica.
+
+Com o Flask test client em threads, mede por alguns segundos o POST
+/registrar de barbeiros enquanto admins baixam o período inteiro sem parar
+(/download segura a conexão durante todo o streaming). Roda duas vezes: com
+tudo no banco principal e com DATABASE_READ_URL (download, historico e
+resumos na réplica). No SQLite a réplica é uma cópia do arquivo feita depois
+de popular; no Postgres informe --url-leitura (ex.: um banco criado com
+CREATE DATABASE ... TEMPLATE do principal, ou a read replica do Neon).
+
+Uso:
+    python benchmarks/bench_replica.py --linhas 400000
+    python benchmarks/bench_replica.py --url postgresql+psycopg://.../principal \\
+        --url-leitura postgresql+psycopg://.../replica --linhas 2000000
+"""
+import argparse
+import itertools
+import os
+import shutil
+import threading
+import time
+from datetime import date, timedelta
+
+from comum import preparar_banco, resumo_latencias, salvar_resultado
+from dados import barbeiro_da_loja, nomes_lojas, popular
+
+SENHA = "bench"
+
+
+def cliente(app, usuario):
+    c = app.test_client()
+    c.post("/login", data={"usuario": usuario, "senha": SENHA})
+    return c
+
+
+def rodada(barbearia, loja, args, url_leitura):
+    """Uma rodada de args.segundos, com ou sem a réplica de leitura."""
+    barbearia.banco.DATABASE_READ_URL = url_leitura
+    app = barbearia.app
+    inicio = (date.today() - timedelta(days=args.dias)).isoformat()
+    rota_download = f"/download?data_inicio={inicio}&data_fim={date.today().isoformat()}"
+
+    parar = threading.Event()
+    lock = threading.Lock()
+    caixa, erros, downloads = [], [0], [0]
+
+    # Logins (hash de senha) antes de começar a medir
+    gerentes = [cliente(app, "bench_admin") for _ in range(args.barulho)]
+    balcoes = [cliente(app, barbeiro_da_loja("vini", loja)) for _ in range(args.caixas)]
+
+    def barulho(c):
+        while not parar.is_set():
+            resposta = c.get(rota_download, buffered=False)
+            for _ in resposta.response:
+                pass
+            resposta.close()
+            with lock:
+                downloads[0] += 1
+
+    def registrar(c):
+        locais, locais_erros = [], 0
+        for i in itertools.count():
+            if parar.is_set():
+                break
+            t0 = time.perf_counter()
+            r = c.post("/registrar", data={"cliente": f"bench {i}", "cabelo": "40", "pagamento": "pix"})
+            locais.append(time.perf_counter() - t0)
+            locais_erros += r.status_code >= 400
+        with lock:
+            caixa.extend(locais)
+            erros[0] += locais_erros
+
+    threads = [threading.Thread(target=barulho, args=(c,)) for c in gerentes]
+    for t in threads:
+        t.start()
+    time.sleep(1)  # as exportações já estão segurando conexões quando o caixa começa
+    caixas = [threading.Thread(target=registrar, args=(c,)) for c in balcoes]
+    for t in caixas:
+        t.start()
+    time.sleep(args.segundos)
+    parar.set()
+    for t in threads + caixas:
+        t.join()
+
+    return {
+        "caixa": resumo_latencias(caixa),
+        "caixa_por_s": round(len(caixa) / args.segundos, 2),
+        "downloads": downloads[0],
+        "erros": erros[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="URL do banco (padrão: SQLite temporário)")
+    parser.add_argument("--url-leitura", help="URL da réplica (padrão: cópia do SQLite temporário)")
+    parser.add_argument("--linhas", type=int, default=400_000)
+    parser.add_argument("--dias", type=int, default=365)
+    parser.add_argument("--barulho", type=int, default=4, help="threads exportando o período inteiro")
+    parser.add_argument("--caixas", type=int, default=4, help="threads registrando vendas")
+    parser.add_argument("--segundos", type=float, default=15)
+    parser.add_argument("--nao-salvar", action="store_true")
+    args = parser.parse_args()
+
+    url = preparar_banco(args.url)
+    copia = None
+    if args.url_leitura:
+        os.environ["DATABASE_READ_URL"] = args.url_leitura
+    elif url.startswith("sqlite"):
+        copia = url[len("sqlite:///"):] + ".replica"
+        os.environ["DATABASE_READ_URL"] = f"sqlite:///{copia}"
+    else:
+        raise SystemExit("Postgres: informe --url-leitura (a réplica já populada com os mesmos dados)")
+    # Pool pequeno (como um worker do Render): é ele que as exportações
+    # esgotam quando tudo vai para o principal
+    os.environ.setdefault("DB_POOL_SIZE", "4")
+    os.environ.setdefault("DB_MAX_OVERFLOW", "0")
+    os.environ.setdefault("DB_POOL_TIMEOUT", "60")
+    # Os caixas gravam o tempo todo: a janela de "ler o que gravou" não importa aqui
+    import barbearia
+
+    barbearia.schema.migrar_banco()
+    loja = nomes_lojas(1)[0]
+    t0 = time.perf_counter()
+    popular(barbearia.banco.get_engine(), args.linhas, args.dias)
+    with barbearia.banco.get_engine().begin() as conn:
+        barbearia.usuarios.usuario_salvar(conn, "bench_admin", SENHA, "admin")
+        barbearia.usuarios.usuario_salvar(conn, barbeiro_da_loja("vini", loja), SENHA, "barbeiro", loja=loja)
+    if copia:
+        barbearia.banco.get_engine().dispose()
+        shutil.copy(url[len("sqlite:///"):], copia)
+    print(f">>> {args.linhas} vendas ({barbearia.banco.DIALETO}) em {time.perf_counter() - t0:.1f} s")
+
+    medidas = {}
+    url_leitura = barbearia.banco.DATABASE_READ_URL
+    for nome, leitura in (("sem_replica", ""), ("com_replica", url_leitura)):
+        medidas[nome] = m = rodada(barbearia, loja, args, leitura)
+        print(f"{nome:12s} caixa p50 {m['caixa']['p50_ms']:8.2f}  p95 {m['caixa']['p95_ms']:8.2f}  "
+              f"p99 {m['caixa']['p99_ms']:8.2f} ms  ({m['caixa_por_s']:.1f}/s)  "
+              f"downloads {m['downloads']}  erros {m['erros']}")
+
+    if not args.nao_salvar:
+        salvar_resultado("replica", {
+            "dialeto": barbearia.banco.DIALETO,
+            "banco": url[:40],
+            "linhas": args.linhas,
+            "barulho": args.barulho,
+            "caixas": args.caixas,
+            "segundos": args.segundos,
+            "db_pool_size": barbearia.banco.DB_POOL_SIZE,
+        }, medidas)
+
+
+if __name__ == "__main__":
+    main()
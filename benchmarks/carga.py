@@ -0,0 +1,168 @@
+"""Teste de carga concorrente das rotas (Flask test client ou servidor HTTP).
+
+Mede p50/p95/p99 e vazão por rota e grava em resultados/carga.jsonl.
+
+Uso:
+    # tudo em processo: SQLite temporário com 10k vendas, test client do Flask
+    python benchmarks/carga.py --linhas 10000
+
+    # contra um gunicorn local (o banco é o que o servidor estiver usando)
+    gunicorn -c gunicorn.conf.py app:app &
+    python benchmarks/carga.py --alvo http://127.0.0.1:8000 --sem-popular
+
+    # Postgres local
+    python benchmarks/carga.py --url postgresql+psycopg://localhost/barbearia_bench --linhas 1000000
+"""
+import argparse
+import http.cookiejar
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import date, timedelta
+
+from comum import preparar_banco, resumo_latencias, salvar_resultado
+
+
+def rotas_padrao():
+    hoje = date.today()
+    mes = (hoje - timedelta(days=30)).isoformat()
+    return [
+        "/historico",
+        "/historico?periodo=tudo",
+        f"/historico?data_inicio={mes}&data_fim={hoje.isoformat()}",
+        "/resumo_mes",
+        f"/download?data_inicio={mes}&data_fim={hoje.isoformat()}",
+    ]
+
+
+class ClienteFlask:
+    """Um test client por thread (cada um com sua sessão)."""
+
+    def __init__(self, app, usuario, senha):
+        self.cliente = app.test_client()
+        self.cliente.post("/login", data={"usuario": usuario, "senha": senha})
+
+    def get(self, rota):
+        resposta = self.cliente.get(rota)
+        corpo = resposta.get_data()
+        resposta.close()
+        return resposta.status_code, len(corpo)
+
+
+class ClienteHTTP:
+    """Cliente urllib com cookie de sessão, para um servidor de verdade."""
+
+    def __init__(self, base, usuario, senha):
+        self.base = base.rstrip("/")
+        self.abridor = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+        dados = urllib.parse.urlencode({"usuario": usuario, "senha": senha}).encode()
+        self.abridor.open(self.base + "/login", data=dados).read()
+
+    def get(self, rota):
+        try:
+            with self.abridor.open(self.base + rota) as resposta:
+                return resposta.status, len(resposta.read())
+        except urllib.error.HTTPError as e:
+            return e.code, 0
+
+
+def rodar_rota(fabrica_cliente, rota, concorrencia, requisicoes):
+    latencias, erros = [], []
+    lock = threading.Lock()
+    por_thread = max(requisicoes // concorrencia, 1)
+    clientes = [fabrica_cliente() for _ in range(concorrencia)]
+
+    def trabalhador(cliente):
+        locais, locais_erros = [], 0
+        for _ in range(por_thread):
+            t0 = time.perf_counter()
+            status, _ = cliente.get(rota)
+            locais.append(time.perf_counter() - t0)
+            if status >= 400:
+                locais_erros += 1
+        with lock:
+            latencias.extend(locais)
+            erros.append(locais_erros)
+
+    threads = [threading.Thread(target=trabalhador, args=(c,)) for c in clientes]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+
+    resultado = resumo_latencias(latencias)
+    resultado["erros"] = sum(erros)
+    resultado["req_por_s"] = round(len(latencias) / duracao, 2)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alvo", default="flask", help="'flask' (test client) ou URL base do servidor")
+    parser.add_argument("--url", help="URL do banco (padrão: SQLite temporário)")
+    parser.add_argument("--linhas", type=int, default=10_000, help="vendas sintéticas a gerar")
+    parser.add_argument("--sem-popular", action="store_true", help="usa o banco como está")
+    parser.add_argument("--concorrencia", type=int, default=4)
+    parser.add_argument("--requisicoes", type=int, default=200, help="por rota")
+    parser.add_argument("--usuario", default="carga", help="admin; no modo flask é criado na hora")
+    parser.add_argument("--senha", help="obrigatória com servidor (padrão no modo flask: aleatória)")
+    parser.add_argument("--rota", action="append", help="rota a testar (repetível)")
+    parser.add_argument("--nao-salvar", action="store_true")
+    args = parser.parse_args()
+
+    rotas = args.rota or rotas_padrao()
+
+    if args.alvo == "flask":
+        url = preparar_banco(args.url)
+        import barbearia
+        from dados import popular
+
+        barbearia.schema.migrar_banco()
+        if not args.sem_popular:
+            t0 = time.perf_counter()
+            popular(barbearia.banco.get_engine(), args.linhas)
+            print(f">>> {args.linhas} vendas em {time.perf_counter() - t0:.1f} s")
+
+        def fabrica():
+            return ClienteFlask(barbearia.app, args.usuario, args.senha)
+
+        dialeto = barbearia.banco.DIALETO
+        with barbearia.banco.get_engine().begin() as conn:
+            args.senha = args.senha or uuid.uuid4().hex
+            barbearia.usuarios.usuario_salvar(conn, args.usuario, args.senha, "admin")
+    else:
+        if not args.senha:
+            parser.error("--senha é obrigatória com um servidor como alvo")
+        url, dialeto = None, "(servidor)"
+
+        def fabrica():
+            return ClienteHTTP(args.alvo, args.usuario, args.senha)
+
+    medidas = {}
+    for rota in rotas:
+        # aquecimento: primeira chamada (cache frio, templates) fica fora da medida
+        fabrica().get(rota)
+        medidas[rota] = rodar_rota(fabrica, rota, args.concorrencia, args.requisicoes)
+        m = medidas[rota]
+        print(f"{rota[:60]:60s} p50 {m['p50_ms']:8.2f}  p95 {m['p95_ms']:8.2f}  "
+              f"p99 {m['p99_ms']:8.2f} ms  {m['req_por_s']:8.1f} req/s  erros {m['erros']}")
+
+    if not args.nao_salvar:
+        salvar_resultado("carga", {
+            "alvo": args.alvo,
+            "dialeto": dialeto,
+            "banco": (url or "")[:40],
+            "linhas": None if args.sem_popular else args.linhas,
+            "concorrencia": args.concorrencia,
+            "requisicoes": args.requisicoes,
+        }, medidas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Utilidades compartilhadas pelos benchmarks: banco de teste, percentis e resultados.
+
+Os resultados de cada execução são gravados em benchmarks/resultados/<nome>.jsonl
+(uma linha JSON por execução), o que permite comparar execuções entre commits:
+
+    python benchmarks/comum.py comparar carga            # últimas duas execuções
+    python benchmarks/comum.py comparar carga --limite 1.2
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTADOS = os.path.join(RAIZ, "benchmarks", "resultados")
+
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+
+def preparar_banco(url=None):
+    """Aponta DATABASE_URL para o banco do benchmark antes de importar o app.
+
+    Sem url usa um SQLite temporário (nunca o barbearia.db local).
+    """
+    if not url:
+        pasta = tempfile.mkdtemp(prefix="bench_barbearia_")
+        url = f"sqlite:///{os.path.join(pasta, 'bench.db')}"
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("LOG_REQUISICOES", "0")
+    return url
+
+
+def percentil(valores_ordenados, p):
+    """Percentil por interpolação linear (valores já ordenados)."""
+    if not valores_ordenados:
+        return None
+    pos = (len(valores_ordenados) - 1) * p / 100
+    baixo = int(pos)
+    alto = min(baixo + 1, len(valores_ordenados) - 1)
+    return valores_ordenados[baixo] + (valores_ordenados[alto] - valores_ordenados[baixo]) * (pos - baixo)
+
+
+def resumo_latencias(segundos):
+    """p50/p95/p99/máx em milissegundos."""
+    ordenados = sorted(segundos)
+    return {
+        "n": len(ordenados),
+        "p50_ms": round(percentil(ordenados, 50) * 1000, 3) if ordenados else None,
+        "p95_ms": round(percentil(ordenados, 95) * 1000, 3) if ordenados else None,
+        "p99_ms": round(percentil(ordenados, 99) * 1000, 3) if ordenados else None,
+        "max_ms": round(ordenados[-1] * 1000, 3) if ordenados else None,
+    }
+
+
+def commit_atual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def salvar_resultado(nome, parametros, medidas):
+    """Acrescenta uma execução em resultados/<nome>.jsonl e devolve o registro."""
+    os.makedirs(RESULTADOS, exist_ok=True)
+    registro = {
+        "quando": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit_atual(),
+        "python": platform.python_version(),
+        "maquina": platform.node(),
+        "parametros": parametros,
+        "medidas": medidas,
+    }
+    with open(os.path.join(RESULTADOS, f"{nome}.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    return registro
+
+
+def carregar_resultados(nome):
+    caminho = os.path.join(RESULTADOS, f"{nome}.jsonl")
+    if not os.path.exists(caminho):
+        return []
+    with open(caminho, encoding="utf-8") as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+
+def comparar(anterior, atual, limite=1.15):
+    """Compara métricas *_ms/*_us/*_kb (menor é melhor) e *_por_s (maior é melhor).
+
+    Retorna a lista de regressões: razão pior que `limite`.
+    """
+    regressoes = []
+
+    def percorrer(a, b, caminho):
+        if isinstance(a, dict) and isinstance(b, dict):
+            for chave in sorted(set(a) & set(b)):
+                percorrer(a[chave], b[chave], caminho + [chave])
+            return
+        if not isinstance(a, (int, float)) or not isinstance(b, (int, float)) or not a or not b:
+            return
+        metrica = caminho[-1]
+        if metrica.endswith(("_ms", "_us", "_kb")):
+            razao = b / a
+        elif metrica.endswith("_por_s"):
+            razao = a / b
+        else:
+            return
+        marca = "REGRESSÃO" if razao > limite else ""
+        print(f"{'.'.join(caminho):60s} {a:12.3f} -> {b:12.3f}  ({razao:5.2f}x) {marca}")
+        if marca:
+            regressoes.append((".".join(caminho), a, b, razao))
+
+    percorrer(anterior["medidas"], atual["medidas"], [])
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara execuções gravadas de um benchmark.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p = sub.add_parser("comparar")
+    p.add_argument("nome", help="nome do benchmark (carga, micro, ...)")
+    p.add_argument("--limite", type=float, default=1.15, help="razão a partir da qual é regressão")
+    args = parser.parse_args()
+
+    execucoes = carregar_resultados(args.nome)
+    if len(execucoes) < 2:
+        sys.exit(f"precisa de ao menos duas execuções em resultados/{args.nome}.jsonl")
+
+    anterior, atual = execucoes[-2], execucoes[-1]
+    print(f"{anterior['commit']} ({anterior['quando']}) -> {atual['commit']} ({atual['quando']})")
+    regressoes = comparar(anterior, atual, args.limite)
+    sys.exit(1 if regressoes else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Gerador de vendas sintéticas para os benchmarks.
+
+Distribuição próxima da real: a maioria das vendas é de vini e artur, Pix é
+o pagamento mais comum, ~15% das vendas têm produto e ~2% estão excluídas.
+Com várias lojas, o movimento segue uma lei de Zipf (a primeira loja é a
+mais movimentada) e cada loja tem seus próprios barbeiros.
+
+Uso:
+    python benchmarks/dados.py --tamanho 10k --url sqlite:////tmp/bench.db
+    python benchmarks/dados.py --tamanho 1m  --url postgresql+psycopg://...
+    python benchmarks/dados.py --linhas 250000 --dias 365 --url ...
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from comum import preparar_banco
+
+TAMANHOS = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+BARBEIROS = (["vini", "artur", "mairon"], [45, 40, 15])
+PAGAMENTOS = (["pix", "debito", "credito", "dinheiro"], [45, 25, 20, 10])
+PRODUTOS = [("Gel de cabelo", 25.0), ("Espuma de barbear", 30.0), ("Xampu", 35.0)]
+SERVICOS = [
+    # (cabelo, barba, sobrancelha), peso
+    ((40.0, 0.0, 0.0), 45),
+    ((40.0, 25.0, 0.0), 25),
+    ((0.0, 25.0, 0.0), 15),
+    ((40.0, 25.0, 10.0), 10),
+    ((35.0, 0.0, 10.0), 5),
+]
+
+COLUNAS = [
+    "data", "hora", "cliente", "barbeiro", "cabelo", "barba", "sobrancelha",
+    "produto_nome", "produto_valor", "desconto", "total", "pagamento", "deleted_at", "loja",
+]
+
+# Nomes de clientes: nome + dois sobrenomes (64 mil combinações, com acentos)
+NOMES = [
+    "João", "José", "Antônio", "Luís", "Lucas", "Gabriel", "Rafael", "Mateus", "Pedro", "Thiago",
+    "Vinícius", "Gustavo", "Felipe", "André", "Caio", "Márcio", "Sérgio", "Fábio", "Otávio", "Ígor",
+    "Ana", "Maria", "Júlia", "Letícia", "Camila", "Bruna", "Larissa", "Patrícia", "Cláudia", "Mônica",
+    "Paulo", "Rodrigo", "Daniel", "Eduardo", "Henrique", "Leandro", "Renato", "Rogério", "Simão", "Tomás",
+]
+SOBRENOMES = [
+    "Silva", "Santos", "Oliveira", "Souza", "Conceição", "Ferreira", "Araújo", "Gonçalves", "Gomes", "Lima",
+    "Ribeiro", "Carvalho", "Brandão", "Assunção", "Correia", "Damásio", "Falcão", "Galvão", "Leão", "Magalhães",
+    "Barros", "Cardoso", "Castro", "Dias", "Freitas", "Lopes", "Macedo", "Melo", "Moreira", "Nogueira",
+    "Peixoto", "Pinto", "Ramos", "Rocha", "Siqueira", "Teixeira", "Vieira", "Xavier", "Monção", "Estêvão",
+]
+
+
+def nomes_lojas(n):
+    """n lojas sintéticas: a matriz e as filiais filial_01, filial_02, ..."""
+    return ["matriz"] + [f"filial_{i:02d}" for i in range(1, n)]
+
+
+def barbeiro_da_loja(barbeiro, loja):
+    """Na matriz os nomes de sempre; nas filiais, vini_filial_01 etc."""
+    return barbeiro if loja == "matriz" else f"{barbeiro}_{loja}"
+
+
+def nome_cliente(i):
+    """Nome determinístico do i-ésimo cliente (com sufixo quando acabam as combinações)."""
+    n, s = len(NOMES), len(SOBRENOMES)
+    nome = f"{NOMES[i % n]} {SOBRENOMES[i // n % s]} {SOBRENOMES[i // (n * s) % s]}"
+    return nome if i < n * s * s else f"{nome} {i // (n * s * s) + 1}"
+
+
+def gerar_vendas(n, dias=3 * 365, seed=42, hoje=None, lojas=None):
+    """Gera n tuplas na ordem de COLUNAS, espalhadas pelos últimos `dias` dias."""
+    rnd = random.Random(seed)
+    hoje = hoje or date.today()
+    datas = [hoje - timedelta(days=d) for d in range(dias)]
+    servicos, pesos_servicos = zip(*SERVICOS)
+    clientes = max(n // 8, 1)
+    lojas = lojas or ["matriz"]
+    pesos_lojas = [1 / (i + 1) for i in range(len(lojas))]
+
+    for _ in range(n):
+        # com uma loja só não sorteia: mantém a mesma sequência de antes das lojas
+        loja = rnd.choices(lojas, pesos_lojas)[0] if len(lojas) > 1 else lojas[0]
+        cabelo, barba, sobrancelha = rnd.choices(servicos, pesos_servicos)[0]
+        produto_nome, produto_valor = rnd.choice(PRODUTOS) if rnd.random() < 0.15 else (None, 0.0)
+        desconto = 5.0 if rnd.random() < 0.1 else 0.0
+        total = max(cabelo + barba + sobrancelha + produto_valor - desconto, 0.0)
+        yield (
+            datas[min(int(rnd.expovariate(1 / (dias / 3))), dias - 1)],
+            f"{rnd.randrange(9, 20):02d}:{rnd.randrange(0, 60, 5):02d}",
+            nome_cliente(rnd.randrange(clientes)),
+            barbeiro_da_loja(rnd.choices(*BARBEIROS)[0], loja),
+            cabelo, barba, sobrancelha,
+            produto_nome, produto_valor, desconto, total,
+            rnd.choices(*PAGAMENTOS)[0],
+            "2000-01-01 00:00:00" if rnd.random() < 0.02 else None,
+            loja,
+        )
+
+
+def popular(engine, n, dias=3 * 365, lote=50_000, seed=42, lojas=None):
+    """Grava n vendas (COPY no Postgres, executemany no SQLite) e refaz o rollup
+    e o diretório de clientes."""
+    import barbearia
+
+    # cliente_norm calculado pelo app, como no registrar
+    colunas = ", ".join(COLUNAS + ["cliente_norm"])
+    buffer = []
+
+    def gravar(conn, linhas):
+        if conn.dialect.name == "postgresql":
+            cursor = conn.connection.driver_connection.cursor()
+            with cursor.copy(f"COPY vendas ({colunas}) FROM STDIN") as copy:
+                for linha in linhas:
+                    copy.write_row(linha)
+        else:
+            marcadores = ", ".join("?" for _ in COLUNAS + ["cliente_norm"])
+            conn.connection.driver_connection.executemany(
+                f"INSERT INTO vendas ({colunas}) VALUES ({marcadores})",
+                ((linha[0].isoformat(),) + linha[1:] for linha in linhas),
+            )
+
+    for venda in gerar_vendas(n, dias, seed, lojas=lojas):
+        buffer.append(venda + (barbearia.helpers.normalizar_cliente(venda[2]),))
+        if len(buffer) >= lote:
+            with engine.begin() as conn:
+                gravar(conn, buffer)
+            buffer.clear()
+    with engine.begin() as conn:
+        if buffer:
+            gravar(conn, buffer)
+        barbearia.rollup.rollup_reconstruir(conn)
+        barbearia.clientes.clientes_reconstruir(conn)
+        conn.exec_driver_sql("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="URL do banco (padrão: SQLite temporário)")
+    parser.add_argument("--tamanho", choices=sorted(TAMANHOS), default="10k")
+    parser.add_argument("--linhas", type=int, help="sobrescreve --tamanho")
+    parser.add_argument("--dias", type=int, default=3 * 365)
+    parser.add_argument("--lojas", type=int, default=1, help="quantidade de lojas (filiais)")
+    args = parser.parse_args()
+
+    url = preparar_banco(args.url)
+    import barbearia
+
+    n = args.linhas or TAMANHOS[args.tamanho]
+    t0 = time.perf_counter()
+    barbearia.schema.migrar_banco()
+    popular(barbearia.banco.get_engine(), n, args.dias, lojas=nomes_lojas(args.lojas))
+    print(f">>> {n} vendas em {time.perf_counter() - t0:.1f} s -> {url}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Micro-benchmarks da formatação de linhas do /historico e do CSV do /download.
+
+Compara o antigo row_to_dict (um dict de 14 chaves por linha, reproduzido
+aqui como referência) com barbearia.helpers.VendaLinha. Não toca no banco: as linhas são
+geradas em memória no mesmo formato que o SQLite devolve (data como texto
+'YYYY-MM-DD').
+
+Uso:
+    python benchmarks/micro.py --linhas 100000
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import date, datetime
+
+from comum import preparar_banco, salvar_resultado
+from dados import COLUNAS, gerar_vendas
+
+
+CAMPOS_TEMPLATE = (
+    "id", "data", "hora", "cliente", "barbeiro", "cabelo", "barba", "sobrancelha",
+    "produto_nome", "produto_valor", "pagamento", "desconto", "total",
+)
+
+
+def row_to_dict_antigo(r):
+    """O row_to_dict de antes do VendaLinha, só para comparação."""
+    d = r.get("data")
+    if isinstance(d, date):
+        data_str = d.strftime("%d/%m/%Y")
+    else:
+        try:
+            data_str = datetime.strptime(str(d), "%Y-%m-%d").strftime("%d/%m/%Y")
+        except Exception:
+            data_str = str(d or "")
+
+    produto_valor_num = float(r.get("produto_valor") or 0)
+
+    return {
+        "id": r.get("id"),
+        "data": data_str,
+        "hora": str(r.get("hora") or ""),
+        "cliente": str(r.get("cliente") or ""),
+        "barbeiro": str(r.get("barbeiro") or ""),
+        "cabelo": f"{float(r.get('cabelo') or 0):.2f}",
+        "barba": f"{float(r.get('barba') or 0):.2f}",
+        "sobrancelha": f"{float(r.get('sobrancelha') or 0):.2f}",
+        "produto": f"{produto_valor_num:.2f}",
+        "produto_valor": f"{produto_valor_num:.2f}",
+        "desconto": f"{float(r.get('desconto') or 0):.2f}",
+        "total": f"{float(r.get('total') or 0):.2f}",
+        "produto_nome": str(r.get("produto_nome") or ""),
+        "pagamento": str(r.get("pagamento") or "nao_informado"),
+    }
+
+
+def renderizar_campos(vendas, acessar):
+    """Lê todos os campos que o historico.html mostra, como o Jinja faria."""
+    for v in vendas:
+        for campo in CAMPOS_TEMPLATE:
+            acessar(v, campo)
+
+
+def linhas_sinteticas(n):
+    linhas = []
+    for i, venda in enumerate(gerar_vendas(n, dias=365), 1):
+        linha = dict(zip(COLUNAS, venda))
+        linha["id"] = i
+        linha["data"] = linha["data"].isoformat()
+        linhas.append(linha)
+    return linhas
+
+
+def medir(func, rodadas):
+    """Melhor tempo de `rodadas` execuções e pico de memória de uma delas."""
+    tempos = []
+    for _ in range(rodadas):
+        t0 = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    func()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(tempos), pico
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--rodadas", type=int, default=5)
+    parser.add_argument("--nao-salvar", action="store_true")
+    args = parser.parse_args()
+
+    preparar_banco()
+    import barbearia
+
+    linhas = linhas_sinteticas(args.linhas)
+
+    def dicts():
+        vendas = [row_to_dict_antigo(r) for r in linhas]
+        renderizar_campos(vendas, dict.__getitem__)
+        return vendas
+
+    def compactas():
+        vendas = [barbearia.helpers.VendaLinha(r) for r in linhas]
+        renderizar_campos(vendas, getattr)
+        return vendas
+
+    casos = {
+        "row_to_dict_antigo": dicts,
+        "venda_linha": compactas,
+        "csv_download": lambda: sum(len(p) for p in barbearia.exportacao.csv_vendas_em_partes(linhas)),
+    }
+
+    medidas = {}
+    for nome, func in casos.items():
+        segundos, pico = medir(func, args.rodadas)
+        medidas[nome] = {
+            "total_ms": round(segundos * 1000, 2),
+            "por_linha_us": round(segundos * 1e6 / args.linhas, 3),
+            "linhas_por_s": round(args.linhas / segundos),
+            "pico_memoria_kb": round(pico / 1024),
+        }
+        print(f"{nome:20s} {segundos * 1000:9.1f} ms  {args.linhas / segundos:12,.0f} linhas/s  "
+              f"pico {pico / 1024:,.0f} KiB")
+
+    ganho = medidas["row_to_dict_antigo"]["total_ms"] / medidas["venda_linha"]["total_ms"]
+    memoria = medidas["row_to_dict_antigo"]["pico_memoria_kb"] / max(medidas["venda_linha"]["pico_memoria_kb"], 1)
+    print(f"VendaLinha vs row_to_dict: {ganho:.1f}x mais rápido, {memoria:.1f}x menos memória")
+
+    if not args.nao_salvar:
+        salvar_resultado("micro", {"linhas": args.linhas, "rodadas": args.rodadas}, medidas)
+
+
+if __name__ == "__main__":
+    main()
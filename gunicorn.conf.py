@@ -0,0 +1,35 @@
+"""Configuração do gunicorn (Render): gunicorn -c gunicorn.conf.py app:app"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Workers gevent (padrão): cada historico aberto segura uma conexão em
+# /eventos (SSE) e, com greenlets, isso não ocupa uma thread do worker. Uma
+# requisição lenta (CSV grande, Neon acordando) também não trava as outras.
+# GUNICORN_WORKER_CLASS=gthread continua disponível: aí o pool do banco
+# (DB_POOL_SIZE + DB_MAX_OVERFLOW) deve ser >= threads.
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gevent")
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "0") == "1"
+
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "1000"))
+if worker_class == "gevent":
+    # O monkey patch é do próprio worker gevent, depois do fork e antes de
+    # importar o app. Com preload o app seria importado no master sem patch
+    # (locks e threads criados ali não viram greenlets): fica desligado.
+    preload_app = False
+elif worker_class == "gthread":
+    # /eventos segura a conexão aberta: no gthread cada tela ocupa uma
+    # thread, então o app limita as conexões para sobrar thread para o resto
+    os.environ.setdefault("EVENTOS_MAX_CONEXOES", str(max(threads // 2, 1)))
+
+
+def post_fork(server, worker):
+    # Com preload_app o master pode já ter criado o engine: cada worker começa
+    # com um pool vazio (o app também registra isso via os.register_at_fork).
+    if preload_app:
+        from barbearia.banco import descartar_engine_herdado
+
+        descartar_engine_herdado()
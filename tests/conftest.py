@@ -0,0 +1,62 @@
+"""Fixtures dos testes: o app num SQLite temporário (nunca o barbearia.db local).
+
+O pacote barbearia lê DATABASE_URL e afins no import, então o ambiente é
+montado antes de importá-lo (os testes o importam depois deste arquivo). Os testes compartilham o banco; cada um usa as próprias
+lojas/usuários para não depender da ordem.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+PASTA = tempfile.mkdtemp(prefix="barbearia_testes_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(PASTA, 'testes.db')}"
+os.environ["RELATORIOS_DIR"] = os.path.join(PASTA, "relatorios")
+os.environ["LOG_REQUISICOES"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SENHA = "teste"
+
+
+@pytest.fixture(scope="session")
+def barbearia():
+    import barbearia
+    from barbearia.schema import migrar_banco
+
+    migrar_banco()
+    return barbearia
+
+
+@pytest.fixture
+def usuario(barbearia):
+    """Cria um usuário (role/loja) e devolve um test client já logado."""
+    from barbearia.banco import get_engine
+    from barbearia.usuarios import usuario_salvar
+
+    def criar(nome, role="barbeiro", loja=None):
+        with get_engine().begin() as conn:
+            usuario_salvar(conn, nome, SENHA, role, loja=loja)
+        cliente = barbearia.app.test_client()
+        resposta = cliente.post("/login", data={"usuario": nome, "senha": SENHA})
+        assert resposta.status_code == 302, resposta.data
+        return cliente
+
+    return criar
+
+
+@pytest.fixture
+def venda(barbearia):
+    """Grava uma venda direto no banco (como o /registrar) e devolve o id."""
+    from barbearia.banco import get_engine
+    from barbearia.vendas import inserir_vendas, invalidar_cache_vendas, normalizar_venda
+
+    def gravar(loja, barbeiro="vini", cliente="Cliente Teste", total="40"):
+        dados = {"cliente": cliente, "barbeiro": barbeiro, "cabelo": total, "pagamento": "pix"}
+        v = normalizar_venda(dados, "admin", "teste", loja=loja)
+        with get_engine().begin() as conn:
+            inseridas = inserir_vendas(conn, [v])
+        invalidar_cache_vendas(inseridas)
+        return inseridas[0]["id"]
+
+    return gravar
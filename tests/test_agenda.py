@@ -0,0 +1,115 @@
+"""Agendamentos: disponibilidade, horário ocupado (409), cancelar e concluir."""
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from barbearia.agenda import AGENDA_DIAS_FECHADOS
+from barbearia.banco import TZ_BR, get_engine
+
+
+@pytest.fixture
+def dia(barbearia):
+    """Próximo dia (a partir de amanhã) em que a loja abre."""
+    d = datetime.now(TZ_BR).date() + timedelta(days=1)
+    while d.weekday() in AGENDA_DIAS_FECHADOS:
+        d += timedelta(days=1)
+    return d.isoformat()
+
+
+@pytest.fixture
+def agenda(request, usuario):
+    """(gerente, barbeiro, nome do barbeiro) numa loja só deste teste."""
+    loja = f"agenda_{request.node.name}"
+    nome = f"vini_{request.node.name}"
+    barbeiro = usuario(nome, loja=loja)
+    gerente = usuario(f"gerente_{request.node.name}", role="admin", loja=loja)
+    return gerente, barbeiro, nome
+
+
+def marcar(cliente, barbeiro, dia, hora, duracao=30, nome_cliente="Cliente Agenda"):
+    return cliente.post("/api/agendamentos", json={
+        "barbeiro": barbeiro, "cliente": nome_cliente, "data": dia, "hora": hora, "duracao": duracao,
+    })
+
+
+def test_mesmo_horario_duas_vezes_e_recusado(agenda, dia):
+    gerente, barbeiro, nome = agenda
+
+    assert marcar(barbeiro, nome, dia, "10:00").status_code == 201
+    assert marcar(gerente, nome, dia, "10:00").status_code == 409
+    # Sobreposição parcial também
+    assert marcar(gerente, nome, dia, "10:15").status_code == 409
+    assert marcar(gerente, nome, dia, "09:45").status_code == 409
+    # Encostado (começa quando o outro termina) pode
+    assert marcar(gerente, nome, dia, "10:30").status_code == 201
+
+    agendados = gerente.get(f"/api/agendamentos?data_inicio={dia}&data_fim={dia}").get_json()["agendamentos"]
+    assert len(agendados) == 2
+
+
+def test_disponibilidade_tira_o_horario_marcado(agenda, dia):
+    gerente, barbeiro, nome = agenda
+    marcar(barbeiro, nome, dia, "10:00")
+
+    livre = barbeiro.get(f"/api/agendamentos/disponibilidade?inicio={dia}&dias=1&duracao=30").get_json()
+    horarios = livre["barbeiros"][nome][dia]["horarios"]
+
+    assert "09:30" in horarios and "10:30" in horarios
+    assert not {"09:45", "10:00", "10:15"} & set(horarios)
+
+
+def test_cancelar_libera_o_horario(agenda, dia):
+    gerente, barbeiro, nome = agenda
+    agendamento = marcar(barbeiro, nome, dia, "14:00").get_json()
+
+    assert gerente.post(f"/api/agendamentos/{agendamento['id']}/cancelar").status_code == 200
+    assert gerente.post(f"/api/agendamentos/{agendamento['id']}/cancelar").status_code == 404
+    assert marcar(gerente, nome, dia, "14:00").status_code == 201
+
+
+def test_concluir_registra_a_venda_uma_vez(barbearia, agenda, dia):
+    gerente, barbeiro, nome = agenda
+    agendamento = marcar(barbeiro, nome, dia, "16:00", nome_cliente="Cliente Concluido").get_json()
+    servicos = {"cabelo": "40", "barba": "20", "pagamento": "pix"}
+
+    concluido = gerente.post(f"/api/agendamentos/{agendamento['id']}/concluir", json=servicos)
+    repetido = gerente.post(f"/api/agendamentos/{agendamento['id']}/concluir", json=servicos)
+
+    assert concluido.status_code == 200 and repetido.status_code == 404
+    with get_engine().connect() as conn:
+        vendas = conn.execute(text(
+            "SELECT id, barbeiro, total FROM vendas WHERE cliente = 'Cliente Concluido'"
+        )).all()
+    assert [(v.id, v.barbeiro, float(v.total)) for v in vendas] == [(concluido.get_json()["venda_id"], nome, 60.0)]
+
+
+def test_barbeiro_nao_agenda_para_outro(agenda, usuario, dia):
+    _, barbeiro, _ = agenda
+    usuario("artur_agenda_outro", loja="agenda_outra")
+
+    resposta = marcar(barbeiro, "artur_agenda_outro", dia, "11:00").get_json()
+
+    # barbeiro sempre agenda para si mesmo, qualquer que seja o enviado
+    assert resposta["barbeiro"] != "artur_agenda_outro"
+
+
+def test_pedidos_simultaneos_no_mesmo_horario_so_um_entra(request, agenda, usuario, dia):
+    gerente, barbeiro, nome = agenda
+    loja = f"agenda_{request.node.name}"
+    clientes = [barbeiro, gerente] + [usuario(f"gerente_{i}_{loja}", role="admin", loja=loja) for i in range(2)]
+    barreira = threading.Barrier(len(clientes))
+    respostas = []
+
+    def pedir(cliente):
+        barreira.wait()
+        respostas.append(marcar(cliente, nome, dia, "12:00").status_code)
+
+    threads = [threading.Thread(target=pedir, args=(c,)) for c in clientes]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(respostas) == [201, 409, 409, 409]
@@ -0,0 +1,74 @@
+"""/api/analytics: comparações MoM/YoY, percentis do ticket e médias móveis."""
+from datetime import datetime
+
+import pytest
+
+from barbearia.analytics import percentil_histograma
+from barbearia.banco import TZ_BR, get_engine
+from barbearia.vendas import inserir_vendas, normalizar_venda
+
+
+@pytest.fixture
+def gerente(request, barbearia, usuario):
+    loja = f"analytics_{request.node.name}"
+    # (data, cabelo, barba) -> total = cabelo + barba
+    vendas = [
+        ("2023-05-04", "115", "0"),                       # ano anterior (1 a 10/05/2023)
+        ("2024-04-02", "40", "0"), ("2024-04-08", "60", "0"),  # mês anterior (1 a 10/04)
+        ("2024-04-20", "50", "0"),                        # abril, fora da janela do MoM
+        ("2024-05-02", "20", "0"), ("2024-05-03", "30", "0"), ("2024-05-03", "30", "0"),
+        ("2024-05-06", "50", "0"), ("2024-05-09", "70", "30"),
+    ]
+    normalizadas = [
+        normalizar_venda(
+            {"cliente": "Analytics", "barbeiro": "vini", "cabelo": cabelo, "barba": barba, "pagamento": "pix"},
+            "admin", "teste", agora=datetime.fromisoformat(f"{data}T10:00").replace(tzinfo=TZ_BR),
+            loja=loja,
+        )
+        for data, cabelo, barba in vendas
+    ]
+    with get_engine().begin() as conn:
+        inserir_vendas(conn, normalizadas)
+    return usuario(f"gerente_{loja}", role="admin", loja=loja)
+
+
+def test_periodos_e_percentis_do_ticket(gerente):
+    resumo = gerente.get("/api/analytics?ate=2024-05-10&dias=10").get_json()
+    atual = resumo["periodos"]["mes_atual"]
+
+    # Tickets do mês: 20, 30, 30, 50, 100 (percentile_cont: interpolação linear)
+    assert (atual["total"], atual["qtd"], atual["ticket_medio"]) == (230.0, 5, 46.0)
+    assert atual["ticket_percentis"] == {"p25": 30.0, "p50": 30.0, "p75": 50.0, "p90": 80.0}
+    assert (atual["servicos"]["cabelo"], atual["servicos"]["barba"]) == (200.0, 30.0)
+
+    assert resumo["periodos"]["mes_anterior"]["total"] == 100.0
+    assert resumo["comparacoes"]["mes_anterior"]["total_pct"] == 130.0   # 230 / 100
+    assert resumo["comparacoes"]["mes_anterior"]["qtd_pct"] == 150.0     # 5 / 2
+    assert resumo["comparacoes"]["mes_anterior"]["ticket_medio_pct"] == -8.0  # 46 / 50
+    assert resumo["comparacoes"]["ano_anterior"]["total_pct"] == 100.0   # 230 / 115
+
+
+def test_meses_e_medias_moveis(gerente):
+    resumo = gerente.get("/api/analytics?ate=2024-05-10&dias=10").get_json()
+
+    meses = {m["mes"]: m for m in resumo["meses"]}
+    assert (meses["2024-04"]["total"], meses["2024-05"]["total"]) == (150.0, 230.0)
+    assert meses["2024-05"]["variacao_mes_pct"] == 53.3                 # 230 / 150
+    assert meses["2024-05"]["variacao_ano_pct"] == 100.0                # 230 / 115
+    assert meses["2024-03"]["variacao_mes_pct"] is None                 # base zero
+
+    dias = {d["data"]: d for d in resumo["dias"]}
+    assert len(dias) == 10
+    assert dias["2024-05-03"]["total"] == 60.0
+    # 04 a 10/05: 50 + 100 em 7 dias (os sem venda contam zero)
+    assert dias["2024-05-10"]["media_7d"] == round(150 / 7, 2)
+
+
+def test_percentil_histograma_igual_ao_percentile_cont(barbearia):
+    histograma = [(20.0, 1), (30.0, 2), (50.0, 1), (100.0, 1)]
+
+    assert [percentil_histograma(histograma, p) for p in (0, 0.25, 0.5, 0.9, 1)] == [
+        20.0, 30.0, 30.0, 80.0, 100.0
+    ]
+    assert percentil_histograma([(45.0, 1)], 0.9) == 45.0
+    assert percentil_histograma([], 0.5) is None
@@ -0,0 +1,59 @@
+"""Arquivo das vendas excluídas (vendas_arquivo) e o comando de partições."""
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from barbearia.banco import TZ_BR, get_engine
+from barbearia.particoes import garantir_particoes_dos_meses
+from barbearia.rollup import rollup_divergencias, rollup_somar_vendas
+from barbearia.vendas import inserir_vendas, normalizar_venda
+
+
+def venda_antiga(loja, cliente, excluida_em=None):
+    v = normalizar_venda(
+        {"cliente": cliente, "barbeiro": "vini", "cabelo": "40", "pagamento": "pix"},
+        "admin", "teste", agora=datetime(2024, 1, 15, 10, 0, tzinfo=TZ_BR), loja=loja,
+    )
+    with get_engine().begin() as conn:
+        venda_id = inserir_vendas(conn, [v])[0]["id"]
+        if excluida_em:
+            excluida = dict(v, id=venda_id)
+            conn.execute(text(
+                "UPDATE vendas SET deleted_at = :em, deleted_by = 'teste' WHERE id = :id"
+            ), {"em": excluida_em, "id": venda_id})
+            rollup_somar_vendas(conn, [excluida], sinal=-1)
+    return venda_id
+
+
+def onde_esta(venda_id):
+    with get_engine().connect() as conn:
+        em_vendas = conn.execute(text("SELECT COUNT(*) FROM vendas WHERE id = :id"), {"id": venda_id}).scalar()
+        no_arquivo = conn.execute(
+            text("SELECT COUNT(*) FROM vendas_arquivo WHERE id = :id"), {"id": venda_id}
+        ).scalar()
+    return {(1, 0): "vendas", (0, 1): "arquivo"}[(em_vendas, no_arquivo)]
+
+
+def test_arquivar_move_so_as_excluidas_ha_tempo(barbearia):
+    ativa = venda_antiga("loja_arquivo", "Ativa")
+    antiga = venda_antiga("loja_arquivo", "Excluida Antiga", excluida_em="2024-01-20 12:00:00")
+    recente = venda_antiga("loja_arquivo", "Excluida Agora",
+                           excluida_em=datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"))
+
+    resultado = barbearia.app.test_cli_runner().invoke(args=["vendas", "arquivar", "--excluidas-ha", "30"])
+
+    assert resultado.exit_code == 0, resultado.output
+    assert (onde_esta(ativa), onde_esta(antiga), onde_esta(recente)) == (
+        "vendas", "arquivo", "vendas"
+    )
+    with get_engine().connect() as conn:
+        assert rollup_divergencias(conn) == []
+
+
+def test_particoes_so_no_postgres(barbearia):
+    resultado = barbearia.app.test_cli_runner().invoke(args=["vendas", "particoes"])
+
+    assert resultado.exit_code != 0
+    assert "só existem no Postgres" in resultado.output
+    # A importação chama antes de cada lote: no SQLite não faz nada
+    assert garantir_particoes_dos_meses([datetime(2031, 5, 1).date()]) is None
@@ -0,0 +1,96 @@
+"""Cache de resumos (totais do /historico) e sua invalidação."""
+import re
+import time
+
+from sqlalchemy import event
+
+from barbearia.banco import get_engine
+from barbearia.cache import cache_resumos
+from barbearia.vendas import inserir_vendas, normalizar_venda
+
+
+def total_dia(resposta):
+    return re.search(rb'id="total-dia"[^>]*>R\$ ([\d.]+)', resposta.data).group(1).decode()
+
+
+def total_mes(resposta):
+    return re.search(rb'R\$ ([\d.]+)', resposta.data).group(1).decode()
+
+
+def consultas_em(cliente, url):
+    """Quantos comandos SQL o GET faz."""
+    consultas = []
+
+    def anotar(conn, cursor, statement, parameters, context, executemany):
+        consultas.append(statement)
+
+    event.listen(get_engine(), "before_cursor_execute", anotar)
+    try:
+        assert cliente.get(url).status_code == 200
+    finally:
+        event.remove(get_engine(), "before_cursor_execute", anotar)
+    return len(consultas)
+
+
+def gravar_sem_invalidar(loja):
+    """Venda gravada por "outro worker": o cache em memória deste não fica sabendo."""
+    v = normalizar_venda({"cliente": "Outro Worker", "cabelo": "25", "pagamento": "pix"},
+                                   "admin", "vini", loja=loja)
+    with get_engine().begin() as conn:
+        inserir_vendas(conn, [v])
+
+
+def test_quem_gravou_nao_le_o_cache_de_outro_worker(barbearia, usuario, venda):
+    gerente = usuario("gerente_cache_1", role="admin", loja="loja_cache_1")
+    venda("loja_cache_1", total="40")
+    assert total_dia(gerente.get("/historico")) == "40.00"
+
+    gravar_sem_invalidar("loja_cache_1")
+    with gerente.session_transaction() as sessao:
+        sessao["gravou_em"] = time.time()
+
+    assert total_dia(gerente.get("/historico")) == "65.00"
+
+
+def test_sem_gravar_o_cache_vale_ate_o_ttl(barbearia, usuario, venda):
+    gerente = usuario("gerente_cache_2", role="admin", loja="loja_cache_2")
+    venda("loja_cache_2", total="40")
+    assert total_dia(gerente.get("/historico")) == "40.00"
+
+    gravar_sem_invalidar("loja_cache_2")
+
+    assert total_dia(gerente.get("/historico")) == "40.00"
+
+
+def test_resumo_com_cache_quente_nao_vai_ao_banco(barbearia, usuario, venda):
+    gerente = usuario("gerente_cache_3", role="admin", loja="loja_cache_3")
+    venda("loja_cache_3")
+
+    assert consultas_em(gerente, "/resumo_mes") > 0
+    assert consultas_em(gerente, "/resumo_mes") == 0
+    assert consultas_em(gerente, "/api/analytics") > 0
+    assert consultas_em(gerente, "/api/analytics") == 0
+
+
+def test_venda_registrada_invalida_o_resumo_de_quem_ja_tinha_lido(barbearia, usuario, venda):
+    gerente = usuario("gerente_cache_4", role="admin", loja="loja_cache_4")
+    barbeiro = usuario("vini_cache_4", loja="loja_cache_4")
+    venda("loja_cache_4", total="40")
+    assert total_mes(gerente.get("/resumo_mes")) == "40.00"
+
+    resposta = barbeiro.post("/registrar", data={"cliente": "Nova", "cabelo": "35", "pagamento": "pix"})
+    assert resposta.status_code == 302
+
+    # O gerente não gravou nada: o valor novo vem da invalidação
+    assert total_mes(gerente.get("/resumo_mes")) == "75.00"
+    assert cache_resumos.stats()["invalidacoes"] > 0
+
+
+def test_venda_de_outra_loja_nao_invalida(barbearia, usuario, venda):
+    gerente = usuario("gerente_cache_5", role="admin", loja="loja_cache_5")
+    venda("loja_cache_5")
+    gerente.get("/resumo_mes")
+
+    venda("loja_cache_6")
+
+    assert consultas_em(gerente, "/resumo_mes") == 0
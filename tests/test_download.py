@@ -0,0 +1,71 @@
+"""/download nos formatos do histórico (CSV, CSV.gz, dados.gz, Parquet)."""
+import csv
+import gzip
+import io
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from barbearia.banco import TZ_BR, get_engine
+from barbearia.vendas import inserir_vendas, normalizar_venda
+
+
+def test_link_parquet_so_aparece_com_pyarrow(barbearia, usuario, monkeypatch):
+    dono = usuario("dono_download", role="admin")
+
+    monkeypatch.setattr("barbearia.rotas.pyarrow_disponivel", lambda: False)
+    assert b"formato=parquet" not in dono.get("/historico").data
+
+    monkeypatch.setattr("barbearia.rotas.pyarrow_disponivel", lambda: True)
+    assert b"formato=parquet" in dono.get("/historico").data
+
+
+def baixar(cliente, formato):
+    resposta = cliente.get(f"/download?data_inicio=2024-07-01&data_fim=2024-07-31&formato={formato}")
+    assert resposta.status_code == 200, resposta.data
+    return resposta.data
+
+
+@pytest.fixture
+def gerente(barbearia, usuario, monkeypatch):
+    # Lotes pequenos: o gzip recebe vários pedaços
+    monkeypatch.setattr("barbearia.rotas.DOWNLOAD_LOTE", 2)
+    clientes = ["João, o \"Zé\"", "Ana Lúcia", "Pedro", "Márcia", "Otávio"]
+    vendas = [
+        normalizar_venda(
+            {"cliente": nome, "barbeiro": "vini", "cabelo": "40", "barba": "12.5",
+             "desconto": "2.25", "pagamento": "pix"},
+            "admin", "teste", agora=datetime(2024, 7, i + 1, 10, 0, tzinfo=TZ_BR), loja="loja_download",
+        )
+        for i, nome in enumerate(clientes)
+    ]
+    with get_engine().begin() as conn:
+        inserir_vendas(conn, vendas)
+    return usuario("gerente_download_2", role="admin", loja="loja_download")
+
+
+def test_csv_gz_e_o_mesmo_csv_comprimido(gerente):
+    assert gzip.decompress(baixar(gerente, "csv.gz")) == baixar(gerente, "csv")
+
+
+def test_dados_gz_volta_as_linhas_com_tipos(barbearia, gerente):
+    linhas = list(csv.DictReader(io.StringIO(gzip.decompress(baixar(gerente, "dados.gz")).decode("utf-8"))))
+
+    assert gzip.decompress(baixar(gerente, "dados.gz")) == baixar(gerente, "dados")
+    with get_engine().connect() as conn:
+        banco = conn.execute(text(
+            "SELECT id, data, cliente, total FROM vendas WHERE loja = 'loja_download' ORDER BY id"
+        )).all()
+    assert sorted((int(r["id"]), r["data"], r["cliente"], float(r["total"])) for r in linhas) == [
+        (b.id, str(b.data)[:10], b.cliente, float(b.total)) for b in banco
+    ]
+    assert {r["desconto"] for r in linhas} == {"2.25"}
+
+
+def test_parquet_sem_pyarrow_responde_501(barbearia, gerente, monkeypatch):
+    monkeypatch.setattr("barbearia.rotas.pyarrow_disponivel", lambda: False)
+
+    resposta = gerente.get("/download?data_inicio=2024-07-01&data_fim=2024-07-31&formato=parquet")
+
+    assert resposta.status_code == 501
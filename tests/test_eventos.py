@@ -0,0 +1,93 @@
+"""GET /eventos (SSE): vendas novas/excluídas e totais para cada tela."""
+import json
+
+import pytest
+from sqlalchemy import text
+
+from barbearia.banco import executar_nativo, get_engine, gevent_ativo
+from barbearia.eventos import canal_eventos
+
+
+@pytest.fixture(autouse=True)
+def heartbeat_curto(barbearia, monkeypatch):
+    # Sem evento, o próximo pedaço do stream é o ": ping" (e não uma espera de 15 s)
+    monkeypatch.setattr("barbearia.eventos.EVENTOS_HEARTBEAT", 0.05)
+
+
+class Stream:
+    """Lê o /eventos pedaço a pedaço (o test client não tem threads)."""
+
+    def __init__(self, cliente):
+        self.resposta = cliente.get("/eventos", buffered=False)
+        assert self.resposta.status_code == 200
+        self.partes = iter(self.resposta.response)
+        assert next(self.partes).startswith(b"retry:")
+
+    def proximo(self):
+        """(tipo, dados) do próximo evento, ou None se veio só o heartbeat."""
+        parte = next(self.partes).decode("utf-8")
+        if parte.startswith(": ping"):
+            return None
+        tipo, dados = parte.strip().split("\n")
+        return tipo.removeprefix("event: "), json.loads(dados.removeprefix("data: "))
+
+    def fechar(self):
+        self.resposta.close()
+
+
+def test_barbeiro_recebe_a_propria_venda_com_totais(barbearia, usuario):
+    vini = usuario("vini_eventos", loja="loja_eventos")
+    stream = Stream(vini)
+    try:
+        vini.post("/registrar", data={"cliente": "Ao Vivo", "cabelo": "45", "pagamento": "pix"})
+        tipo, dados = stream.proximo()
+    finally:
+        stream.fechar()
+
+    assert tipo == "nova"
+    assert [v["cliente"] for v in dados["vendas"]] == ["Ao Vivo"]
+    assert (dados["totais"]["dia"], dados["totais"]["mes"]) == (45.0, 45.0)
+
+
+def test_venda_de_outra_loja_nao_chega(barbearia, usuario, venda):
+    gerente = usuario("gerente_eventos", role="admin", loja="loja_eventos_2")
+    outro = usuario("gerente_eventos_3", role="admin", loja="loja_eventos_3")
+    stream = Stream(gerente)
+    try:
+        outro.post("/registrar", data={"cliente": "Outra Loja", "barbeiro": "vini", "cabelo": "30",
+                                       "pagamento": "pix"})
+        assert stream.proximo() is None
+    finally:
+        stream.fechar()
+
+
+def test_exclusao_chega_como_excluida(barbearia, usuario, venda):
+    gerente = usuario("gerente_eventos_4", role="admin", loja="loja_eventos_4")
+    venda_id = venda("loja_eventos_4")
+    with get_engine().connect() as conn:
+        data = conn.execute(text("SELECT data FROM vendas WHERE id = :id"), {"id": venda_id}).scalar()
+    stream = Stream(gerente)
+    try:
+        gerente.post(f"/venda/{venda_id}/excluir", data={"data": str(data)[:10]})
+        tipo, dados = stream.proximo()
+    finally:
+        stream.fechar()
+
+    assert tipo == "excluida"
+    assert [v["id"] for v in dados["vendas"]] == [venda_id]
+
+
+def test_limite_de_conexoes_por_worker(barbearia, usuario, monkeypatch):
+    monkeypatch.setattr("barbearia.eventos.EVENTOS_MAX_CONEXOES", 1)
+    gerente = usuario("gerente_eventos_5", role="admin", loja="loja_eventos_5")
+    stream = Stream(gerente)
+    try:
+        assert gerente.get("/eventos", buffered=False).status_code == 503
+    finally:
+        stream.fechar()
+    assert canal_eventos.conexoes() == 0
+
+
+def test_executar_nativo_sem_gevent_roda_na_hora(barbearia):
+    assert not gevent_ativo()
+    assert executar_nativo(sum, [1, 2, 3]) == 6
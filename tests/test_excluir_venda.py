@@ -0,0 +1,72 @@
+"""Exclusão de vendas (POST /venda/<id>/excluir)."""
+from sqlalchemy import text
+
+from barbearia.banco import get_engine
+
+
+def ativa(venda_id):
+    with get_engine().connect() as conn:
+        return conn.execute(
+            text("SELECT deleted_at IS NULL FROM vendas WHERE id = :id"), {"id": venda_id}
+        ).scalar() == 1
+
+
+def excluir(cliente, venda_id, data=None):
+    if data is None:
+        with get_engine().connect() as conn:
+            data = conn.execute(
+                text("SELECT data FROM vendas WHERE id = :id"), {"id": venda_id}
+            ).scalar()
+    return cliente.post(f"/venda/{venda_id}/excluir", data={"data": str(data)[:10]})
+
+
+def test_admin_de_loja_exclui_venda_da_loja(barbearia, usuario, venda):
+    gerente = usuario("gerente_excluir", role="admin", loja="loja_excluir")
+    venda_id = venda("loja_excluir")
+
+    resposta = excluir(gerente, venda_id)
+
+    assert resposta.status_code == 302
+    assert not ativa(venda_id)
+
+
+def test_admin_de_loja_nao_exclui_venda_de_outra_loja(barbearia, usuario, venda):
+    gerente = usuario("gerente_excluir_2", role="admin", loja="loja_excluir_2")
+    venda_id = venda("outra_loja_excluir")
+
+    resposta = excluir(gerente, venda_id)
+
+    assert resposta.status_code == 302
+    assert ativa(venda_id)
+
+
+def test_admin_de_todas_as_lojas_exclui(barbearia, usuario, venda):
+    dono = usuario("dono_excluir", role="admin")
+    venda_id = venda("loja_excluir_3")
+
+    assert excluir(dono, venda_id).status_code == 302
+    assert not ativa(venda_id)
+
+
+def test_barbeiro_nao_exclui(barbearia, usuario, venda):
+    barbeiro = usuario("barbeiro_excluir", loja="loja_excluir_4")
+    venda_id = venda("loja_excluir_4", barbeiro="barbeiro_excluir")
+
+    assert excluir(barbeiro, venda_id).status_code == 403
+    assert ativa(venda_id)
+
+
+def test_exclusao_com_data_errada_nao_acha_a_venda(barbearia, usuario, venda):
+    dono = usuario("dono_excluir_data", role="admin")
+    venda_id = venda("loja_excluir_5")
+
+    assert excluir(dono, venda_id, data="2000-01-01").status_code == 302
+    assert ativa(venda_id)
+
+
+def test_exclusao_sem_data_e_recusada(barbearia, usuario, venda):
+    dono = usuario("dono_excluir_sem_data", role="admin")
+    venda_id = venda("loja_excluir_6")
+
+    assert dono.post(f"/venda/{venda_id}/excluir").status_code == 400
+    assert ativa(venda_id)
@@ -0,0 +1,48 @@
+"""/historico: quantas consultas cada renderização faz (e o que mostra)."""
+import contextlib
+
+import pytest
+from sqlalchemy import event
+
+from barbearia.banco import get_engine
+
+
+@contextlib.contextmanager
+def contar_consultas():
+    """Lista com o SQL de cada comando executado no banco dentro do bloco."""
+    consultas = []
+
+    def anotar(conn, cursor, statement, parameters, context, executemany):
+        consultas.append(statement)
+
+    event.listen(get_engine(), "before_cursor_execute", anotar)
+    try:
+        yield consultas
+    finally:
+        event.remove(get_engine(), "before_cursor_execute", anotar)
+
+
+@pytest.fixture
+def gerente(barbearia, usuario, venda):
+    for i in range(5):
+        venda("loja_historico", cliente=f"Cliente Historico {i}")
+    return usuario("gerente_historico", role="admin", loja="loja_historico")
+
+
+def test_historico_uma_consulta(barbearia, gerente):
+    with contar_consultas() as consultas:
+        resposta = gerente.get("/historico")
+
+    assert resposta.status_code == 200
+    assert b"Cliente Historico 4" in resposta.data
+    # totais do dia/mês e linhas filtradas numa ida só ao banco
+    assert len(consultas) == 1, consultas
+
+
+def test_historico_sem_vendas_no_filtro_uma_consulta(barbearia, gerente):
+    with contar_consultas() as consultas:
+        resposta = gerente.get("/historico?data_inicio=2001-01-01&data_fim=2001-01-31")
+
+    assert resposta.status_code == 200
+    assert b"Cliente Historico" not in resposta.data
+    assert len(consultas) == 1, consultas
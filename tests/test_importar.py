@@ -0,0 +1,74 @@
+"""flask vendas importar: arquivos ilegíveis e lotes recusados viram erro com a linha."""
+import pytest
+from sqlalchemy import text
+
+from barbearia.banco import get_engine
+from barbearia.importacao import carregar_vendas_importadas
+
+CABECALHO = "Data,Hora,Cliente,Barbeiro,Cabelo,Barba,Sobrancelha,Desconto,Valor Final\n"
+
+
+def linha(i, cliente):
+    return f"24/09/2025,10:00,{cliente} {i},vini,40.0,0.0,0.0,0.0,40.0\n"
+
+
+@pytest.fixture
+def importar(barbearia):
+    def rodar(caminho, lote=2):
+        return barbearia.app.test_cli_runner().invoke(
+            args=["vendas", "importar", str(caminho), "--lote", str(lote)]
+        )
+
+    return rodar
+
+
+def importadas(cliente):
+    with get_engine().connect() as conn:
+        return conn.execute(
+            text("SELECT COUNT(*) FROM vendas WHERE cliente LIKE :c"), {"c": f"{cliente} %"}
+        ).scalar()
+
+
+def test_arquivo_em_latin1(barbearia, importar, tmp_path):
+    caminho = tmp_path / "latin1.csv"
+    caminho.write_bytes((CABECALHO + linha(1, "Latin1") + "24/09/2025,10:00,João,vini,40,0,0,0,40\n").encode("latin-1"))
+
+    resultado = importar(caminho)
+
+    assert resultado.exit_code == 1
+    assert "latin1.csv, linha 3: não está em UTF-8" in resultado.output
+    assert "Nenhuma linha foi gravada" in resultado.output
+    assert importadas("Latin1") == 0
+
+
+def test_csv_quebrado_informa_a_linha_e_descarta_o_lote(barbearia, importar, tmp_path):
+    caminho = tmp_path / "quebrado.csv"
+    # Lotes de 2: as linhas 2 e 3 entram, a 5 estoura o limite de campo do csv
+    caminho.write_text(CABECALHO + linha(1, "Quebrado") + linha(2, "Quebrado") + linha(3, "Quebrado")
+                       + f'"{"x" * 200_000}"\n' + linha(5, "Quebrado"))
+
+    resultado = importar(caminho)
+
+    assert resultado.exit_code == 1
+    assert "quebrado.csv, linha 5: CSV inválido" in resultado.output
+    assert "linhas 2 a 3 já estão no banco" in resultado.output
+    assert "Traceback" not in resultado.output
+    assert importadas("Quebrado") == 2
+
+
+def test_lote_recusado_pelo_banco(barbearia, importar, tmp_path, monkeypatch):
+    caminho = tmp_path / "recusado.csv"
+    caminho.write_text(CABECALHO + linha(1, "Recusado") + linha(2, "Recusado") + linha(3, "Recusado"))
+    original = carregar_vendas_importadas
+
+    def recusar_segundo_lote(conn, linhas):
+        if linhas[0][2] == "Recusado 3":
+            raise ValueError("valor fora da faixa")
+        original(conn, linhas)
+
+    monkeypatch.setattr("barbearia.importacao.carregar_vendas_importadas", recusar_segundo_lote)
+    resultado = importar(caminho)
+
+    assert resultado.exit_code == 1
+    assert "linhas 4 a 4: o banco recusou o lote (valor fora da faixa)" in resultado.output
+    assert importadas("Recusado") == 2
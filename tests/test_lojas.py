@@ -0,0 +1,65 @@
+"""Filiais: admin de uma loja só enxerga (e grava) a loja dele."""
+import pytest
+from sqlalchemy import text
+
+from barbearia.banco import get_engine
+
+
+@pytest.fixture
+def lojas(request, venda):
+    """Duas lojas só deste teste, com uma venda em cada; devolve (norte, sul)."""
+    norte, sul = f"norte_{request.node.name}", f"sul_{request.node.name}"
+    venda(norte, cliente="Cliente Norte", total="40")
+    venda(sul, cliente="Cliente Sul", total="70")
+    return norte, sul
+
+
+def test_admin_de_loja_nao_ve_outra_nem_pedindo(barbearia, usuario, lojas):
+    norte, sul = lojas
+    gerente = usuario("gerente_norte", role="admin", loja=norte)
+
+    for url in ("/historico", f"/historico?loja={sul}", f"/historico?periodo=tudo&loja={sul}"):
+        pagina = gerente.get(url).data
+        assert b"Cliente Norte" in pagina and b"Cliente Sul" not in pagina, url
+
+    resumo = gerente.get(f"/resumo_mes?loja={sul}").data
+    assert b"R$ 40.00" in resumo and b"R$ 70.00" not in resumo
+    csv = gerente.get(f"/download?loja={sul}").data.decode("utf-8")
+    assert "Cliente Norte" in csv and "Cliente Sul" not in csv
+
+
+def test_admin_de_loja_grava_sempre_na_loja_dele(barbearia, usuario, lojas):
+    norte, sul = lojas
+    gerente = usuario("gerente_norte_2", role="admin", loja=norte)
+
+    gerente.post("/registrar", data={"cliente": "Tentou o Sul", "barbeiro": "vini", "cabelo": "30",
+                                     "pagamento": "pix", "loja": sul})
+
+    with get_engine().connect() as conn:
+        loja = conn.execute(text("SELECT loja FROM vendas WHERE cliente = 'Tentou o Sul'")).scalar()
+    assert loja == norte
+
+
+def test_admin_de_loja_nao_exclui_nem_le_venda_de_outra(barbearia, usuario, venda):
+    gerente = usuario("gerente_norte_3", role="admin", loja="loja_norte")
+    do_sul = venda("loja_sul", cliente="Cliente Sul Excluir")
+
+    sync = gerente.get("/api/vendas/sync?loja=loja_sul")
+    assert sync.status_code == 200
+    assert b"Cliente Sul Excluir" not in sync.data
+    with get_engine().connect() as conn:
+        data = conn.execute(text("SELECT data FROM vendas WHERE id = :id"), {"id": do_sul}).scalar()
+    gerente.post(f"/venda/{do_sul}/excluir", data={"data": str(data)[:10]})
+    with get_engine().connect() as conn:
+        assert conn.execute(text("SELECT deleted_at FROM vendas WHERE id = :id"), {"id": do_sul}).scalar() is None
+
+
+def test_admin_de_todas_escolhe_a_loja(barbearia, usuario, lojas):
+    _, sul = lojas
+    dono = usuario("dono_lojas", role="admin")
+
+    pagina = dono.get(f"/historico?loja={sul}").data
+    assert b"Cliente Sul" in pagina and b"Cliente Norte" not in pagina
+
+    todas = dono.get("/historico").data
+    assert b"Cliente Sul" in todas and b"Cliente Norte" in todas
@@ -0,0 +1,63 @@
+"""POST /api/vendas/lote: fila offline com idempotency_key."""
+import uuid
+
+from sqlalchemy import text
+
+from barbearia.banco import get_engine
+
+
+def item(chave, cliente="Cliente Lote", **extra):
+    return {"cliente": cliente, "barbeiro": "vini", "cabelo": "40", "pagamento": "pix",
+            "idempotency_key": chave, **extra}
+
+
+def gravadas(loja):
+    with get_engine().connect() as conn:
+        return conn.execute(
+            text("SELECT COUNT(*) FROM vendas WHERE loja = :loja"), {"loja": loja}
+        ).scalar()
+
+
+def test_reenvio_com_a_mesma_chave_nao_grava_de_novo(barbearia, usuario):
+    gerente = usuario("gerente_lote", role="admin", loja="loja_lote")
+    lote = {"vendas": [item(uuid.uuid4().hex), item(uuid.uuid4().hex)]}
+
+    primeira = gerente.post("/api/vendas/lote", json=lote).get_json()
+    segunda = gerente.post("/api/vendas/lote", json=lote).get_json()
+
+    assert (primeira["inseridas"], primeira["duplicadas"]) == (2, 0)
+    assert (segunda["inseridas"], segunda["duplicadas"]) == (0, 2)
+    assert gravadas("loja_lote") == 2
+
+
+def test_chave_repetida_no_mesmo_lote_conta_uma_vez(barbearia, usuario):
+    gerente = usuario("gerente_lote_2", role="admin", loja="loja_lote_2")
+    chave = uuid.uuid4().hex
+
+    resposta = gerente.post("/api/vendas/lote", json={"vendas": [item(chave), item(chave)]}).get_json()
+
+    assert resposta["inseridas"] == 1
+    assert gravadas("loja_lote_2") == 1
+
+
+def test_lote_com_venda_invalida_nao_grava_nada(barbearia, usuario):
+    gerente = usuario("gerente_lote_3", role="admin", loja="loja_lote_3")
+    lote = {"vendas": [item(uuid.uuid4().hex), item(None)]}
+
+    resposta = gerente.post("/api/vendas/lote", json=lote)
+
+    assert resposta.status_code == 400
+    assert resposta.get_json()["erros"][0]["indice"] == 1
+    assert gravadas("loja_lote_3") == 0
+
+
+def test_lote_offline_guarda_data_e_hora_enviadas(barbearia, usuario):
+    gerente = usuario("gerente_lote_4", role="admin", loja="loja_lote_4")
+    lote = {"vendas": [item(uuid.uuid4().hex, data="2024-05-02", hora="09:15")]}
+
+    assert gerente.post("/api/vendas/lote", json=lote).get_json()["inseridas"] == 1
+    with get_engine().connect() as conn:
+        data, hora = conn.execute(
+            text("SELECT data, hora FROM vendas WHERE loja = 'loja_lote_4'")
+        ).one()
+    assert (str(data)[:10], hora) == ("2024-05-02", "09:15")
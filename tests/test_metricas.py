@@ -0,0 +1,39 @@
+"""Tempo de SQL por requisição (eventos before/after_cursor_execute)."""
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from barbearia.banco import get_engine
+
+
+def test_statement_que_falha_nao_sobra_para_o_proximo(barbearia):
+    with barbearia.app.test_request_context("/"):
+        g.metricas = {"inicio": 0.0, "sql_qtd": 0, "sql_s": 0.0}
+        with get_engine().connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM tabela_que_nao_existe"))
+            conn.rollback()
+            conn.execute(text("SELECT 1"))
+
+            assert "sql_inicio" not in conn.info
+        assert g.metricas["sql_qtd"] == 1
+
+
+def test_metrics_sem_token_so_responde_para_localhost(barbearia, monkeypatch):
+    monkeypatch.setattr("barbearia.monitoramento.METRICS_TOKEN", None)
+    cliente = barbearia.app.test_client()
+
+    assert cliente.get("/metrics").status_code == 200
+    assert cliente.get("/metrics", environ_base={"REMOTE_ADDR": "10.0.0.7"}).status_code == 403
+    assert cliente.get("/metrics", headers={"X-Forwarded-For": "10.0.0.7"}).status_code == 403
+
+
+def test_metrics_com_token_exige_bearer(barbearia, monkeypatch):
+    monkeypatch.setattr("barbearia.monitoramento.METRICS_TOKEN", "segredo")
+    cliente = barbearia.app.test_client()
+
+    assert cliente.get("/metrics").status_code == 403
+    resposta = cliente.get("/metrics", headers={"Authorization": "Bearer segredo"},
+                           environ_base={"REMOTE_ADDR": "10.0.0.7"})
+    assert resposta.status_code == 200
@@ -0,0 +1,97 @@
+"""Outbox local (OUTBOX_PATH): envio em lote, venda recusada e filtro do historico."""
+import uuid
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from barbearia.banco import get_engine
+from barbearia.outbox import OutboxLocal
+from barbearia.vendas import inserir_vendas, normalizar_venda
+
+
+@pytest.fixture
+def outbox(barbearia, tmp_path):
+    """Um outbox sem a thread de envio: o teste chama enviar_lote."""
+    ob = OutboxLocal(str(tmp_path / "outbox.db"))
+    ob.iniciar = lambda: None
+    return ob
+
+
+def nova_venda(loja, barbeiro="vini", data=None):
+    v = normalizar_venda(
+        {"cliente": "Cliente Outbox", "barbeiro": barbeiro, "cabelo": "40", "pagamento": "pix",
+         "idempotency_key": uuid.uuid4().hex},
+        "admin", "teste", loja=loja,
+    )
+    if data:
+        v["data"] = data
+    return v
+
+
+def gravadas(loja):
+    with get_engine().connect() as conn:
+        return conn.execute(
+            text("SELECT COUNT(*) FROM vendas WHERE loja = :loja"), {"loja": loja}
+        ).scalar()
+
+
+def test_venda_recusada_nao_trava_o_lote(barbearia, outbox, monkeypatch):
+    monkeypatch.setattr("barbearia.outbox.OUTBOX_TENTATIVAS_MAX", 2)
+    for _ in range(3):
+        outbox.acrescentar(nova_venda("loja_outbox"))
+    # A do meio ficou com um JSON que inserir_vendas não aceita
+    outbox._db().execute("UPDATE outbox SET venda = json_remove(venda, '$.cliente') WHERE seq = 2")
+
+    assert outbox.enviar_lote() == 2
+    assert gravadas("loja_outbox") == 2
+    assert [v["seq"] for v in outbox.pendentes()] == [2]
+
+    # Na segunda recusa (OUTBOX_TENTATIVAS_MAX) sai para outbox_falhas
+    assert outbox.enviar_lote() == 1
+    assert outbox.quantidade() == 0
+    assert outbox.quantidade_falhas() == 1
+
+
+def test_banco_fora_nao_conta_tentativa(barbearia, outbox, monkeypatch):
+    outbox.acrescentar(nova_venda("loja_outbox_2"))
+
+    def banco_fora(conn, vendas):
+        raise OperationalError("INSERT", {}, Exception("conexão recusada"))
+
+    monkeypatch.setattr("barbearia.outbox.inserir_vendas", banco_fora)
+    with pytest.raises(OperationalError):
+        outbox.enviar_lote()
+
+    assert outbox.quantidade() == 1
+    assert outbox._db().execute("SELECT tentativas FROM outbox").fetchone()[0] == 0
+
+
+def test_pendentes_filtra_no_sql(barbearia, outbox):
+    hoje = date.today()
+    outbox.acrescentar(nova_venda("loja_a", "vini"))
+    outbox.acrescentar(nova_venda("loja_a", "artur"))
+    outbox.acrescentar(nova_venda("loja_b", "vini"))
+    outbox.acrescentar(nova_venda("loja_a", "vini", data=hoje - timedelta(days=90)))
+
+    assert len(outbox.pendentes(loja="loja_a")) == 3
+    assert len(outbox.pendentes(loja="loja_a", barbeiro="vini")) == 2
+    assert len(outbox.pendentes(loja="loja_a", desde=hoje - timedelta(days=30))) == 2
+
+
+
+def test_historico_nao_conta_duas_vezes_a_venda_ja_gravada(barbearia, outbox, usuario, monkeypatch):
+    monkeypatch.setattr("barbearia.outbox.local", outbox)
+    gerente = usuario("gerente_outbox", role="admin", loja="loja_outbox_3")
+    enviada, pendente = nova_venda("loja_outbox_3"), nova_venda("loja_outbox_3")
+    outbox.acrescentar(enviada)
+    outbox.acrescentar(pendente)
+    # Lote gravado, mas o outbox ainda não foi limpo (ou caiu bem nessa hora)
+    with get_engine().begin() as conn:
+        inserir_vendas(conn, [dict(enviada)])
+
+    resposta = gerente.get("/historico")
+
+    assert b'id="total-dia" style="color:green; font-weight:bold;">R$ 80.00' in resposta.data
+    assert resposta.data.count(b"Cliente Outbox") == 2
@@ -0,0 +1,65 @@
+"""/historico: paginação por chave (data, hora, id) e "Todo o período" do admin."""
+import html
+import re
+from datetime import datetime
+
+import pytest
+
+from barbearia.banco import TZ_BR, get_engine
+from barbearia.vendas import inserir_vendas, normalizar_venda
+
+
+@pytest.fixture
+def gerente(barbearia, usuario, monkeypatch):
+    monkeypatch.setattr("barbearia.rotas.HISTORICO_POR_PAGINA", 3)
+    # 7 vendas antigas; 2 a 4 no mesmo minuto (o id desempata)
+    horarios = [(3, 9), (3, 10), (5, 14), (5, 14), (5, 14), (20, 8), (28, 18)]
+    vendas = [
+        normalizar_venda(
+            {"cliente": f"Pagina {i}", "barbeiro": "vini", "cabelo": "40", "pagamento": "pix"},
+            "admin", "teste", agora=datetime(2024, 2, dia, hora, 0, tzinfo=TZ_BR), loja="loja_paginas",
+        )
+        for i, (dia, hora) in enumerate(horarios)
+    ]
+    with get_engine().begin() as conn:
+        inserir_vendas(conn, vendas)
+    return usuario("gerente_paginas", role="admin", loja="loja_paginas")
+
+
+def clientes(resposta):
+    return [int(n) for n in re.findall(rb"Pagina (\d+)", resposta.data)]
+
+
+def link(resposta, texto):
+    achado = re.search(rf'href="([^"]+)">{texto}'.encode(), resposta.data)
+    return html.unescape(achado.group(1).decode()) if achado else None
+
+
+def test_paginas_cobrem_o_periodo_sem_repetir(gerente):
+    resposta = gerente.get("/historico?periodo=tudo")
+    assert b"<b>7</b> venda(s) em todo o per" in resposta.data
+
+    paginas = [clientes(resposta)]
+    while link(resposta, "Próximas"):
+        resposta = gerente.get(link(resposta, "Próximas"))
+        paginas.append(clientes(resposta))
+
+    assert paginas == [[6, 5, 4], [3, 2, 1], [0]]
+
+    # E de volta pela página anterior
+    resposta = gerente.get(link(resposta, "&laquo; Anteriores"))
+    assert clientes(resposta) == [3, 2, 1]
+
+
+def test_filtro_do_dia_nao_mostra_as_antigas(gerente):
+    assert clientes(gerente.get("/historico")) == []
+    assert clientes(gerente.get("/historico?data_inicio=2024-02-05&data_fim=2024-02-05")) == [4, 3, 2]
+
+
+def test_todo_periodo_e_so_do_admin(barbearia, usuario, venda):
+    barbeiro = usuario("vini_paginas", loja="loja_paginas_2")
+    venda("loja_paginas_2", barbeiro="vini_paginas", cliente="Pagina 9")
+
+    resposta = barbeiro.get("/historico?periodo=tudo")
+
+    assert b"em todo o per" not in resposta.data
@@ -0,0 +1,67 @@
+"""Relatórios em segundo plano (POST /relatorios, status e arquivo)."""
+import time
+from datetime import datetime
+
+from barbearia.banco import TZ_BR, get_engine
+from barbearia.vendas import inserir_vendas, invalidar_cache_vendas, normalizar_venda
+
+
+def esperar(cliente, job):
+    """Consulta o status até o job sair da fila (ou falhar o teste)."""
+    for _ in range(100):
+        if job["status"] in ("pronto", "erro"):
+            return job
+        time.sleep(0.05)
+        job = cliente.get(f"/relatorios/{job['id']}").get_json()
+    raise AssertionError(f"relatório não terminou: {job}")
+
+
+def pedir(cliente, inicio, fim):
+    return cliente.post("/relatorios", json={"data_inicio": inicio, "data_fim": fim}).get_json()
+
+
+def venda_em(loja, dia, cliente):
+    v = normalizar_venda(
+        {"cliente": cliente, "barbeiro": "vini", "cabelo": "40", "pagamento": "pix"},
+        "admin", "teste", agora=datetime(2024, 6, dia, 10, 0, tzinfo=TZ_BR), loja=loja,
+    )
+    with get_engine().begin() as conn:
+        inseridas = inserir_vendas(conn, [v])
+    invalidar_cache_vendas(inseridas)
+
+
+def test_relatorio_gera_csv_do_periodo(barbearia, usuario):
+    gerente = usuario("gerente_relatorio", role="admin", loja="loja_relatorio")
+    venda_em("loja_relatorio", 3, "Relatorio Junho")
+    venda_em("loja_relatorio", 20, "Fora do Periodo")
+
+    job = esperar(gerente, pedir(gerente, "2024-06-01", "2024-06-10"))
+
+    assert (job["status"], job["linhas"]) == ("pronto", 1)
+    csv = gerente.get(job["url_arquivo"]).data.decode("utf-8")
+    assert "Relatorio Junho" in csv
+    assert "Fora do Periodo" not in csv
+
+
+def test_periodo_fechado_e_reaproveitado_ate_mudar(barbearia, usuario):
+    gerente = usuario("gerente_relatorio_2", role="admin", loja="loja_relatorio_2")
+    venda_em("loja_relatorio_2", 5, "Primeira")
+    esperar(gerente, pedir(gerente, "2024-06-01", "2024-06-30"))
+
+    repetido = pedir(gerente, "2024-06-01", "2024-06-30")
+    assert (repetido["status"], repetido["reaproveitado"], repetido["linhas"]) == ("pronto", True, 1)
+
+    # Venda retroativa no período: o arquivo guardado deixa de valer
+    venda_em("loja_relatorio_2", 6, "Retroativa")
+    novo = pedir(gerente, "2024-06-01", "2024-06-30")
+    assert not novo["reaproveitado"]
+    assert esperar(gerente, novo)["linhas"] == 2
+
+
+def test_relatorio_de_outro_usuario_nao_aparece(barbearia, usuario):
+    vini = usuario("vini_relatorio", loja="loja_relatorio_3")
+    artur = usuario("artur_relatorio", loja="loja_relatorio_3")
+    job = pedir(vini, "2024-06-01", "2024-06-30")
+
+    assert artur.get(f"/relatorios/{job['id']}").status_code == 404
+    assert artur.get(f"/relatorios/{job['id']}/arquivo").status_code == 404
@@ -0,0 +1,69 @@
+"""Réplica de leitura (DATABASE_READ_URL): relatórios leem dela, com volta ao principal."""
+import shutil
+import uuid
+
+import pytest
+
+from barbearia import banco
+from barbearia.banco import get_engine
+from barbearia.relatorios import _relatorio_gerar
+
+
+@pytest.fixture
+def replica(barbearia, monkeypatch, tmp_path):
+    """Aponta a réplica para uma cópia do SQLite dos testes; devolve a função que (re)copia."""
+    arquivo = tmp_path / "replica.db"
+    principal = get_engine().url.database
+
+    def copiar():
+        for engine in banco._engines_leitura.values():
+            engine.dispose()
+        shutil.copy(principal, arquivo)
+
+    copiar()
+    monkeypatch.setattr("barbearia.banco.DATABASE_READ_URL", f"sqlite:///file:{arquivo}?mode=ro&uri=true")
+    monkeypatch.setattr("barbearia.banco._engines_leitura", {})
+    monkeypatch.setattr("barbearia.banco._replica_fora_ate", 0.0)
+    yield copiar
+    for engine in banco._engines_leitura.values():
+        engine.dispose()
+
+
+def gerar_relatorio(loja, gravou_agora=False):
+    job = {"id": uuid.uuid4().hex, "usuario": "teste", "loja": loja, "escopo": None,
+           "inicio": None, "fim": None, "fechado": False, "gravou_agora": gravou_agora,
+           "status": "fila", "linhas": 0}
+    _relatorio_gerar(job)
+    assert job["status"] == "pronto", job
+    return job["linhas"]
+
+
+def test_relatorio_em_segundo_plano_le_da_replica(barbearia, replica, venda):
+    venda("loja_replica")
+    replica()
+    venda("loja_replica")  # só no principal: a réplica está "atrasada"
+
+    assert gerar_relatorio("loja_replica") == 1
+    # quem pediu acabou de gravar: lê do principal
+    assert gerar_relatorio("loja_replica", gravou_agora=True) == 2
+
+
+def test_relatorio_volta_ao_principal_com_replica_fora(barbearia, replica, venda, monkeypatch, tmp_path):
+    venda("loja_replica_fora")
+    monkeypatch.setattr("barbearia.banco.DATABASE_READ_URL",
+                        f"sqlite:///file:{tmp_path / 'nao_existe.db'}?mode=ro&uri=true")
+
+    assert gerar_relatorio("loja_replica_fora") == 1
+    assert banco._replica_fora_ate > 0
+
+
+def test_quem_gravou_le_o_que_gravou(barbearia, replica, usuario):
+    gerente = usuario("gerente_replica", role="admin", loja="loja_replica_ryw")
+    outro = usuario("outro_replica", role="admin", loja="loja_replica_ryw")
+    replica()
+
+    gerente.post("/registrar", data={"cliente": "Venda Recente", "barbeiro": "vini",
+                                     "cabelo": "40", "pagamento": "pix"})
+
+    assert b"Venda Recente" in gerente.get("/historico").data
+    assert b"Venda Recente" not in outro.get("/historico").data
@@ -0,0 +1,61 @@
+"""Rollup vendas_diarias (e histograma do ticket) igual às somas de vendas."""
+from datetime import datetime
+
+from sqlalchemy import text
+
+from barbearia.banco import TZ_BR, get_engine
+from barbearia.rollup import rollup_divergencias, rollup_reconstruir
+from barbearia.vendas import inserir_vendas, normalizar_venda
+
+
+def somas_loja(loja):
+    """(total, qtd) do rollup e de vendas (só as ativas) para a loja."""
+    with get_engine().connect() as conn:
+        rollup = conn.execute(text(
+            "SELECT COALESCE(SUM(total), 0), COALESCE(SUM(qtd), 0) FROM vendas_diarias WHERE loja = :loja"
+        ), {"loja": loja}).one()
+        bruto = conn.execute(text(
+            "SELECT COALESCE(SUM(total), 0), COUNT(*) FROM vendas WHERE loja = :loja AND deleted_at IS NULL"
+        ), {"loja": loja}).one()
+    return (round(float(rollup[0]), 2), rollup[1]), (round(float(bruto[0]), 2), bruto[1])
+
+
+def divergencias():
+    with get_engine().connect() as conn:
+        return rollup_divergencias(conn)
+
+
+def test_rollup_acompanha_insercao_exclusao_e_retroativas(barbearia, usuario, venda):
+    dono = usuario("dono_rollup", role="admin")
+    ids = [venda("loja_rollup", total=t) for t in ("40", "55.50", "40")]
+
+    # Retroativas (lote offline, importação): caem em dias já fechados
+    retroativas = [
+        normalizar_venda(
+            {"cliente": "Retroativa", "barbeiro": barbeiro, "cabelo": "35", "barba": "20", "pagamento": "dinheiro"},
+            "admin", "teste", agora=datetime(2024, 3, dia, 10, 0, tzinfo=TZ_BR), loja="loja_rollup",
+        )
+        for dia, barbeiro in ((4, "vini"), (4, "vini"), (18, "artur"))
+    ]
+    with get_engine().begin() as conn:
+        inserir_vendas(conn, retroativas)
+
+    with get_engine().connect() as conn:
+        data = conn.execute(text("SELECT data FROM vendas WHERE id = :id"), {"id": ids[1]}).scalar()
+    assert dono.post(f"/venda/{ids[1]}/excluir", data={"data": str(data)[:10]}).status_code == 302
+
+    rollup, bruto = somas_loja("loja_rollup")
+    assert rollup == bruto == (80.0 + 3 * 55.0, 5)
+    assert divergencias() == []
+
+
+def test_reconstruir_corrige_rollup_divergente(barbearia, venda):
+    venda("loja_rollup_2", total="30")
+    with get_engine().begin() as conn:
+        conn.execute(text("UPDATE vendas_diarias SET total = total + 1 WHERE loja = 'loja_rollup_2'"))
+    assert divergencias()
+
+    with get_engine().begin() as conn:
+        rollup_reconstruir(conn)
+
+    assert divergencias() == []
@@ -0,0 +1,84 @@
+"""Cursor do /api/vendas/sync (updated_at + id com janela de atraso)."""
+from sqlalchemy import text
+
+from barbearia.banco import get_engine
+
+
+def sync(cliente, desde=None, etag=None):
+    rota = "/api/vendas/sync" + (f"?desde={desde}" if desde else "")
+    return cliente.get(rota, headers={"If-None-Match": etag} if etag else {})
+
+
+def ids(resposta, chave="novas"):
+    return {v["id"] for v in resposta.get_json()[chave]}
+
+
+def test_venda_confirmada_fora_da_ordem_dos_ids_nao_se_perde(barbearia, usuario, venda):
+    gerente = usuario("gerente_sync", role="admin", loja="loja_sync")
+    atrasada, depois = venda("loja_sync"), venda("loja_sync")
+
+    # A venda de id menor "ainda não foi confirmada": some do banco até o sync
+    # já ter entregado a de id maior, e volta com o updated_at da transação
+    with get_engine().begin() as conn:
+        linha = dict(conn.execute(
+            text("SELECT * FROM vendas WHERE id = :id"), {"id": atrasada}
+        ).mappings().one())
+        conn.execute(text("DELETE FROM vendas WHERE id = :id"), {"id": atrasada})
+
+    primeiro = sync(gerente)
+    assert depois in ids(primeiro) and atrasada not in ids(primeiro)
+
+    colunas = ", ".join(linha)
+    with get_engine().begin() as conn:
+        conn.execute(
+            text(f"INSERT INTO vendas ({colunas}) VALUES ({', '.join(':' + c for c in linha)})"),
+            linha,
+        )
+
+    segundo = sync(gerente, primeiro.get_json()["cursor"])
+    assert segundo.status_code == 200
+    assert atrasada in ids(segundo)
+
+
+def test_cursor_avanca_depois_da_janela(barbearia, usuario, venda):
+    gerente = usuario("gerente_sync_2", role="admin", loja="loja_sync_2")
+    antiga, excluida = venda("loja_sync_2"), venda("loja_sync_2")
+    with get_engine().connect() as conn:
+        data = conn.execute(text("SELECT data FROM vendas WHERE id = :id"), {"id": excluida}).scalar()
+    assert gerente.post(f"/venda/{excluida}/excluir", data={"data": str(data)[:10]}).status_code == 302
+    with get_engine().begin() as conn:
+        conn.execute(
+            text("UPDATE vendas SET updated_at = '2000-01-01 10:00:00' WHERE id IN (:a, :e)"),
+            {"a": antiga, "e": excluida},
+        )
+
+    primeiro = sync(gerente, "2000-01-01 00:00:00~0")
+    assert antiga in ids(primeiro) and excluida in ids(primeiro, "excluidas")
+    cursor = primeiro.get_json()["cursor"]
+    assert cursor == f"2000-01-01 10:00:00~{max(antiga, excluida)}"
+
+    # Fora da janela de atraso nada volta: mesma resposta, 304
+    segundo = sync(gerente, cursor)
+    assert ids(segundo) == set() and segundo.get_json()["cursor"] == cursor
+    assert sync(gerente, cursor, segundo.headers["ETag"].strip('"')).status_code == 304
+
+
+def test_importadas_ficam_fora_do_sync(barbearia, usuario, tmp_path):
+    gerente = usuario("gerente_sync_3", role="admin", loja="loja_sync_3")
+    caminho = tmp_path / "sync.csv"
+    caminho.write_text(
+        "Data,Hora,Cliente,Barbeiro,Cabelo,Barba,Sobrancelha,Desconto,Valor Final\n"
+        "24/09/2025,10:00,Importado Sync,vini,40.0,0.0,0.0,0.0,40.0\n"
+    )
+    resultado = barbearia.app.test_cli_runner().invoke(
+        args=["vendas", "importar", str(caminho), "--loja", "loja_sync_3"]
+    )
+    assert resultado.exit_code == 0, resultado.output
+
+    assert ids(sync(gerente, "2025-09-25 00:00:00~0")) == set()
+    assert len(ids(sync(gerente, "2025-09-23 00:00:00~0"))) == 1
+
+
+def test_cursor_antigo_ou_invalido(barbearia, usuario):
+    gerente = usuario("gerente_sync_4", role="admin", loja="loja_sync_4")
+    assert sync(gerente, "10~1970-01-01 00:00:00~0").status_code == 400
@@ -0,0 +1,35 @@
+"""Migração única dos usuários antigos (USUARIOS_LEGADO do ambiente)."""
+import json
+
+import pytest
+
+from barbearia.banco import get_engine
+from barbearia.usuarios import usuarios_migrar_legado
+
+
+def test_usuarios_legado_vem_do_ambiente(barbearia, monkeypatch):
+    monkeypatch.setattr("barbearia.usuarios.USUARIOS_LEGADO", json.dumps({
+        "Legado_Admin": {"senha": "s3nha", "role": "admin"},
+        "legado_barbeiro": {"senha": "0utra", "role": "barbeiro"},
+    }))
+    with get_engine().begin() as conn:
+        criados = usuarios_migrar_legado(conn)
+    assert criados == ["legado_admin", "legado_barbeiro"]
+
+    cliente = barbearia.app.test_client()
+    resposta = cliente.post("/login", data={"usuario": "legado_admin", "senha": "s3nha"})
+    assert resposta.status_code == 302
+
+
+def test_usuarios_legado_invalido_nao_mostra_senhas(barbearia, monkeypatch):
+    monkeypatch.setattr("barbearia.usuarios.USUARIOS_LEGADO", '{"fulano": {"senha": "segredo"}}')
+    with get_engine().begin() as conn:
+        with pytest.raises(RuntimeError) as erro:
+            usuarios_migrar_legado(conn)
+    assert "segredo" not in str(erro.value)
+
+
+def test_sem_usuarios_legado_nao_cria_ninguem(barbearia):
+    cliente = barbearia.app.test_client()
+    resposta = cliente.post("/login", data={"usuario": "mairon", "senha": "1234"})
+    assert resposta.status_code != 302